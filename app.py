@@ -5,18 +5,18 @@ import plotly.express as px
 from datetime import datetime, timedelta
 import os
 from utils_with_edit_delete import (
-    initialize_database, check_login, login, logout,
+    ensure_database_initialized, check_login, login, logout,
     get_all_users, add_user, delete_user, get_all_marketing_activities,
     get_marketing_activities_by_username, add_marketing_activity,
     edit_marketing_activity, delete_marketing_activity,
     get_activity_by_id, get_all_followups, get_followups_by_activity_id,
-    get_followups_by_username, add_followup, update_activity_status,
-    get_app_config, update_app_config
+    get_followups_by_username, add_followup,
+    get_app_config, update_app_config, get_tombstone_retention_days
 )
 from data_utils import backup_data, restore_data, validate_data_integrity, export_to_csv
 
 # Inisialisasi database
-initialize_database()
+ensure_database_initialized()
 
 # Konfigurasi halaman
 st.set_page_config(
@@ -632,7 +632,7 @@ def show_marketing_activities_page():
                 activity = get_activity_by_id(selected_id)
                 
                 if activity:
-                    st.warning("Perhatian: Menghapus aktivitas pemasaran akan menghapus juga semua follow-up terkait. Tindakan ini tidak dapat dibatalkan.")
+                    st.warning(f"Perhatian: Menghapus aktivitas pemasaran akan menghapus juga semua follow-up terkait. Data tidak langsung dibuang: baris ditandai terhapus, disembunyikan dari aplikasi, dan baru dihapus permanen setelah {get_tombstone_retention_days()} hari.")
                     
                     # Tampilkan detail aktivitas yang akan dihapus
                     st.write("**Detail Aktivitas yang akan dihapus:**")
@@ -716,9 +716,7 @@ def show_followup_page():
                         )
                         
                         if success:
-                            # Update status aktivitas
-                            update_activity_status(activity_id, status_update)
-                            
+                            # add_followup sudah memperbarui status aktivitas
                             st.success(message)
                             # Reset mode tambah follow-up
                             st.session_state.add_followup_mode = False
@@ -964,7 +962,7 @@ def show_user_management_page():
                 st.write(f"Role: {selected_user['role'].capitalize()}")
                 
                 # Konfirmasi penghapusan
-                st.warning("Penghapusan pengguna tidak dapat dibatalkan. Semua data aktivitas dan follow-up yang terkait dengan pengguna ini akan tetap ada.")
+                st.warning(f"Data tidak langsung dibuang: baris ditandai terhapus, disembunyikan dari aplikasi, dan baru dihapus permanen setelah {get_tombstone_retention_days()} hari. Semua data aktivitas dan follow-up yang terkait dengan pengguna ini akan tetap ada.")
                 
                 if st.button("Hapus Pengguna", key="delete_user_button"):
                     # Konfirmasi tambahan
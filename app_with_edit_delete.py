@@ -5,19 +5,21 @@ import plotly.express as px
 from datetime import datetime, timedelta
 import os
 from utils_with_edit_delete import (
-    initialize_database, authenticate_user,
-    get_all_users, add_user, delete_user, get_all_marketing_activities,
-    get_marketing_activities_by_username, add_marketing_activity,
+    ensure_database_initialized, authenticate_user,
+    get_all_users, add_user, delete_user,
+    add_marketing_activity, add_marketing_activities_bulk,
     edit_marketing_activity, delete_marketing_activity,
-    get_activity_by_id, get_all_followups, get_followups_by_activity_id,
-    get_followups_by_username, add_followup, update_activity_status,
-    get_app_config, update_app_config
+    get_activity_by_id, add_followup,
+    get_app_config, update_app_config, get_table_frame,
+    query_activities, query_followups, archive_closed_activities, has_archive,
+    get_archive_summary, get_latest_activities, get_tombstone_retention_days
 )
 from data_utils import backup_data, restore_data, validate_data_integrity, export_to_csv
+from lead_import import read_leads_file, validate_leads
 
 
 # Initialize database
-initialize_database()
+ensure_database_initialized()
 
 # Page configuration
 st.set_page_config(
@@ -35,6 +37,88 @@ STATUS_MAPPING = {
     'gagal': 'Gagal'
 }
 REVERSE_STATUS_MAPPING = {v: k for k, v in STATUS_MAPPING.items()}
+PAGE_SIZE_OPTIONS = [25, 50, 100]
+
+def show_paginated_query(query, filters, key):
+    """Runs query(filters, sort, offset, limit) for the page picked in the
+    pagination controls stored under key and renders those controls, so only
+    the visible rows are loaded and sent to the browser.
+
+    Returns:
+        tuple: (rows of the page, total number of matching rows)
+    """
+    page_size = st.session_state.get(f"{key}_page_size", PAGE_SIZE_OPTIONS[0])
+    page = st.session_state.get(f"{key}_page", 1)
+    rows, total = query(filters, None, (page - 1) * page_size, page_size)
+    page_count = max(1, -(-total // page_size))
+    if page > page_count: # Filters shrank the result: jump to the last page
+        page = st.session_state[f"{key}_page"] = page_count
+        rows, total = query(filters, None, (page - 1) * page_size, page_size)
+
+    col1, col2, col3 = st.columns([1, 1, 2])
+    with col1:
+        st.selectbox("Baris per halaman", PAGE_SIZE_OPTIONS, key=f"{key}_page_size")
+    with col2:
+        st.number_input("Halaman", min_value=1, max_value=page_count, step=1, key=f"{key}_page")
+    with col3:
+        first_row = (page - 1) * page_size + 1 if rows else 0
+        st.caption(f"Menampilkan {first_row}-{first_row + len(rows) - 1 if rows else 0} dari {total} data "
+                   f"(halaman {page} dari {page_count})")
+    return rows, total
+
+def select_activity(filters, label, key):
+    """Search field, pagination controls and a selectbox over one page of the
+    activities matching filters, so the options never hold the whole table.
+
+    Returns:
+        tuple: (selected option label, activity id), (None, None) if nothing matches
+    """
+    search = st.text_input("Cari Nama Prospek", key=f"{key}_search")
+    page_rows, _ = show_paginated_query(
+        query_activities, dict(filters, prospect_name=search.strip()), key=key
+    )
+    activity_options = {f"{row['prospect_name']} ({str(row['activity_date'])[:10]}) - ID: {row['id']}": row['id']
+                        for row in page_rows}
+    if not activity_options:
+        st.info("Tidak ada aktivitas yang cocok dengan pencarian.")
+        return None, None
+    selected = st.selectbox(label, options=list(activity_options.keys()), key=f"{key}_select")
+    return selected, activity_options[selected]
+
+def value_counts_with_archive(frame, column, archive_summary=None):
+    """frame[column].value_counts(), plus the archived counts of column from
+    get_archive_summary() when archived data is included. Largest first."""
+    counts = frame[column].value_counts()
+    counts.index = counts.index.astype(object)
+    if archive_summary:
+        counts = counts.add(pd.Series(archive_summary[column], dtype="int64"), fill_value=0).astype(int)
+        counts = counts[counts > 0].sort_values(ascending=False)
+    return counts
+
+def show_archive_toggle(marketer_username=None):
+    """Renders the "include archived" toggle when an archive exists. Returns the
+    precomputed archive summary when it is switched on, otherwise None."""
+    if not has_archive() or not st.toggle("Sertakan data arsip", key="dashboard_include_archived"):
+        return None
+    return get_archive_summary(marketer_username)
+
+def show_archive_section(archive_job=archive_closed_activities):
+    """Archive controls on the settings page. archive_job may be the data_hooks
+    version so the removed rows are synced to Google Sheets."""
+    st.subheader("Arsip Prospek Selesai")
+    st.write("Pindahkan aktivitas berstatus Berhasil/Gagal yang lama tidak berubah, beserta follow-up-nya, "
+             "ke arsip terkompresi di `data/archive/`. Dashboard tetap dapat menyertakan ringkasannya.")
+    config = get_app_config()
+    days = st.number_input("Arsipkan jika tidak berubah selama (hari)", min_value=1, step=1,
+                           value=int(config.get('archive_after_days', 180)))
+    if st.button("Arsipkan Sekarang", use_container_width=True):
+        if days != config.get('archive_after_days'):
+            update_app_config({'archive_after_days': int(days)})
+        success, message, _ = archive_job(int(days))
+        if success:
+            st.success(message)
+        else:
+            st.error(message)
 
 def add_marketing_activity_wrapper(
     marketer_username, 
@@ -158,12 +242,12 @@ def show_sidebar():
         if user['role'] == 'superadmin':
             menu = st.radio(
                 "Menu",
-                ["Dashboard", "Aktivitas Pemasaran", "Follow-up", "Manajemen Pengguna", "Pengaturan"]
+                ["Dashboard", "Aktivitas Pemasaran", "Follow-up", "Impor Leads", "Manajemen Pengguna", "Pengaturan"]
             )
         else:
             menu = st.radio(
                 "Menu",
-                ["Dashboard", "Aktivitas Pemasaran", "Follow-up", "Profil"]
+                ["Dashboard", "Aktivitas Pemasaran", "Follow-up", "Impor Leads", "Profil"]
             )
         
         st.divider()
@@ -178,28 +262,28 @@ def show_superadmin_dashboard():
     """Display superadmin dashboard with analytics"""
     st.title("Dashboard Superadmin")
     
-    # Get all data
-    activities = get_all_marketing_activities()
-    followups = get_all_followups()
+    # Get all data (typed columnar frames, dates already datetime64)
+    activities_df = get_table_frame("marketing_activities")
+    followups_df = get_table_frame("followups")
     users = get_all_users()
     marketing_users = [user for user in users if user['role'] == 'marketing']
+    archived = show_archive_toggle() # Precomputed archive totals, never the archived rows
     
-    if not activities:
+    if activities_df.empty and not archived:
         st.info("Belum ada data aktivitas pemasaran. Tambahkan aktivitas pemasaran terlebih dahulu.")
         return
     
-    activities_df = pd.DataFrame(activities)
-    
     # Key metrics
+    prospects = set(activities_df['prospect_name'].dropna()) | (archived['prospects'] if archived else set())
     col1, col2, col3, col4 = st.columns(4)
     with col1:
-        st.metric("Total Aktivitas", len(activities))
+        st.metric("Total Aktivitas", len(activities_df) + (archived['activities'] if archived else 0))
     with col2:
-        st.metric("Total Prospek", activities_df['prospect_name'].nunique())
+        st.metric("Total Prospek", len(prospects))
     with col3:
         st.metric("Total Marketing", len(marketing_users))
     with col4:
-        st.metric("Total Follow-up", len(followups) if followups else 0)
+        st.metric("Total Follow-up", len(followups_df) + (archived['followups'] if archived else 0))
     
     # First row of charts
     st.subheader("Analisis Aktivitas Pemasaran")
@@ -207,7 +291,7 @@ def show_superadmin_dashboard():
     
     with col1:
         # Status distribution
-        status_counts = activities_df['status'].value_counts().reset_index()
+        status_counts = value_counts_with_archive(activities_df, 'status', archived).reset_index()
         status_counts.columns = ['Status', 'Jumlah']
         status_counts['Status'] = status_counts['Status'].map(lambda x: STATUS_MAPPING.get(x, x))
         
@@ -228,7 +312,7 @@ def show_superadmin_dashboard():
     
     with col2:
         # Activities per marketer
-        marketer_counts = activities_df['marketer_username'].value_counts().reset_index()
+        marketer_counts = value_counts_with_archive(activities_df, 'marketer_username', archived).reset_index()
         marketer_counts.columns = ['Marketing', 'Jumlah Aktivitas']
         
         fig = px.bar(
@@ -246,7 +330,7 @@ def show_superadmin_dashboard():
     
     with col1:
         # Activities by location
-        location_counts = activities_df['prospect_location'].value_counts().reset_index()
+        location_counts = value_counts_with_archive(activities_df, 'prospect_location', archived).reset_index()
         location_counts.columns = ['Lokasi', 'Jumlah']
         
         fig = px.bar(
@@ -262,7 +346,7 @@ def show_superadmin_dashboard():
     with col2:
         # Activities by type
         if 'activity_type' in activities_df.columns:
-            type_counts = activities_df['activity_type'].value_counts().reset_index()
+            type_counts = value_counts_with_archive(activities_df, 'activity_type', archived).reset_index()
             type_counts.columns = ['Jenis Aktivitas', 'Jumlah']
             
             fig = px.pie(
@@ -276,11 +360,10 @@ def show_superadmin_dashboard():
     
     # Recent activities
     st.subheader("Aktivitas Pemasaran Terbaru")
-    activities_df['created_at'] = pd.to_datetime(activities_df['created_at'])
-    activities_df = activities_df.sort_values('created_at', ascending=False)
-    
     display_columns = ['marketer_username', 'prospect_name', 'prospect_location', 
                       'activity_type', 'status', 'created_at']
+    # Range scan over the time-ordered ids instead of sorting every activity
+    latest_df = pd.DataFrame(get_latest_activities(10), columns=display_columns)
     
     column_mapping = {
         'marketer_username': 'Marketing',
@@ -291,15 +374,13 @@ def show_superadmin_dashboard():
         'created_at': 'Tanggal Dibuat'
     }
     
-    display_df = activities_df[display_columns].rename(columns=column_mapping)
+    display_df = latest_df.rename(columns=column_mapping)
     display_df['Status'] = display_df['Status'].map(lambda x: STATUS_MAPPING.get(x, x))
-    st.dataframe(display_df.head(10), use_container_width=True)
+    st.dataframe(display_df, use_container_width=True)
     
     # Upcoming follow-ups
-    if followups:
+    if not followups_df.empty:
         st.subheader("Follow-up yang Akan Datang")
-        followups_df = pd.DataFrame(followups)
-        followups_df['next_followup_date'] = pd.to_datetime(followups_df['next_followup_date'])
         
         today = datetime.now()
         next_week = today + timedelta(days=7)
@@ -336,29 +417,25 @@ def show_marketing_dashboard():
     user = st.session_state.user
     username = user['username']
     
-    # Ambil data aktivitas marketing
-    activities = get_marketing_activities_by_username(username)
-    followups = get_followups_by_username(username)
+    # Ambil data aktivitas marketing (DataFrame bertipe dari snapshot kolumnar)
+    activities_df = get_table_frame("marketing_activities", marketer_username=username)
+    followups_df = get_table_frame("followups", marketer_username=username)
+    archived = show_archive_toggle(username) # Ringkasan arsip milik marketing ini
     
     # Jika tidak ada data, tampilkan pesan
-    if not activities:
+    if activities_df.empty and not archived:
         st.info("Anda belum memiliki aktivitas pemasaran. Tambahkan aktivitas pemasaran terlebih dahulu.")
         return
     
-    # Konversi ke DataFrame untuk analisis
-    activities_df = pd.DataFrame(activities)
-    
     # Metrik utama
+    prospects = set(activities_df['prospect_name'].dropna()) | (archived['prospects'] if archived else set())
     col1, col2, col3 = st.columns(3)
     with col1:
-        st.metric("Total Aktivitas", len(activities))
+        st.metric("Total Aktivitas", len(activities_df) + (archived['activities'] if archived else 0))
     with col2:
-        st.metric("Total Prospek", activities_df['prospect_name'].nunique())
+        st.metric("Total Prospek", len(prospects))
     with col3:
-        if followups:
-            st.metric("Total Follow-up", len(followups))
-        else:
-            st.metric("Total Follow-up", 0)
+        st.metric("Total Follow-up", len(followups_df) + (archived['followups'] if archived else 0))
     
     # Baris pertama grafik
     st.subheader("Analisis Aktivitas Pemasaran")
@@ -366,7 +443,7 @@ def show_marketing_dashboard():
     
     with col1:
         # Distribusi status prospek
-        status_counts = activities_df['status'].value_counts().reset_index()
+        status_counts = value_counts_with_archive(activities_df, 'status', archived).reset_index()
         status_counts.columns = ['Status', 'Jumlah']
         
         # Mapping status untuk tampilan yang lebih baik
@@ -390,7 +467,7 @@ def show_marketing_dashboard():
     with col2:
         # Aktivitas per jenis
         if 'activity_type' in activities_df.columns:
-            type_counts = activities_df['activity_type'].value_counts().reset_index()
+            type_counts = value_counts_with_archive(activities_df, 'activity_type', archived).reset_index()
             type_counts.columns = ['Jenis Aktivitas', 'Jumlah']
             
             fig = px.pie(
@@ -407,7 +484,7 @@ def show_marketing_dashboard():
     
     with col1:
         # Aktivitas per lokasi
-        location_counts = activities_df['prospect_location'].value_counts().reset_index()
+        location_counts = value_counts_with_archive(activities_df, 'prospect_location', archived).reset_index()
         location_counts.columns = ['Lokasi', 'Jumlah']
         
         fig = px.bar(
@@ -423,14 +500,13 @@ def show_marketing_dashboard():
     # Daftar aktivitas terbaru
     st.subheader("Aktivitas Pemasaran Terbaru")
     
-    # Konversi created_at ke datetime dan urutkan
-    activities_df['created_at'] = pd.to_datetime(activities_df['created_at'])
-    activities_df = activities_df.sort_values('created_at', ascending=False)
-    
     # Pilih kolom yang ingin ditampilkan
     display_columns = ['prospect_name', 'prospect_location', 
                       'activity_type', 'status', 'created_at']
     
+    # 10 aktivitas terbaru langsung dari urutan ID (tanpa mengurutkan semua data)
+    latest_df = pd.DataFrame(get_latest_activities(10, marketer_username=username), columns=display_columns)
+    
     # Rename kolom untuk tampilan yang lebih baik
     column_mapping = {
         'prospect_name': 'Nama Prospek',
@@ -440,21 +516,18 @@ def show_marketing_dashboard():
         'created_at': 'Tanggal Dibuat'
     }
     
-    display_df = activities_df[display_columns].rename(columns=column_mapping)
+    display_df = latest_df.rename(columns=column_mapping)
     
     # Mapping status untuk tampilan yang lebih baik
     display_df['Status'] = display_df['Status'].map(lambda x: STATUS_MAPPING.get(x, x))
     
     # Tampilkan 10 aktivitas terbaru
-    st.dataframe(display_df.head(10), use_container_width=True)
+    st.dataframe(display_df, use_container_width=True)
     
     # Daftar follow-up yang akan datang
-    if followups:
+    if not followups_df.empty:
         st.subheader("Follow-up yang Akan Datang")
         
-        followups_df = pd.DataFrame(followups)
-        followups_df['next_followup_date'] = pd.to_datetime(followups_df['next_followup_date'])
-        
         # Filter follow-up yang akan datang (dalam 7 hari ke depan)
         today = datetime.now()
         next_week = today + timedelta(days=7)
@@ -506,27 +579,16 @@ def show_marketing_activities_page():
         tab1, tab2, tab3 = tabs
         tab4 = None # Assign None to tab4 for marketing role
     
-    # Ambil data aktivitas
-    if role == 'superadmin':
-        activities = get_all_marketing_activities()
-    else:
-        activities = get_marketing_activities_by_username(username)
-    
-    if not activities:
+    # Aktivitas yang boleh dilihat user; halaman dan pilihan diambil per query
+    base_filters = {} if role == 'superadmin' else {'marketer_username': username}
+    _, activity_total = query_activities(base_filters, limit=0)
+    if not activity_total:
         st.info("Belum ada data aktivitas pemasaran.")
-        activities_df = pd.DataFrame()
-    else:
-        activities_df = pd.DataFrame(activities)
-        # Convert dates for proper display and sorting
-        activities_df['activity_date'] = pd.to_datetime(activities_df['activity_date'])
-        activities_df['created_at'] = pd.to_datetime(activities_df['created_at'])
-        activities_df['updated_at'] = pd.to_datetime(activities_df['updated_at'])
-        activities_df = activities_df.sort_values('created_at', ascending=False)
 
     with tab1:
         st.subheader("Daftar Aktivitas Pemasaran")
         
-        if not activities_df.empty:
+        if activity_total:
             # Filter options
             col1, col2, col3 = st.columns(3)
             with col1:
@@ -539,18 +601,27 @@ def show_marketing_activities_page():
                 filter_start_date = st.date_input("Filter Tanggal Mulai", value=None)
             with col3:
                 filter_end_date = st.date_input("Filter Tanggal Akhir", value=None)
+            col1, col2 = st.columns(2)
+            with col1:
+                if role == 'superadmin':
+                    marketer_options = ["Semua"] + sorted(u['username'] for u in get_all_users())
+                    filter_marketer = st.selectbox("Filter Marketing", options=marketer_options)
+                else:
+                    filter_marketer = username
+            with col2:
+                filter_location = st.text_input("Filter Lokasi")
+            filter_name = st.text_input("Cari Nama Prospek")
             
-            # Apply filters
-            filtered_df = activities_df.copy()
-            
-            # Map selected display status back to internal keys for filtering
-            filter_status_keys = [REVERSE_STATUS_MAPPING[s] for s in filter_status]
-            filtered_df = filtered_df[filtered_df['status'].isin(filter_status_keys)]
-            
-            if filter_start_date:
-                filtered_df = filtered_df[filtered_df['activity_date'].dt.date >= filter_start_date]
-            if filter_end_date:
-                filtered_df = filtered_df[filtered_df['activity_date'].dt.date <= filter_end_date]
+            # Filtering, sorting and paging happen in the query; only the visible page is loaded
+            filters = {
+                'status': [REVERSE_STATUS_MAPPING[s] for s in filter_status],
+                'start_date': filter_start_date,
+                'end_date': filter_end_date,
+                'marketer_username': None if filter_marketer == "Semua" else filter_marketer,
+                'prospect_location': filter_location.strip(),
+                'prospect_name': filter_name.strip()
+            }
+            page_rows, _ = show_paginated_query(query_activities, filters, key="activities")
             
             # Prepare display dataframe
             display_columns = [
@@ -570,13 +641,10 @@ def show_marketing_activities_page():
                 'updated_at': 'Terakhir Update'
             }
             
-            display_df = filtered_df[display_columns].rename(columns=column_mapping)
+            display_df = pd.DataFrame(page_rows, columns=display_columns).rename(columns=column_mapping)
             display_df['Status'] = display_df['Status'].map(lambda x: STATUS_MAPPING.get(x, x))
-            # Format dates for display
-            display_df['Tanggal Aktivitas'] = display_df['Tanggal Aktivitas'].dt.strftime('%Y-%m-%d')
-            display_df['Terakhir Update'] = display_df['Terakhir Update'].dt.strftime('%Y-%m-%d %H:%M:%S')
             
-            st.dataframe(display_df, use_container_width=True)
+            st.dataframe(display_df, use_container_width=True, hide_index=True)
         else:
             st.info("Tidak ada data aktivitas untuk ditampilkan.")
 
@@ -618,14 +686,13 @@ def show_marketing_activities_page():
 
     with tab3:
         st.subheader("Edit Aktivitas Pemasaran")
-        if not activities_df.empty:
-            activity_options = {f"{row['prospect_name']} ({row['activity_date'].strftime('%Y-%m-%d')}) - ID: {row['id']}": row['id'] 
-                              for index, row in activities_df.iterrows()}
-            selected_activity_display = st.selectbox("Pilih Aktivitas untuk Diedit", options=list(activity_options.keys()))
+        if activity_total:
+            selected_activity_display, selected_activity_id = select_activity(
+                base_filters, "Pilih Aktivitas untuk Diedit", key="edit_activity"
+            )
+            activity_to_edit = get_activity_by_id(selected_activity_id) if selected_activity_id else None
             
-            if selected_activity_display:
-                selected_activity_id = activity_options[selected_activity_display]
-                activity_to_edit = activities_df[activities_df['id'] == selected_activity_id].iloc[0]
+            if activity_to_edit:
                 
                 with st.form("edit_activity_form"):
                     st.write(f"Mengedit Aktivitas ID: {selected_activity_id}")
@@ -635,7 +702,7 @@ def show_marketing_activities_page():
                     contact_position = st.text_input("Jabatan Kontak Person", value=activity_to_edit['contact_position'])
                     contact_phone = st.text_input("Nomor Telepon Kontak", value=activity_to_edit['contact_phone'])
                     contact_email = st.text_input("Email Kontak", value=activity_to_edit['contact_email'])
-                    activity_date = st.date_input("Tanggal Aktivitas", value=activity_to_edit['activity_date'].date())
+                    activity_date = st.date_input("Tanggal Aktivitas", value=pd.to_datetime(activity_to_edit['activity_date']).date())
                     activity_type_options = ["Telepon", "Email", "Meeting", "Presentasi", "Lainnya"]
                     activity_type_index = activity_type_options.index(activity_to_edit['activity_type']) if activity_to_edit['activity_type'] in activity_type_options else 0
                     activity_type = st.selectbox("Jenis Aktivitas", options=activity_type_options, index=activity_type_index)
@@ -673,17 +740,16 @@ def show_marketing_activities_page():
     if tab4:
         with tab4:
             st.subheader("Hapus Aktivitas Pemasaran")
-            if not activities_df.empty:
-                activity_options = {f"{row['prospect_name']} ({row['activity_date'].strftime('%Y-%m-%d')}) - ID: {row['id']}": row['id'] 
-                                  for index, row in activities_df.iterrows()}
-                selected_activity_display = st.selectbox("Pilih Aktivitas untuk Dihapus", options=list(activity_options.keys()), key="delete_activity_select") # Added key
+            if activity_total:
+                selected_activity_display, selected_activity_id = select_activity(
+                    base_filters, "Pilih Aktivitas untuk Dihapus", key="delete_activity"
+                )
                 
                 if selected_activity_display:
-                    selected_activity_id = activity_options[selected_activity_display]
-                    st.warning(f"Anda yakin ingin menghapus aktivitas untuk **{selected_activity_display.split(' (')[0]}** (ID: {selected_activity_id})? Tindakan ini tidak dapat dibatalkan dan akan menghapus semua follow-up terkait.")
+                    st.warning(f"Anda yakin ingin menghapus aktivitas untuk **{selected_activity_display.split(' (')[0]}** (ID: {selected_activity_id})? Semua follow-up terkait ikut dihapus. Data tidak langsung dibuang: baris ditandai terhapus, disembunyikan dari aplikasi, dan baru dihapus permanen setelah {get_tombstone_retention_days()} hari.")
                     
                     if st.button("Hapus Aktivitas Ini", type="primary", use_container_width=True, key="delete_activity_button"): # Added key
-                        success, message = delete_marketing_activity(selected_activity_id)
+                        success, message = delete_marketing_activity(selected_activity_id, st.session_state.user['username'])
                         if success:
                             st.success(message)
                             st.rerun()
@@ -701,16 +767,14 @@ def show_followup_page():
     
     # Ambil data aktivitas untuk dropdown
     if role == 'superadmin':
-        activities = get_all_marketing_activities()
+        activities_df = get_table_frame("marketing_activities")
     else:
-        activities = get_marketing_activities_by_username(username)
+        activities_df = get_table_frame("marketing_activities", marketer_username=username)
     
-    if not activities:
+    if activities_df.empty:
         st.info("Belum ada aktivitas pemasaran. Tambahkan aktivitas terlebih dahulu untuk melakukan follow-up.")
         return
         
-    activities_df = pd.DataFrame(activities)
-    activities_df['activity_date'] = pd.to_datetime(activities_df['activity_date'])
     activity_options = {f"{row['prospect_name']} ({row['activity_date'].strftime('%Y-%m-%d')}) - ID: {row['id']}": row['id'] 
                       for index, row in activities_df.iterrows()}
     
@@ -720,15 +784,13 @@ def show_followup_page():
         selected_activity_id = activity_options[selected_activity_display]
         st.subheader(f"Follow-up untuk: {selected_activity_display.split(' (')[0]}")
         
-        # Tampilkan follow-up yang sudah ada
-        followups = get_followups_by_activity_id(selected_activity_id)
-        if followups:
+        # Tampilkan follow-up yang sudah ada (per halaman)
+        _, followup_total = query_followups({'activity_id': selected_activity_id}, limit=0)
+        if followup_total:
             st.write("**Riwayat Follow-up:**")
-            followups_df = pd.DataFrame(followups)
-            followups_df['followup_date'] = pd.to_datetime(followups_df['followup_date'])
-            followups_df['next_followup_date'] = pd.to_datetime(followups_df['next_followup_date'])
-            followups_df['created_at'] = pd.to_datetime(followups_df['created_at'])
-            followups_df = followups_df.sort_values('created_at', ascending=False)
+            page_rows, _ = show_paginated_query(
+                query_followups, {'activity_id': selected_activity_id}, key="followups"
+            )
             
             display_columns = [
                 'marketer_username', 'followup_date', 'notes', 'next_action', 
@@ -745,15 +807,12 @@ def show_followup_page():
                 'created_at': 'Tanggal Dibuat'
             }
             
-            display_df = followups_df[display_columns].rename(columns=column_mapping)
-            # Format dates for display
-            display_df['Tanggal Follow-up'] = display_df['Tanggal Follow-up'].dt.strftime('%Y-%m-%d')
-            display_df['Tanggal Follow-up Berikutnya'] = display_df['Tanggal Follow-up Berikutnya'].dt.strftime('%Y-%m-%d').fillna('N/A')
-            display_df['Tanggal Dibuat'] = display_df['Tanggal Dibuat'].dt.strftime('%Y-%m-%d %H:%M:%S')
+            display_df = pd.DataFrame(page_rows, columns=display_columns).rename(columns=column_mapping)
+            display_df['Tanggal Follow-up Berikutnya'] = display_df['Tanggal Follow-up Berikutnya'].fillna('N/A')
             # Map status update
             display_df['Update Status Aktivitas'] = display_df['Update Status Aktivitas'].map(lambda x: STATUS_MAPPING.get(x, x))
             
-            st.dataframe(display_df, use_container_width=True)
+            st.dataframe(display_df, use_container_width=True, hide_index=True)
         else:
             st.info("Belum ada follow-up untuk aktivitas ini.")
             
@@ -794,6 +853,54 @@ def show_followup_page():
                     else:
                         st.error(message)
 
+def show_import_page(bulk_insert=add_marketing_activities_bulk):
+    """Import a CSV/XLSX lead list as marketing activities in one batch"""
+    st.title("Impor Leads")
+    
+    user = st.session_state.user
+    st.write("Unggah file CSV atau XLSX dengan kolom: " + ", ".join(f"`{c}`" for c in [
+        "prospect_name", "prospect_location", "contact_person", "contact_position", "contact_phone",
+        "contact_email", "activity_date", "activity_type", "description", "status"
+    ]) + ". Kolom `status` boleh kosong (default: Baru).")
+    
+    # Superadmin can import for any marketer; marketing users import for themselves
+    if user['role'] == 'superadmin':
+        usernames = [u['username'] for u in get_all_users()]
+        marketer_username = st.selectbox("Marketing untuk baris tanpa marketer_username", options=usernames)
+    else:
+        marketer_username = user['username']
+    
+    uploaded_file = st.file_uploader("File Leads", type=["csv", "xlsx"])
+    if uploaded_file is None:
+        return
+    
+    try:
+        leads_df = read_leads_file(uploaded_file)
+    except Exception as e:
+        st.error(f"Gagal membaca file: {e}")
+        return
+    if user['role'] != 'superadmin':
+        leads_df['marketer_username'] = marketer_username
+    valid_df, errors_df = validate_leads(leads_df, marketer_username)
+    
+    col1, col2 = st.columns(2)
+    col1.metric("Baris Valid", len(valid_df))
+    col2.metric("Baris Tidak Valid", len(leads_df) - len(valid_df))
+    if not errors_df.empty:
+        st.warning("Baris berikut akan dilewati:")
+        st.dataframe(errors_df, use_container_width=True, hide_index=True)
+    if valid_df.empty:
+        st.info("Tidak ada baris valid untuk diimpor.")
+        return
+    st.dataframe(valid_df, use_container_width=True)
+    
+    if st.button(f"Impor {len(valid_df)} Aktivitas", use_container_width=True):
+        success, message, _ = bulk_insert(valid_df.to_dict("records"))
+        if success:
+            st.success(message)
+        else:
+            st.error(message)
+
 def show_user_management_page():
     st.title("Manajemen Pengguna")
     
@@ -804,8 +911,7 @@ def show_user_management_page():
         
     tab1, tab2, tab3 = st.tabs(["Lihat Pengguna", "Tambah Pengguna", "Hapus Pengguna"])
     
-    users = get_all_users()
-    users_df = pd.DataFrame(users)
+    users_df = get_table_frame("users") # created_at already datetime64
     
     with tab1:
         st.subheader("Daftar Pengguna")
@@ -821,7 +927,7 @@ def show_user_management_page():
             display_df = users_df[display_columns].rename(columns=column_mapping)
             display_df['Role'] = display_df['Role'].str.capitalize()
             # Format date
-            display_df['Tanggal Dibuat'] = pd.to_datetime(display_df['Tanggal Dibuat']).dt.strftime('%Y-%m-%d %H:%M:%S')
+            display_df['Tanggal Dibuat'] = display_df['Tanggal Dibuat'].dt.strftime('%Y-%m-%d %H:%M:%S')
             st.dataframe(display_df, use_container_width=True)
         else:
             st.info("Tidak ada data pengguna.")
@@ -863,7 +969,7 @@ def show_user_management_page():
                 
                 if selected_user_display:
                     selected_username = user_options[selected_user_display]
-                    st.warning(f"Anda yakin ingin menghapus pengguna **{selected_user_display}**? Tindakan ini tidak dapat dibatalkan.")
+                    st.warning(f"Anda yakin ingin menghapus pengguna **{selected_user_display}**? Data tidak langsung dibuang: baris ditandai terhapus, disembunyikan dari aplikasi, dan baru dihapus permanen setelah {get_tombstone_retention_days()} hari.")
                     
                     if st.button("Hapus Pengguna Ini", type="primary", use_container_width=True):
                         success, message = delete_user(selected_username, st.session_state.user['username'])
@@ -1023,6 +1129,9 @@ def show_settings_page():
                         )
                 else:
                     st.error(message)
+        
+        st.divider()
+        show_archive_section()
 
 def show_profile_page():
     st.title("Profil Pengguna")
@@ -1089,6 +1198,8 @@ def main():
             show_marketing_activities_page()
         elif menu == "Follow-up":
             show_followup_page()
+        elif menu == "Impor Leads":
+            show_import_page()
         elif menu == "Manajemen Pengguna":
             if st.session_state.user['role'] == 'superadmin':
                 show_user_management_page()
@@ -1125,6 +1236,8 @@ def main():
             show_marketing_activities_page()
     elif menu == "Follow-up":
             show_followup_page()
+    elif menu == "Impor Leads":
+            show_import_page()
     elif menu == "Manajemen Pengguna":
             if st.session_state.user['role'] == 'superadmin':
                 show_user_management_page()
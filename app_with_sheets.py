@@ -13,12 +13,14 @@ from sheets_integration import add_google_sheets_sync_ui
 # Override data functions with hooked versions
 from data_hooks import (
     add_marketing_activity,
+    add_marketing_activities_bulk,
     edit_marketing_activity,
     delete_marketing_activity,
     add_followup,
     add_user,
     delete_user,
-    update_app_config
+    update_app_config,
+    archive_closed_activities
 )
 
 # Update the show_settings_page function to include Google Sheets sync UI
@@ -161,6 +163,9 @@ def show_settings_page_with_sheets():
                         )
                 else:
                     st.error(message)
+        
+        st.divider()
+        show_archive_section(archive_closed_activities) # Hooked: syncs the removed rows
     
     with tab3:
         # Add Google Sheets sync UI
@@ -195,6 +200,8 @@ def main_with_sheets():
         show_marketing_activities_page()
     elif menu == "Follow-up":
         show_followup_page()
+    elif menu == "Impor Leads":
+        show_import_page(add_marketing_activities_bulk)  # One Google Sheets sync per import
     elif menu == "Manajemen Pengguna":
         show_user_management_page()
     elif menu == "Pengaturan":
@@ -0,0 +1,133 @@
+"""
+Cold Archive for Closed Prospects
+
+Marketing activities that are closed (berhasil/gagal) and have not changed for
+archive_after_days days are moved, together with their follow-ups, out of the
+hot tables into gzip-compressed YAML files under data/archive/. The hot tables
+(and therefore parsing, indexes, dashboards and Google Sheets sync) only carry
+open work.
+
+data/archive/manifest.yaml lists every archive file with aggregates per
+marketer (counts per status, activity type and location, follow-up count and
+the distinct prospect names), so the dashboards' "include archived" toggle
+reads only the manifest, never the archived rows.
+
+The job itself lives in utils_with_edit_delete.archive_closed_activities.
+Command line (e.g. from cron):
+    python cold_archive.py run [--days 180]
+"""
+
+import gzip
+import os
+import sys
+import yaml_io
+
+ARCHIVE_DIRNAME = "archive"
+ARCHIVE_MANIFEST = "manifest.yaml"
+ARCHIVE_SUFFIX = ".yaml.gz"
+ARCHIVE_STATUSES = ("berhasil", "gagal")
+DEFAULT_ARCHIVE_AFTER_DAYS = 180
+COUNTED_FIELDS = ("status", "activity_type", "prospect_location")
+
+
+def archive_dir(data_dir):
+    return os.path.join(data_dir, ARCHIVE_DIRNAME)
+
+
+def manifest_path(data_dir):
+    return os.path.join(archive_dir(data_dir), ARCHIVE_MANIFEST)
+
+
+def write_archive(path, activities, followups):
+    """Writes the archived rows to path (gzip YAML), replacing it atomically."""
+    temp_path = path + ".tmp"
+    with gzip.open(temp_path, "wt", encoding="utf-8") as file:
+        yaml_io.dump(
+            {"marketing_activities": activities, "followups": followups},
+            file, default_flow_style=False, sort_keys=False, allow_unicode=True
+        )
+    os.replace(temp_path, path)
+
+
+def read_archive(path):
+    """Returns {"marketing_activities": [...], "followups": [...]} of an archive file."""
+    with gzip.open(path, "rt", encoding="utf-8") as file:
+        document = yaml_io.safe_load(file) or {}
+    return {
+        "marketing_activities": document.get("marketing_activities") or [],
+        "followups": document.get("followups") or [],
+    }
+
+
+def compute_aggregates(activities, followups):
+    """Aggregates of archived rows per marketer:
+    {marketer: {"activities", "followups", "status": {...}, "activity_type":
+    {...}, "prospect_location": {...}, "prospects": [names]}}."""
+    aggregates = {}
+
+    def bucket(marketer):
+        return aggregates.setdefault(str(marketer or ""), {
+            "activities": 0, "followups": 0,
+            **{field: {} for field in COUNTED_FIELDS}, "prospects": []
+        })
+
+    for activity in activities:
+        entry = bucket(activity.get("marketer_username"))
+        entry["activities"] += 1
+        for field in COUNTED_FIELDS:
+            value = str(activity.get(field) or "")
+            entry[field][value] = entry[field].get(value, 0) + 1
+        name = activity.get("prospect_name")
+        if name and name not in entry["prospects"]:
+            entry["prospects"].append(name)
+    for followup in followups:
+        bucket(followup.get("marketer_username"))["followups"] += 1
+    return aggregates
+
+
+def merge_aggregates(manifest, marketer_username=None):
+    """Sums the aggregates of the committed archives in manifest, optionally
+    for one marketer. Returns {"activities", "followups", "status",
+    "activity_type", "prospect_location", "marketer_username" (activity
+    counts), "prospects" (set)}."""
+    summary = {
+        "activities": 0, "followups": 0, **{field: {} for field in COUNTED_FIELDS},
+        "marketer_username": {}, "prospects": set()
+    }
+    for archive in (manifest or {}).get("archives") or []:
+        if archive.get("pending"): # Rows may still be in the hot tables
+            continue
+        for marketer, entry in (archive.get("aggregates") or {}).items():
+            if marketer_username is not None and marketer != marketer_username:
+                continue
+            summary["activities"] += entry.get("activities", 0)
+            summary["followups"] += entry.get("followups", 0)
+            summary["marketer_username"][marketer] = (
+                summary["marketer_username"].get(marketer, 0) + entry.get("activities", 0)
+            )
+            for field in COUNTED_FIELDS:
+                for value, count in (entry.get(field) or {}).items():
+                    summary[field][value] = summary[field].get(value, 0) + count
+            summary["prospects"].update(entry.get("prospects") or [])
+    return summary
+
+
+def _main(argv):
+    import argparse
+    parser = argparse.ArgumentParser(description="Cold archive tools")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    run_parser = subparsers.add_parser("run", help="Archive closed activities and their follow-ups")
+    run_parser.add_argument("--days", type=int,
+                            help="Minimum age in days (default: archive_after_days in config.yaml)")
+    args = parser.parse_args(argv)
+
+    # Imported lazily: utils_with_edit_delete imports this module
+    from utils_with_edit_delete import initialize_database, archive_closed_activities
+    initialize_database()
+    success, message, _ = archive_closed_activities(args.days)
+    print(message)
+    return 0 if success else 1
+
+
+if __name__ == "__main__":
+    sys.exit(_main(sys.argv[1:]))
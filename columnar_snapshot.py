@@ -0,0 +1,126 @@
+"""
+Columnar Snapshots for the Analytics Pages
+
+Keeps a typed pandas DataFrame of each data table for the dashboards:
+status/activity_type/marketer_username as categoricals and the date columns
+as datetime64 (converted from their integer epoch companions, see
+epoch_fields.py), so pages no longer build DataFrames from lists of dicts and
+re-parse date strings on every rerun.
+
+utils_with_edit_delete.get_table_frame rebuilds a frame only when the table's
+data version changes and persists it under data/columnar/ together with that
+version, so a restarted app reuses it. Snapshots are Parquet files written
+by pyarrow (requirements.txt); without pyarrow nothing is persisted and the
+frame is rebuilt once per process. Pickle is deliberately not used: loading
+a file from data/ must never execute code.
+"""
+
+import importlib.util
+import os
+import pandas as pd
+
+import epoch_fields
+
+SNAPSHOT_DIRNAME = "columnar"
+HAS_PYARROW = importlib.util.find_spec("pyarrow") is not None
+SNAPSHOT_EXTENSION = ".parquet"
+VERSION_EXTENSION = ".version"
+
+CATEGORICAL_COLUMNS = {
+    "marketing_activities": ["marketer_username", "activity_type", "status"],
+    "followups": ["marketer_username", "status_update"],
+    "users": ["role"],
+}
+DATETIME_COLUMNS = epoch_fields.TEMPORAL_FIELDS
+_WIB_OFFSET_SECONDS = int(epoch_fields.WIB.utcoffset(None).total_seconds())
+
+
+def build_frame(table_name, records, columns):
+    """Builds the typed DataFrame of table_name from a list of record dicts.
+    columns are always present, even for an empty table."""
+    frame = pd.DataFrame.from_records(records) if records else pd.DataFrame()
+    for column in columns:
+        if column not in frame.columns:
+            frame[column] = None
+    for column in DATETIME_COLUMNS.get(table_name, []):
+        epoch_column = epoch_fields.epoch_column(column)
+        if epoch_column in frame.columns: # Integer companions: no string parsing
+            seconds = pd.to_numeric(frame.pop(epoch_column), errors="coerce")
+            frame[column] = pd.to_datetime(seconds + _WIB_OFFSET_SECONDS, unit="s")
+        else:
+            frame[column] = pd.to_datetime(frame[column], format="ISO8601", errors="coerce")
+    for column in CATEGORICAL_COLUMNS.get(table_name, []):
+        frame[column] = frame[column].astype("category")
+    return frame
+
+
+def concat_frames(table_name, frames, columns):
+    """Concatenates per-partition frames, restoring the categorical columns
+    (pd.concat falls back to object when the categories differ)."""
+    if not frames:
+        return build_frame(table_name, [], columns)
+    frame = pd.concat(frames, ignore_index=True)
+    for column in CATEGORICAL_COLUMNS.get(table_name, []):
+        frame[column] = frame[column].astype("category")
+    return frame
+
+
+def drop_unused_categories(frame):
+    """Drops categories without rows (e.g. after filtering one marketer), so
+    value_counts() only reports values that occur. Modifies frame in place."""
+    for column in frame.select_dtypes("category").columns:
+        frame[column] = frame[column].cat.remove_unused_categories()
+    return frame
+
+
+def _snapshot_paths(snapshot_dir, table_name):
+    base = os.path.join(snapshot_dir, table_name)
+    return base + SNAPSHOT_EXTENSION, base + VERSION_EXTENSION
+
+
+def load_snapshot(snapshot_dir, table_name, version_key):
+    """Returns the persisted frame of table_name if it was saved for
+    version_key, otherwise None."""
+    if not HAS_PYARROW:
+        return None
+    data_path, version_path = _snapshot_paths(snapshot_dir, table_name)
+    try:
+        with open(version_path, "r", encoding="utf-8") as file:
+            if file.read() != version_key:
+                return None
+        return pd.read_parquet(data_path)
+    except Exception as e: # Missing or unreadable snapshot: rebuild
+        if not isinstance(e, FileNotFoundError):
+            print(f"Warning: Ignoring columnar snapshot of {table_name}: {e}")
+        return None
+
+
+def save_snapshot(snapshot_dir, table_name, version_key, frame):
+    """Persists frame for version_key. The version file is removed first and
+    written last, so a crash in between never pairs old data with a new
+    version. Returns True on success, False also without pyarrow."""
+    if not HAS_PYARROW:
+        return False
+    data_path, version_path = _snapshot_paths(snapshot_dir, table_name)
+    try:
+        os.makedirs(snapshot_dir, exist_ok=True)
+        if os.path.exists(version_path):
+            os.remove(version_path)
+        temp_path = data_path + ".tmp"
+        frame.to_parquet(temp_path, index=False)
+        os.replace(temp_path, data_path)
+        with open(version_path, "w", encoding="utf-8") as file:
+            file.write(version_key)
+        return True
+    except Exception as e: # e.g. values pyarrow cannot store; the in-memory frame still works
+        print(f"Warning: Could not save columnar snapshot of {table_name}: {e}")
+        return False
+
+
+def clear_snapshots(snapshot_dir):
+    """Removes all persisted snapshots (used when data files are replaced)."""
+    if not os.path.isdir(snapshot_dir):
+        return
+    for filename in os.listdir(snapshot_dir):
+        if filename.endswith(VERSION_EXTENSION):
+            os.remove(os.path.join(snapshot_dir, filename))
@@ -7,21 +7,26 @@ Includes hooks for manual sync/restore operations.
 """
 
 import os
+import threading
 import yaml
 from datetime import datetime
 # Import the main sync instance getter
 from google_sheets_sync import get_sync_instance 
+from sync_worker import SyncWorker
 
 # Original data functions from utils.py
 from utils_with_edit_delete import (
     add_marketing_activity as original_add_marketing_activity,
+    add_marketing_activities_bulk as original_add_marketing_activities_bulk,
     edit_marketing_activity as original_edit_marketing_activity,
     delete_marketing_activity as original_delete_marketing_activity,
     add_followup as original_add_followup,
     add_user as original_add_user,
     delete_user as original_delete_user,
     update_app_config as original_update_app_config,
-    get_app_config # Needed for last sync time
+    archive_closed_activities as original_archive_closed_activities,
+    get_app_config, # Needed for last sync time
+    enable_sync_outbox
 )
 
 # Constants
@@ -29,25 +34,45 @@ DATA_DIR = "data"
 TABLES = ["marketing_activities", "followups", "users", "config"]
 
 # --- Helper function for triggering sync --- 
-def _trigger_incremental_sync(table_name):
-    """Attempts to trigger an incremental sync for the specified table(s)."""
-    print(f"Data change detected for 	{table_name}	. Triggering incremental sync...")
-    try:
+# Background and manual syncs share one client; never run two at once
+_sheets_lock = threading.Lock()
+
+def _sync_changed_tables(table_names):
+    """Runs one incremental sync of the changed tables (None = all tables) for
+    a burst of changes (called by the sync worker)."""
+    with _sheets_lock:
         sync_instance = get_sync_instance()
-        if sync_instance:
-            # Call sync_all_data with incremental=True. 
-            # This will sync ALL tables incrementally, ensuring consistency.
-            # A more targeted sync (e.g., sync_instance.sync_data(table_name, incremental=True))
-            # could be implemented in google_sheets_sync.py if needed for performance.
-            success, message = sync_instance.sync_all_data(incremental=True)
-            if success:
-                print(f"Incremental sync successful after change in 	{table_name}	.")
-            else:
-                print(f"Incremental sync failed after change in 	{table_name}	: {message}")
-        else:
-            print("Failed to get sync instance. Cannot trigger sync.")
-    except Exception as e:
-        print(f"Error triggering incremental sync after change in 	{table_name}	: {e}")
+        if not sync_instance:
+            return False, "Failed to get sync instance. Cannot sync."
+        # Only the worksheets of the changed tables are touched
+        return sync_instance.sync_all_data(incremental=True, table_names=table_names)
+
+# Writes in this process record row changes for the incremental sync (see sync_outbox.py)
+enable_sync_outbox()
+
+# Syncs in a background thread, so form submits return right after the local write
+_sync_worker = SyncWorker(_sync_changed_tables)
+
+def _trigger_incremental_sync(*table_names):
+    """Queues an incremental sync for the specified table(s) without waiting for it."""
+    print(f"Data change detected for {', '.join(table_names)}. Queueing incremental sync...")
+    for table_name in table_names:
+        _sync_worker.submit(table_name)
+
+def flush_pending_sync(timeout=None):
+    """Blocks until the queued changes have been synced, for callers that exit
+    right after writing (the worker is a daemon thread). Returns (success,
+    message); False when the timeout passed or the last sync failed."""
+    if not _sync_worker.wait_idle(timeout):
+        return False, "Sinkronisasi Google Sheets belum selesai."
+    last_error = _sync_worker.status()["last_error"]
+    if last_error:
+        return False, f"Sinkronisasi Google Sheets gagal: {last_error}"
+    return True, "Sinkronisasi Google Sheets selesai."
+
+def get_sync_status():
+    """Queue depth and last successful flush time of the background sync (see sync_worker.py)."""
+    return _sync_worker.status()
 
 # --- Wrapped Data Modification Functions --- 
 
@@ -64,6 +89,13 @@ def add_marketing_activity(marketer_username, prospect_name, prospect_location,
         _trigger_incremental_sync("marketing_activities")
     return success, message, activity_id
 
+def add_marketing_activities_bulk(records):
+    """Wrapper for add_marketing_activities_bulk that syncs once for the whole batch."""
+    success, message, activity_ids = original_add_marketing_activities_bulk(records)
+    if success:
+        _trigger_incremental_sync("marketing_activities")
+    return success, message, activity_ids
+
 def edit_marketing_activity(activity_id, prospect_name, prospect_location, 
                            contact_person, contact_position, contact_phone, 
                            contact_email, activity_date, activity_type, description, status):
@@ -77,12 +109,12 @@ def edit_marketing_activity(activity_id, prospect_name, prospect_location,
         _trigger_incremental_sync("marketing_activities")
     return success, message
 
-def delete_marketing_activity(activity_id):
+def delete_marketing_activity(activity_id, deleted_by=None):
     """Wrapper for delete_marketing_activity that triggers Google Sheets sync."""
-    success, message = original_delete_marketing_activity(activity_id)
+    success, message = original_delete_marketing_activity(activity_id, deleted_by)
     if success:
         # Sync both tables as deletion affects both
-        _trigger_incremental_sync("marketing_activities and followups") 
+        _trigger_incremental_sync("marketing_activities", "followups")
     return success, message
 
 def add_followup(activity_id, marketer_username, followup_date, notes, 
@@ -93,9 +125,17 @@ def add_followup(activity_id, marketer_username, followup_date, notes,
         next_action, next_followup_date, interest_level, status_update
     )
     if success:
-        _trigger_incremental_sync("followups")
+        # The follow-up also updates the status of its activity
+        _trigger_incremental_sync("followups", "marketing_activities")
     return success, message
 
+def archive_closed_activities(older_than_days=None):
+    """Wrapper for archive_closed_activities that syncs the shrunken tables."""
+    success, message, archived_count = original_archive_closed_activities(older_than_days)
+    if success and archived_count:
+        _trigger_incremental_sync("marketing_activities", "followups")
+    return success, message, archived_count
+
 def add_user(username, password, name, role, email):
     """Wrapper for add_user that triggers Google Sheets sync."""
     success, message = original_add_user(username, password, name, role, email)
@@ -130,7 +170,8 @@ def manual_sync_all(incremental=False):
         sync_instance = get_sync_instance()
         if not sync_instance:
              return False, "Failed to get Google Sheets sync instance."
-        success, message = sync_instance.sync_all_data(incremental=incremental)
+        with _sheets_lock:
+            success, message = sync_instance.sync_all_data(incremental=incremental)
         return success, message 
     except Exception as e:
         return False, f"Error during manual sync: {e}"
@@ -141,7 +182,8 @@ def manual_restore_one(table_name):
         sync_instance = get_sync_instance()
         if not sync_instance:
              return False, "Failed to get Google Sheets sync instance."
-        success, message = sync_instance.restore_data(table_name)
+        with _sheets_lock:
+            success, message = sync_instance.restore_data(table_name)
         return success, message
     except Exception as e:
         return False, f"Error restoring table 	{table_name}	: {e}"
@@ -154,7 +196,8 @@ def manual_restore_all(tab_name=None):
         sync_instance = get_sync_instance()
         if not sync_instance:
              return False, "Failed to get Google Sheets sync instance."
-        success, message = sync_instance.restore_all_data()
+        with _sheets_lock:
+            success, message = sync_instance.restore_all_data()
         return success, message
     except Exception as e:
         return False, f"Error restoring all data: {e}"
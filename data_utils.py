@@ -1,8 +1,23 @@
 import os
+import csv
 import yaml
 import shutil
 import datetime
-import pandas as pd # Import pandas here
+from utils_with_edit_delete import (
+    invalidate_yaml_cache, iter_table_records, run_migrations, apply_partition_layout,
+    exclusive_data_access, SCHEMA_FILENAME, PARTITIONED_TABLES, MANIFEST_FILENAME,
+    WRITE_LOCK_BUSY_MESSAGE
+)
+from write_lock import WriteLockTimeout
+from yaml_journal import JOURNAL_SUFFIX
+import sqlite_backend
+from cold_archive import ARCHIVE_DIRNAME
+from yaml_stream import iter_records, TableStructureError
+
+# File data yang ikut dibackup: snapshot YAML dan journal yang belum dipadatkan
+DATA_FILE_SUFFIXES = (".yaml", JOURNAL_SUFFIX)
+# Folder data yang ikut dibackup: partisi bulanan (data/<tabel>/) dan arsip (data/archive/)
+DATA_DIRNAMES = tuple(PARTITIONED_TABLES) + (ARCHIVE_DIRNAME,)
 
 # Fungsi untuk membuat backup data
 def backup_data():
@@ -25,14 +40,23 @@ def backup_data():
         backup_folder = os.path.join(backup_dir, f"backup_{timestamp}")
         os.makedirs(backup_folder)
         
-        # Salin semua file YAML ke folder backup
+        # Salin semua file YAML (dan journal) ke folder backup
         copied_files = 0
         for filename in os.listdir(data_dir):
-            if filename.endswith(".yaml"):
+            if filename.endswith(DATA_FILE_SUFFIXES):
                 src_file = os.path.join(data_dir, filename)
                 dst_file = os.path.join(backup_folder, filename)
                 shutil.copy2(src_file, dst_file)
                 copied_files += 1
+            elif filename == sqlite_backend.DB_FILENAME:
+                # Salinan konsisten lewat backup API (aman walau ada file WAL)
+                sqlite_backend.backup_to(os.path.join(data_dir, filename),
+                                         os.path.join(backup_folder, filename))
+                copied_files += 1
+            elif filename in DATA_DIRNAMES and os.path.isdir(os.path.join(data_dir, filename)):
+                # Folder partisi bulanan (data/<tabel>/YYYY-MM.yaml + manifest) dan arsip
+                shutil.copytree(os.path.join(data_dir, filename), os.path.join(backup_folder, filename))
+                copied_files += 1
         
         if copied_files > 0:
             # Zip the backup folder
@@ -75,15 +99,43 @@ def restore_data(backup_zip_file):
         if not os.path.exists(data_dir):
             os.makedirs(data_dir)
             
-        # Salin semua file YAML dari folder hasil ekstrak ke direktori data
-        restored_files = 0
-        for filename in os.listdir(temp_extract_dir):
-            if filename.endswith(".yaml"):
-                src_file = os.path.join(temp_extract_dir, filename)
-                dst_file = os.path.join(data_dir, filename)
-                shutil.copy2(src_file, dst_file)
-                restored_files += 1
+        # Penulis lain menunggu selama file data diganti; versi semua tabel
+        # dinaikkan sehingga proses lain membuang cache-nya
+        with exclusive_data_access():
+            # Journal lokal tidak boleh diputar ulang di atas snapshot hasil restore,
+            # dan versi skema lokal belum tentu berlaku untuk backup lama
+            for filename in os.listdir(data_dir):
+                if filename.endswith(JOURNAL_SUFFIX) or filename == SCHEMA_FILENAME:
+                    os.remove(os.path.join(data_dir, filename))
+                elif filename in DATA_DIRNAMES and os.path.isdir(os.path.join(data_dir, filename)):
+                    # Partisi lokal akan menutupi file datar dari backup; arsip lokal
+                    # bisa berisi data yang di backup masih aktif
+                    shutil.rmtree(os.path.join(data_dir, filename))
+
+            # Salin semua file YAML (dan journal) dari folder hasil ekstrak ke direktori data
+            restored_files = 0
+            for filename in os.listdir(temp_extract_dir):
+                if filename.endswith(DATA_FILE_SUFFIXES):
+                    src_file = os.path.join(temp_extract_dir, filename)
+                    dst_file = os.path.join(data_dir, filename)
+                    # Lewat file sementara + rename: pembaca melihat file lama atau file hasil restore, tidak pernah salinan setengah jadi
+                    shutil.copy2(src_file, dst_file + ".restore.tmp")
+                    os.replace(dst_file + ".restore.tmp", dst_file)
+                    restored_files += 1
+                elif filename == sqlite_backend.DB_FILENAME:
+                    # Ditulis ke koneksi yang sedang terbuka, bukan menimpa file .db
+                    sqlite_backend.restore_from(os.path.join(data_dir, filename),
+                                                os.path.join(temp_extract_dir, filename))
+                    restored_files += 1
+                elif filename in DATA_DIRNAMES and os.path.isdir(os.path.join(temp_extract_dir, filename)):
+                    shutil.copytree(os.path.join(temp_extract_dir, filename), os.path.join(data_dir, filename))
+                    restored_files += 1
                 
+            # copy2 mempertahankan mtime dari backup, jadi cache harus dibuang manual
+            invalidate_yaml_cache()
+            run_migrations()
+            apply_partition_layout() # Samakan layout backup dengan partition_by_month
+
         # Hapus temporary directory
         shutil.rmtree(temp_extract_dir)
         
@@ -92,6 +144,11 @@ def restore_data(backup_zip_file):
         else:
             return False, "Tidak ada file data yang ditemukan dalam backup."
             
+    except WriteLockTimeout as e:
+        print(f"Error in restore_data: {e}")
+        if os.path.exists(temp_extract_dir):
+            shutil.rmtree(temp_extract_dir)
+        return False, WRITE_LOCK_BUSY_MESSAGE
     except Exception as e:
         # Hapus temporary directory jika terjadi error
         if os.path.exists(temp_extract_dir):
@@ -124,36 +181,70 @@ def export_to_csv(data_type):
     else:
         return False, "Tipe data export tidak valid.", None
 
+    csv_file_path = os.path.join(exports_dir, csv_filename)
     try:
-        # Baca data dari YAML
-        if not os.path.exists(yaml_file):
+        # Sumber data (termasuk perubahan di journal dan partisi bulanan)
+        partition_manifest = os.path.join(data_dir, data_key, MANIFEST_FILENAME)
+        if not os.path.exists(yaml_file) and not os.path.exists(partition_manifest):
             return False, f"File data {os.path.basename(yaml_file)} tidak ditemukan.", None
-            
-        with open(yaml_file, 'r', encoding='utf-8') as file:
-            yaml_data = yaml.safe_load(file)
-            
-        if not yaml_data or data_key not in yaml_data or not yaml_data[data_key]:
-            return False, f"Tidak ada data {data_type} untuk diexport.", None
-            
-        data_list = yaml_data[data_key]
-        
-        # Konversi data ke DataFrame
-        df = pd.DataFrame(data_list)
         
         # Buat direktori exports jika belum ada
         if not os.path.exists(exports_dir):
             os.makedirs(exports_dir)
-            
-        csv_file_path = os.path.join(exports_dir, csv_filename)
         
-        # Simpan ke file CSV
-        df.to_csv(csv_file_path, index=False, encoding='utf-8')
+        # Tulis baris CSV satu per satu sambil membaca data secara streaming,
+        # sehingga memori tetap kecil berapa pun ukuran tabelnya
+        row_count = 0
+        with open(csv_file_path, 'w', newline='', encoding='utf-8') as file:
+            writer = csv.DictWriter(file, fieldnames=sqlite_backend.TABLE_COLUMNS[data_key], extrasaction='ignore')
+            writer.writeheader()
+            for record in iter_table_records(data_key):
+                if isinstance(record, dict):
+                    writer.writerow(record)
+                    row_count += 1
         
+        if row_count == 0:
+            os.remove(csv_file_path)
+            return False, f"Tidak ada data {data_type} untuk diexport.", None
         return True, f"Data {data_type} berhasil diexport ke {csv_filename}", csv_file_path
         
     except Exception as e:
+        if os.path.exists(csv_file_path):
+            os.remove(csv_file_path)
         return False, f"Gagal mengekspor data {data_type}: {str(e)}", None
 
+def _table_yaml_files(data_dir, table_name):
+    """Daftar (nama tampilan, path) file YAML sebuah tabel: file datar, atau
+    file partisi bulanan yang tercatat di manifest."""
+    manifest_file = os.path.join(data_dir, table_name, MANIFEST_FILENAME)
+    if not os.path.exists(manifest_file):
+        return [(f"{table_name}.yaml", os.path.join(data_dir, f"{table_name}.yaml"))]
+    with open(manifest_file, 'r', encoding='utf-8') as file:
+        manifest = yaml.safe_load(file) or {}
+    return [
+        (f"{table_name}/{info['file']}", os.path.join(data_dir, table_name, info['file']))
+        for info in (manifest.get("partitions") or {}).values()
+    ]
+
+def _validate_table_file(display_name, table_file, table_name, seen_ids, issues):
+    """Memeriksa struktur satu file tabel dan setiap datanya (dict dengan id
+    unik) sambil dibaca secara streaming. seen_ids dipakai bersama oleh
+    seluruh file partisi sebuah tabel."""
+    try:
+        for position, record in enumerate(iter_records(table_file, table_name), start=1):
+            if not isinstance(record, dict):
+                issues.append(f"{display_name}: data ke-{position} bukan dict.")
+                continue
+            record_id = record.get("id")
+            if not record_id:
+                issues.append(f"{display_name}: data ke-{position} tidak memiliki id.")
+            elif record_id in seen_ids:
+                issues.append(f"{display_name}: id {record_id} duplikat (data ke-{position}).")
+            else:
+                seen_ids.add(record_id)
+    except TableStructureError:
+        issues.append(f"Struktur data {display_name} tidak valid (harus dict dengan key '{table_name}' berisi list).")
+
 # Fungsi untuk validasi integritas data
 def validate_data_integrity():
     """
@@ -165,37 +256,28 @@ def validate_data_integrity():
     required_files = ["users.yaml", "marketing_activities.yaml", "followups.yaml", "config.yaml"]
     issues = []
 
-    # 1. Periksa keberadaan file
+    # 1. Periksa keberadaan file (tabel berpartisi cukup punya manifest)
     for filename in required_files:
         file_path = os.path.join(data_dir, filename)
+        table_name = filename[:-len(".yaml")]
+        if table_name in PARTITIONED_TABLES and os.path.exists(os.path.join(data_dir, table_name, MANIFEST_FILENAME)):
+            continue
         if not os.path.exists(file_path):
             issues.append(f"File tidak ditemukan: {filename}")
     
     if issues:
         return False, "Validasi gagal: File data penting hilang.", issues
 
-    # 2. Periksa struktur data dasar
+    # 2. Periksa struktur data dasar dan setiap data (dibaca streaming)
     try:
         # Users
-        users_file = os.path.join(data_dir, "users.yaml")
-        with open(users_file, 'r', encoding='utf-8') as file:
-            users_data = yaml.safe_load(file)
-        if not isinstance(users_data, dict) or "users" not in users_data or not isinstance(users_data["users"], list):
-            issues.append("Struktur data users.yaml tidak valid (harus dict dengan key 'users' berisi list).")
+        _validate_table_file("users.yaml", os.path.join(data_dir, "users.yaml"), "users", set(), issues)
         
-        # Activities
-        activities_file = os.path.join(data_dir, "marketing_activities.yaml")
-        with open(activities_file, 'r', encoding='utf-8') as file:
-            activities_data = yaml.safe_load(file)
-        if not isinstance(activities_data, dict) or "marketing_activities" not in activities_data or not isinstance(activities_data["marketing_activities"], list):
-            issues.append("Struktur data marketing_activities.yaml tidak valid (harus dict dengan key 'marketing_activities' berisi list).")
-        
-        # Followups
-        followups_file = os.path.join(data_dir, "followups.yaml")
-        with open(followups_file, 'r', encoding='utf-8') as file:
-            followups_data = yaml.safe_load(file)
-        if not isinstance(followups_data, dict) or "followups" not in followups_data or not isinstance(followups_data["followups"], list):
-            issues.append("Struktur data followups.yaml tidak valid (harus dict dengan key 'followups' berisi list).")
+        # Activities dan Followups (file datar atau setiap partisi bulanan)
+        for table_name in ("marketing_activities", "followups"):
+            seen_ids = set()
+            for display_name, table_file in _table_yaml_files(data_dir, table_name):
+                _validate_table_file(display_name, table_file, table_name, seen_ids, issues)
         
         # Config
         config_file = os.path.join(data_dir, "config.yaml")
@@ -203,6 +285,13 @@ def validate_data_integrity():
             config_data = yaml.safe_load(file)
         if not isinstance(config_data, dict):
             issues.append("Struktur data config.yaml tidak valid (harus dict).")
+        # Database SQLite (jika ada)
+        db_file = os.path.join(data_dir, sqlite_backend.DB_FILENAME)
+        if os.path.exists(db_file):
+            db_status = sqlite_backend.integrity_check(db_file)
+            if db_status != "ok":
+                issues.append(f"Database {sqlite_backend.DB_FILENAME} rusak: {db_status}")
+
         # Add more specific config checks if needed, e.g., presence of certain keys
         # required_config_keys = ["app_name", "company_name"]
         # for key in required_config_keys:
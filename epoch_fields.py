@@ -0,0 +1,85 @@
+"""
+Integer Epoch Companions of the Date and Timestamp Fields
+
+Dates ("YYYY-MM-DD") and timestamps ("YYYY-MM-DD HH:MM:SS") are stored as
+WIB display strings. Every such field also gets an integer companion
+<field>_ts holding the same moment in UTC epoch seconds (dates: WIB
+midnight), e.g. created_at -> created_at_ts. utils_with_edit_delete fills
+the companions on every write and a schema migration backfills existing
+rows, so range filters, sorts and dashboards compare integers instead of
+parsing strings on the read path.
+
+A companion is None when its field is empty or not a recognizable date.
+"""
+
+from datetime import date, datetime, timedelta, timezone
+
+WIB = timezone(timedelta(hours=7)) # Asia/Bangkok, no daylight saving time
+EPOCH_SUFFIX = "_ts"
+
+TEMPORAL_FIELDS = {
+    "marketing_activities": ("activity_date", "created_at", "updated_at"),
+    "followups": ("followup_date", "next_followup_date", "created_at"),
+    "users": ("created_at",),
+}
+
+
+def epoch_column(field):
+    return field + EPOCH_SUFFIX
+
+
+EPOCH_COLUMNS = {
+    table_name: [epoch_column(field) for field in fields]
+    for table_name, fields in TEMPORAL_FIELDS.items()
+}
+
+
+def to_epoch(value):
+    """UTC epoch seconds of a WIB date/timestamp string, date or datetime
+    (naive = WIB). None for empty or unparseable values."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime):
+        moment = value
+    elif isinstance(value, date):
+        moment = datetime(value.year, value.month, value.day)
+    else:
+        try:
+            moment = datetime.fromisoformat(str(value).strip())
+        except ValueError:
+            return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=WIB)
+    return int(moment.timestamp())
+
+
+def from_epoch(seconds):
+    """Naive WIB datetime of epoch seconds (inverse of to_epoch)."""
+    return datetime.fromtimestamp(seconds, WIB).replace(tzinfo=None)
+
+
+def with_epochs(table_name, record):
+    """Returns a copy of record with the companions of its temporal fields
+    set from their current values."""
+    record = dict(record)
+    for field in TEMPORAL_FIELDS.get(table_name, ()):
+        record[epoch_column(field)] = to_epoch(record.get(field))
+    return record
+
+
+def epoch_changes(table_name, changes):
+    """Returns changes plus the companions of the temporal fields it sets."""
+    fields = [field for field in TEMPORAL_FIELDS.get(table_name, ()) if field in changes]
+    if not fields:
+        return changes
+    return {**changes, **{epoch_column(field): to_epoch(changes[field]) for field in fields}}
+
+
+def stale_epochs(table_name, record):
+    """The companion values record should carry, if any differ from what it
+    has (for the backfill); otherwise an empty dict."""
+    return {
+        epoch_column(field): to_epoch(record.get(field))
+        for field in TEMPORAL_FIELDS.get(table_name, ())
+        if epoch_column(field) not in record or record.get(epoch_column(field)) != to_epoch(record.get(field))
+    }
@@ -14,10 +14,17 @@ import yaml
 import pandas as pd
 from datetime import datetime
 import pytz # Import pytz
+import time
 import streamlit as st
-import uuid  # For generating user IDs if missing
 import re # For cleaning phone numbers
 from utils_with_edit_delete import get_app_config, update_app_config # For last sync time
+from utils_with_edit_delete import read_yaml_data, write_yaml_data # Journal-aware table access
+from utils_with_edit_delete import generate_id # For generating user IDs if missing
+from utils_with_edit_delete import get_tombstones # Soft-deleted rows to remove from the sheets
+from utils_with_edit_delete import get_pending_sync_events, acknowledge_sync_events # Change outbox
+import sync_outbox
+import sheet_row_map
+import epoch_fields
 
 # Constants
 # Use the user-provided ID
@@ -87,6 +94,7 @@ class GoogleSheetsSync:
         self.spreadsheet_id = spreadsheet_id
         self.client = None
         self.spreadsheet = None
+        self._row_maps = {} # Worksheet key -> SheetRowMap (see sheet_row_map.py)
         self.connect()
 
     def connect(self):
@@ -240,10 +248,13 @@ class GoogleSheetsSync:
                 st.error(f"Error accessing worksheet '{target_sheet_name}': {e}")
             return None
 
-    def _format_value(self, value, header, table_name):
+    def _format_value(self, value, header, table_name, epoch=None):
         """Formats value based on header and table type for Google Sheets.
            Forces dates/timestamps and phone numbers to be treated as text.
            Ensures timestamps reflect WIB (as stored in YAML).
+           epoch is the record's integer companion of a date/timestamp field
+           (see epoch_fields.py); when set, the string is known to be valid
+           and is not parsed again.
         """
         # Handle None or empty strings
         if value is None or value == '':
@@ -256,6 +267,8 @@ class GoogleSheetsSync:
             
         # Date formatting: Format and prepend quote to force text
         if header in DATE_COLUMNS.get(table_name, []):
+            if epoch is not None and not isinstance(value, datetime):
+                return "'" + str(value)[:10] # Date part of a valid ISO string
             try:
                 if isinstance(value, datetime):
                     # This case might not happen often if YAML stores strings
@@ -274,6 +287,8 @@ class GoogleSheetsSync:
 
         # Timestamp formatting: Format (as WIB string from YAML) and prepend quote to force text
         if header in TIMESTAMP_COLUMNS.get(table_name, []):
+            if epoch is not None:
+                return "'" + str(value)
             try:
                 # Value from YAML should already be a WIB string like 'YYYY-MM-DD HH:MM:SS'
                 timestamp_str = str(value)
@@ -293,32 +308,119 @@ class GoogleSheetsSync:
         # Default: return as string (without quote unless specified above)
         return str(value)
 
-    def sync_data(self, table_name, incremental=False):
+    def _row_map_key(self, table_name):
+        return f"{self.spreadsheet_id}:{TABLE_MAP[table_name]}"
+
+    def _row_map(self, worksheet, table_name, expected_headers, verify=False):
+        """Returns (row map, verified): the id -> row map and row hashes of table_name's
+        worksheet (see sheet_row_map.py). The cached map is checked against the last
+        rows of the sheet. The whole sheet is read back instead when the map is
+        missing or stale, when verify is set, or when the last verification is
+        older than sheets_verify_interval_hours; verified is True then."""
+        key = self._row_map_key(table_name)
+        id_column_index = expected_headers.index('id')
+        row_map = self._row_maps.get(key) or sheet_row_map.load(DATA_DIR, key)
+        verify = verify or row_map is None
+        if not verify:
+            try:
+                interval = float(get_app_config().get("sheets_verify_interval_hours", sheet_row_map.DEFAULT_VERIFY_INTERVAL_HOURS))
+            except (TypeError, ValueError):
+                interval = sheet_row_map.DEFAULT_VERIFY_INTERVAL_HOURS
+            verify = row_map.verification_due(interval)
+        if not verify:
+            id_col_letter = gspread.utils.rowcol_to_a1(1, id_column_index + 1).rstrip('1')
+            verify = not row_map.matches_tail(worksheet.get(row_map.tail_range(id_col_letter)))
+        if verify:
+            print(f"Reading sheet '{TABLE_MAP[table_name]}' back to verify its rows.")
+            row_map = sheet_row_map.SheetRowMap.from_values(
+                worksheet.get_all_values(), id_column_index, len(expected_headers))
+        self._row_maps[key] = row_map
+        return row_map, verify
+
+    def _save_row_map(self, table_name, row_map):
+        """Keeps row_map for the next sync of table_name, also across restarts."""
+        key = self._row_map_key(table_name)
+        self._row_maps[key] = row_map
+        try:
+            sheet_row_map.save(DATA_DIR, key, row_map)
+        except OSError as e: # The map is rebuilt from the sheet after a restart
+            print(f"Warning: Could not save the row map of sheet '{TABLE_MAP[table_name]}': {e}")
+
+    def _apply_row_changes(self, worksheet, table_name, expected_headers, rows_by_id, row_map, events, repair=False):
+        """Brings the sheet rows of table_name in line with rows_by_id (id -> pushed row
+        values) using row-level operations. row_map (see sheet_row_map.py) is kept
+        in step:
+        - Rows whose content hash differs from the local row are rewritten in
+          place with one batch_update.
+        - Rows of records deleted or soft-deleted since the last sync (the change
+          outbox events, see sync_outbox.py) are removed. With repair, every row
+          whose id is not a local record or repeats an id is removed as well.
+
+        Returns:
+            tuple: (number of updated rows, number of deleted rows)
+        """
+        sheet_rows = row_map.rows
+        last_column = gspread.utils.rowcol_to_a1(1, len(expected_headers)).rstrip('1')
+        changed = {}
+        for row_id, values in rows_by_id.items():
+            if row_id in sheet_rows:
+                row_hash = sheet_row_map.row_hash(values)
+                if row_map.hashes.get(row_id) != row_hash:
+                    changed[row_id] = row_hash
+        updates = [
+            {'range': f'A{sheet_rows[row_id]}:{last_column}{sheet_rows[row_id]}', 'values': [rows_by_id[row_id]]}
+            for row_id in changed
+        ]
+        if updates:
+            worksheet.batch_update(updates, value_input_option='USER_ENTERED')
+            row_map.hashes.update(changed)
+
+        removed = set(sync_outbox.latest_events(events)) | {str(record.get('id')) for record in get_tombstones(table_name)}
+        if repair:
+            removed |= set(sheet_rows)
+        rows = {sheet_rows[row_id] for row_id in removed if row_id in sheet_rows and row_id not in rows_by_id}
+        if repair:
+            rows.update(row_map.duplicate_rows())
+        for row in sorted(rows, reverse=True): # Bottom-up, so the remaining row numbers stay valid
+            worksheet.delete_rows(row)
+            row_map.delete(row)
+        if updates or rows:
+            print(f"Updated {len(updates)} and deleted {len(rows)} {table_name} rows in sheet '{TABLE_MAP[table_name]}'.")
+        return len(updates), len(rows)
+
+    def sync_data(self, table_name, incremental=False, verify=False):
         """Sync data from a specific table's YAML file to its dedicated Google Sheet.
         
         Args:
             table_name (str): The internal name of the table to sync.
-            incremental (bool): If True, only append new records based on ID.
+            incremental (bool): If True, append new records based on ID, rewrite rows
+                                whose content hash changed and delete the rows of
+                                deleted records (see sheet_row_map.py).
                                 If False (default), overwrite the sheet (used for config).
+            verify (bool): With incremental, read the whole sheet back first and
+                           repair any drift from the local data.
         """
         print(f"Starting sync for table: {table_name} (Incremental: {incremental})")
         worksheet = self._get_target_sheet(table_name)
         if not worksheet:
             return False, f"Target sheet for {table_name} not found."
 
+        # Named in messages only: partitioned tables and the SQLite backend have no
+        # such file, and the rows are read through read_yaml_data below
         file_path = os.path.join(DATA_DIR, f"{table_name}.yaml")
-        if not os.path.exists(file_path):
-            print(
-                f"Data file not found: {file_path}, skipping sync for {table_name}."
-            )
-            return False, f"Data file {file_path} not found."
+
+        # Change events up to here are covered by the data read below
+        outbox_events, outbox_offset = get_pending_sync_events(table_name) if table_name != 'config' else ([], 0)
+        if sync_outbox.overflowed(outbox_events):
+            print(f"Change outbox of {table_name} overflowed; reconciling the whole sheet.")
+            verify = True # Changes after the overflow have no events
 
         # Read data from YAML
         data_to_sync = []
         config_data_dict = {}
         try:
-            with open(file_path, 'r', encoding='utf-8') as file:
-                raw_data = yaml.safe_load(file)
+            # Read through the utils layer so uncompacted journal entries are included
+            raw_data = read_yaml_data(table_name)
 
             if raw_data is None:
                 print(f"YAML file {file_path} is empty.")
@@ -393,11 +495,19 @@ class GoogleSheetsSync:
                          print(f"Clearing sheet '{TABLE_MAP[table_name]}' as part of overwrite sync.")
                          worksheet.clear()
                          worksheet.update('A1', [expected_headers], value_input_option='USER_ENTERED')
+                         self._save_row_map(table_name, sheet_row_map.SheetRowMap(['id'], verified_at=time.time()))
+                    elif 'id' in expected_headers:
+                         # The last records may have been deleted
+                         row_map, verified = self._row_map(worksheet, table_name, expected_headers, verify)
+                         self._apply_row_changes(worksheet, table_name, expected_headers, {}, row_map, outbox_events, repair=verified)
+                         self._save_row_map(table_name, row_map)
+                    acknowledge_sync_events(table_name, outbox_offset)
                     return True, msg
 
                 # Prepare data rows from YAML
                 yaml_rows = []
                 yaml_ids = set()
+                rows_by_id = {}
                 id_column_index = expected_headers.index('id') if 'id' in expected_headers else -1
 
                 for item in data_to_sync:
@@ -410,7 +520,7 @@ class GoogleSheetsSync:
                     # Ensure ID exists (especially for users)
                     if id_column_index != -1 and 'id' not in item:
                         if table_name == 'users':
-                            item['id'] = f"usr-{uuid.uuid4().hex[:8]}"
+                            item['id'] = generate_id("usr")
                             print(
                                 f"Generated missing ID for user: {item.get('username', 'N/A')} -> {item['id']}"
                             )
@@ -425,9 +535,13 @@ class GoogleSheetsSync:
                     row_values = []
                     for header in expected_headers:
                         value = item.get(header, "")
-                        formatted_value = self._format_value(value, header, table_name)
+                        formatted_value = self._format_value(
+                            value, header, table_name, item.get(epoch_fields.epoch_column(header))
+                        )
                         row_values.append(formatted_value)
                     yaml_rows.append(row_values)
+                    if item_id:
+                        rows_by_id[str(item_id)] = row_values
 
                 if not yaml_rows:
                     msg = f"No valid data rows prepared from YAML for {table_name}. Nothing to sync."
@@ -437,19 +551,16 @@ class GoogleSheetsSync:
                          print(f"Clearing sheet '{TABLE_MAP[table_name]}' as part of overwrite sync.")
                          worksheet.clear()
                          worksheet.update('A1', [expected_headers], value_input_option='USER_ENTERED')
+                         self._save_row_map(table_name, sheet_row_map.SheetRowMap(['id'], verified_at=time.time()))
                     return True, msg
 
                 # --- Apply Sync Strategy --- 
                 if incremental and id_column_index != -1:
-                    # Incremental Append: Get existing IDs from sheet
-                    print(f"Performing incremental sync for {table_name}. Fetching existing IDs...")
+                    # Incremental Append: Get existing IDs from the sheet's row map
+                    print(f"Performing incremental sync for {table_name}. Checking existing IDs...")
                     try:
-                        # Get only the ID column (assuming it's the first column, index 1)
-                        # Adjust col_index if 'id' is not the first column
-                        id_col_letter = gspread.utils.rowcol_to_a1(1, id_column_index + 1).rstrip('1')
-                        existing_ids_raw = worksheet.col_values(id_column_index + 1)
-                        # Skip header row and remove potential leading quotes from formatted IDs
-                        existing_ids = {str(id_val).lstrip("'") for id_val in existing_ids_raw[1:] if id_val}
+                        row_map, verified = self._row_map(worksheet, table_name, expected_headers, verify)
+                        existing_ids = set(row_map.rows)
                         print(f"Found {len(existing_ids)} existing IDs in sheet '{TABLE_MAP[table_name]}'.")
                     except Exception as e:
                         msg = f"Error fetching existing IDs from sheet '{TABLE_MAP[table_name]}': {e}. Cannot perform incremental sync."
@@ -457,6 +568,14 @@ class GoogleSheetsSync:
                         if hasattr(st, 'secrets'): st.error(msg)
                         return False, msg
 
+                    # Changed rows and deletes, as row-level operations
+                    updated_count, deleted_count = self._apply_row_changes(
+                        worksheet, table_name, expected_headers, rows_by_id, row_map, outbox_events, repair=verified
+                    )
+                    changes_msg = ""
+                    if updated_count or deleted_count:
+                        changes_msg = f" Updated {updated_count} and deleted {deleted_count} rows of changed records."
+
                     # Filter YAML rows to find new ones
                     rows_to_append = []
                     for row in yaml_rows:
@@ -465,7 +584,9 @@ class GoogleSheetsSync:
                             rows_to_append.append(row)
                     
                     if not rows_to_append:
-                        msg = f"No new records found in YAML for {table_name} to append incrementally."
+                        self._save_row_map(table_name, row_map)
+                        acknowledge_sync_events(table_name, outbox_offset)
+                        msg = f"No new records found in YAML for {table_name} to append incrementally." + changes_msg
                         print(msg)
                         return True, msg
                     
@@ -477,7 +598,10 @@ class GoogleSheetsSync:
                                           value_input_option='USER_ENTERED',
                                           insert_data_option='INSERT_ROWS',
                                           table_range='A1')
-                    msg = f"Successfully appended {len(rows_to_append)} new rows for {table_name} incrementally."
+                    row_map.append(rows_to_append, id_column_index)
+                    self._save_row_map(table_name, row_map)
+                    acknowledge_sync_events(table_name, outbox_offset)
+                    msg = f"Successfully appended {len(rows_to_append)} new rows for {table_name} incrementally." + changes_msg
                     print(msg)
                     return True, msg
 
@@ -494,6 +618,10 @@ class GoogleSheetsSync:
                     worksheet.update(f'A1:{end_cell}',
                                      data_to_write,
                                      value_input_option='USER_ENTERED')
+                    if id_column_index != -1:
+                        self._save_row_map(table_name, sheet_row_map.SheetRowMap.from_values(
+                            data_to_write, id_column_index, len(expected_headers)))
+                    acknowledge_sync_events(table_name, outbox_offset) # The sheet now matches exactly
                     msg = f"Successfully synced {len(yaml_rows)} rows for {table_name} (overwrite)."
                     print(msg)
                     return True, msg
@@ -513,12 +641,15 @@ class GoogleSheetsSync:
                 )
             return False, msg
 
-    def sync_all_data(self, incremental=False):
+    def sync_all_data(self, incremental=False, table_names=None, verify=False):
         """Sync all tables based on the TABLE_MAP.
         
         Args:
             incremental (bool): If True, use incremental append for Activities, Followups, Users.
                                 Config is always overwritten.
+            table_names (iterable): Only sync these tables (None = all tables). Worksheets
+                                of the other tables are not touched.
+            verify (bool): With incremental, read each sheet back and repair drift.
         """
         if not self.spreadsheet:
             print("Not connected. Cannot sync all data.")
@@ -526,16 +657,18 @@ class GoogleSheetsSync:
             if not self.spreadsheet: return False, "Spreadsheet object missing after connect"
 
         results = {}
-        print(f"Starting sync for all mapped tables... (Incremental: {incremental})")
-        if hasattr(st, 'secrets'): st.info(f"Starting sync for all tables... (Incremental: {incremental})")
+        targets = [t for t in TABLE_MAP if table_names is None or t in table_names]
+        scope = "all tables" if table_names is None else ", ".join(targets)
+        print(f"Starting sync for {scope}... (Incremental: {incremental})")
+        if hasattr(st, 'secrets'): st.info(f"Starting sync for {scope}... (Incremental: {incremental})")
         all_success = True
         error_messages = []
         success_messages = []
-        for table_name in TABLE_MAP.keys():
+        for table_name in targets:
             print(f"--- Syncing {table_name} to sheet '{TABLE_MAP[table_name]}' ---")
             # Determine sync type for this table
             is_incremental = incremental and table_name != 'config'
-            sync_success, msg = self.sync_data(table_name, incremental=is_incremental)
+            sync_success, msg = self.sync_data(table_name, incremental=is_incremental, verify=verify)
             results[table_name] = sync_success
             print(f"--- Finished syncing {table_name} (Success: {sync_success}) ---")
             if sync_success:
@@ -545,15 +678,16 @@ class GoogleSheetsSync:
                 error_messages.append(f"{table_name}: {msg}")
                 if hasattr(st, 'secrets'): st.warning(f"Sync failed for {table_name}: {msg}")
 
-        print("Finished syncing all tables.")
+        print(f"Finished syncing {scope}.")
         final_message = ""
         if all_success:
-            final_message = f"Finished syncing all tables. Details: {'; '.join(success_messages)}"
+            final_message = f"Finished syncing {scope}. Details: {'; '.join(success_messages)}"
             if hasattr(st, 'secrets'): st.success(final_message)
-            # Update last sync time only if all tables succeeded
-            set_last_manual_sync_time()
+            # Update last sync time only if all tables were synced and succeeded
+            if table_names is None:
+                set_last_manual_sync_time()
         else:
-            final_message = f"Finished syncing all tables, but some tables failed: {'; '.join(error_messages)}"
+            final_message = f"Finished syncing {scope}, but some tables failed: {'; '.join(error_messages)}"
             if hasattr(st, 'secrets'): st.error(final_message)
         return all_success, final_message
 
@@ -590,11 +724,11 @@ class GoogleSheetsSync:
                     restored_list.append(processed_record)
                 final_restored_data = {table_name: restored_list}
 
-            # Save to YAML file
+            # Save to YAML file (replaces the snapshot and discards any local journal)
             file_path = os.path.join(DATA_DIR, f"{table_name}.yaml")
             try:
-                with open(file_path, 'w', encoding='utf-8') as file:
-                    yaml.dump(final_restored_data, file, default_flow_style=False, sort_keys=False, allow_unicode=True)
+                if not write_yaml_data(table_name, final_restored_data):
+                    raise IOError("write_yaml_data reported a failure")
                 msg = f"Successfully restored {table_name} to {file_path}"
                 print(msg)
                 if hasattr(st, 'secrets'): st.success(f"Successfully restored {table_name} from Google Sheet '{TABLE_MAP[table_name]}'.")
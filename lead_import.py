@@ -0,0 +1,165 @@
+"""
+Lead Import Module for AI Marketing Tracker
+
+Turns a purchased lead list (CSV or XLSX) into marketing activities. The file
+is validated column-wise with pandas: required fields, email format, activity
+date, status, and phone numbers normalized to text with their leading zero
+(085678912345 stays 085678912345, see validate_sync_phone_zero.py). Valid rows
+are saved with add_marketing_activities_bulk, i.e. one write and one sync.
+
+Command line:
+    python lead_import.py leads.xlsx --marketer andi [--dry-run] [--sync]
+"""
+
+import os
+import sys
+import pandas as pd
+
+from utils_with_edit_delete import ACTIVITY_REQUIRED_FIELDS, ACTIVITY_OPTIONAL_FIELDS
+
+IMPORT_COLUMNS = ACTIVITY_REQUIRED_FIELDS + ACTIVITY_OPTIONAL_FIELDS + ["status"]
+VALID_STATUSES = ["baru", "dalam_proses", "berhasil", "gagal"]
+EMAIL_PATTERN = r"^[^@\s]+@[^@\s]+\.[A-Za-z]{2,}$"
+PHONE_PATTERN = r"^\+?\d{7,15}$"
+SYNC_TIMEOUT_SECONDS = 300 # Longest wait for the Google Sheets sync of --sync
+
+
+def read_leads_file(source, filename=None):
+    """Reads a CSV/XLSX lead list with every cell as text, so phone numbers keep
+    their leading zero. source may be a path or an uploaded file object.
+    Raises ValueError for unsupported files."""
+    name = filename or getattr(source, "name", None) or str(source)
+    extension = os.path.splitext(name)[1].lower()
+    if extension == ".csv":
+        leads_df = pd.read_csv(source, dtype=str, keep_default_na=False)
+    elif extension in (".xlsx", ".xls"):
+        try:
+            leads_df = pd.read_excel(source, dtype=str, keep_default_na=False)
+        except ImportError as e:
+            raise ValueError(f"Membaca file Excel membutuhkan paket openpyxl: {e}")
+    else:
+        raise ValueError(f"Format file {extension or name} tidak didukung. Gunakan CSV atau XLSX.")
+    # "Prospect Name" / "prospect_name" / " PROSPECT_NAME " all map to prospect_name
+    leads_df.columns = [str(column).strip().lower().replace(" ", "_") for column in leads_df.columns]
+    return leads_df
+
+
+def normalize_phone(phones):
+    """Normalizes a Series of phone numbers to digit strings: drops separators
+    and a trailing ".0" from spreadsheet floats, turns +62/62 into 0 and puts
+    back the 0 that spreadsheets strip from numbers like 85678912345."""
+    cleaned = phones.fillna("").astype(str).str.strip()
+    cleaned = cleaned.str.replace(r"\.0$", "", regex=True)
+    cleaned = cleaned.str.replace(r"[\s\-().]", "", regex=True)
+    cleaned = cleaned.str.replace(r"^\+?62", "0", regex=True)
+    return cleaned.mask(cleaned.str.match(r"^8\d"), "0" + cleaned)
+
+
+def validate_leads(leads_df, marketer_username=None):
+    """Validates and normalizes a lead DataFrame.
+
+    Args:
+        leads_df (DataFrame): Output of read_leads_file.
+        marketer_username (str): Used for rows without marketer_username.
+
+    Returns:
+        tuple: (valid_df, errors_df). valid_df holds the normalized
+        IMPORT_COLUMNS of the valid rows; errors_df lists "baris" (row number
+        in the file, header = 1) and "kesalahan" for every problem found.
+    """
+    leads_df = leads_df.copy()
+    for column in IMPORT_COLUMNS:
+        if column not in leads_df.columns:
+            leads_df[column] = ""
+    leads_df = leads_df[IMPORT_COLUMNS].fillna("").astype(str).apply(lambda column: column.str.strip())
+    leads_df.index = pd.RangeIndex(2, len(leads_df) + 2) # Row numbers as seen in a spreadsheet
+
+    if marketer_username:
+        leads_df["marketer_username"] = leads_df["marketer_username"].mask(
+            leads_df["marketer_username"] == "", marketer_username
+        )
+    leads_df["contact_phone"] = normalize_phone(leads_df["contact_phone"])
+    leads_df["status"] = (
+        leads_df["status"].str.lower().str.replace(" ", "_").mask(leads_df["status"] == "", "baru")
+    )
+    activity_dates = pd.to_datetime(leads_df["activity_date"], errors="coerce")
+    leads_df["activity_date"] = activity_dates.dt.strftime("%Y-%m-%d").fillna(leads_df["activity_date"])
+
+    checks = [(leads_df[field] == "", f"{field} wajib diisi") for field in ACTIVITY_REQUIRED_FIELDS]
+    checks += [
+        ((leads_df["activity_date"] != "") & activity_dates.isna(), "activity_date bukan tanggal yang valid"),
+        ((leads_df["contact_phone"] != "") & ~leads_df["contact_phone"].str.match(PHONE_PATTERN),
+         "contact_phone bukan nomor telepon yang valid"),
+        ((leads_df["contact_email"] != "") & ~leads_df["contact_email"].str.match(EMAIL_PATTERN),
+         "contact_email bukan alamat email yang valid"),
+        (~leads_df["status"].isin(VALID_STATUSES), f"status harus salah satu dari {', '.join(VALID_STATUSES)}"),
+    ]
+    invalid = pd.Series(False, index=leads_df.index)
+    error_frames = []
+    for mask, message in checks:
+        invalid |= mask
+        if mask.any():
+            error_frames.append(pd.DataFrame({"baris": leads_df.index[mask], "kesalahan": message}))
+    if error_frames:
+        errors_df = pd.concat(error_frames).sort_values("baris", kind="stable").reset_index(drop=True)
+    else:
+        errors_df = pd.DataFrame(columns=["baris", "kesalahan"])
+    return leads_df[~invalid], errors_df
+
+
+def import_leads(source, marketer_username=None, dry_run=False, bulk_insert=None):
+    """Reads, validates and saves a lead list. Invalid rows are skipped.
+
+    Args:
+        bulk_insert (callable): Defaults to add_marketing_activities_bulk; pass
+            the data_hooks version to sync the batch to Google Sheets.
+
+    Returns:
+        tuple: (success, message, errors_df)
+    """
+    try:
+        leads_df = read_leads_file(source)
+    except (ValueError, OSError) as e:
+        return False, str(e), pd.DataFrame(columns=["baris", "kesalahan"])
+    valid_df, errors_df = validate_leads(leads_df, marketer_username)
+    if valid_df.empty:
+        return False, "Tidak ada baris valid untuk diimpor.", errors_df
+    if dry_run:
+        return True, f"{len(valid_df)} baris valid, {len(leads_df) - len(valid_df)} baris dilewati (uji coba, tidak disimpan).", errors_df
+    if bulk_insert is None:
+        from utils_with_edit_delete import add_marketing_activities_bulk as bulk_insert
+    success, message, _ = bulk_insert(valid_df.to_dict("records"))
+    if success and not errors_df.empty:
+        message += f" ({len(leads_df) - len(valid_df)} baris dilewati karena tidak valid)"
+    return success, message, errors_df
+
+
+def _main(argv):
+    import argparse
+    parser = argparse.ArgumentParser(description="Impor daftar leads (CSV/XLSX) sebagai aktivitas pemasaran")
+    parser.add_argument("file", help="Path file CSV atau XLSX")
+    parser.add_argument("--marketer", help="Username marketing untuk baris tanpa marketer_username")
+    parser.add_argument("--dry-run", action="store_true", help="Hanya validasi, jangan simpan")
+    parser.add_argument("--sync", action="store_true", help="Sinkronkan ke Google Sheets setelah impor")
+    args = parser.parse_args(argv)
+
+    from utils_with_edit_delete import initialize_database
+    initialize_database()
+    bulk_insert = None
+    if args.sync:
+        from data_hooks import add_marketing_activities_bulk as bulk_insert
+    success, message, errors_df = import_leads(args.file, args.marketer, args.dry_run, bulk_insert)
+    for row in errors_df.itertuples(index=False):
+        print(f"Baris {row.baris}: {row.kesalahan}")
+    print(message)
+    if args.sync and success:
+        # The sync runs on a daemon thread; wait for it before the process exits
+        from data_hooks import flush_pending_sync
+        synced, sync_message = flush_pending_sync(timeout=SYNC_TIMEOUT_SECONDS)
+        print(sync_message)
+        success = success and synced
+    return 0 if success else 1
+
+
+if __name__ == "__main__":
+    sys.exit(_main(sys.argv[1:]))
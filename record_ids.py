@@ -0,0 +1,85 @@
+"""
+Time-Ordered Record IDs
+
+New ids are "<prefix>-<ULID>": a 26-character Crockford base32 ULID made of
+the creation time in milliseconds (10 characters) and 80 random bits (16
+characters), e.g. act-01J9ZQ3V6M8X1T4KQ2N7B5R0CD. Ids of one prefix sort by
+creation time, so "latest N" and "created between" are range scans over the
+id. Ids generated within the same millisecond by this process increase
+monotonically (the random part is incremented).
+
+Ids written before this change are "<prefix>-<8 hex characters>" (random);
+parse_id recognizes them as legacy ids without a timestamp, and callers order
+them by created_at instead (see utils_with_edit_delete).
+"""
+
+import os
+import threading
+import time
+
+ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+TIME_LENGTH = 10
+RANDOM_LENGTH = 16
+ULID_LENGTH = TIME_LENGTH + RANDOM_LENGTH
+_RANDOM_MAX = (1 << 80) - 1
+_ALPHABET_SET = frozenset(ALPHABET)
+
+_lock = threading.Lock()
+_last = (-1, 0) # (milliseconds, random part) of the previous id
+
+
+def _encode(value, length):
+    chars = []
+    for _ in range(length):
+        value, remainder = divmod(value, 32)
+        chars.append(ALPHABET[remainder])
+    return "".join(reversed(chars))
+
+
+def _decode(text):
+    value = 0
+    for char in text:
+        value = value * 32 + ALPHABET.index(char)
+    return value
+
+
+def encode_time(milliseconds):
+    """The 10-character time part of the ids created at milliseconds (Unix epoch)."""
+    return _encode(max(0, int(milliseconds)), TIME_LENGTH)
+
+
+def new_id(prefix, milliseconds=None):
+    """Returns a new "<prefix>-<ULID>" id for the current (or given) time."""
+    global _last
+    if milliseconds is not None:
+        random_part = int.from_bytes(os.urandom(10), "big")
+        return f"{prefix}-{encode_time(milliseconds)}{_encode(random_part, RANDOM_LENGTH)}"
+    milliseconds = time.time_ns() // 1_000_000
+    with _lock:
+        last_ms, last_random = _last
+        if milliseconds <= last_ms and last_random < _RANDOM_MAX:
+            milliseconds, random_part = last_ms, last_random + 1 # Clock did not advance
+        else:
+            random_part = int.from_bytes(os.urandom(10), "big")
+        _last = (milliseconds, random_part)
+    return f"{prefix}-{encode_time(milliseconds)}{_encode(random_part, RANDOM_LENGTH)}"
+
+
+def parse_id(record_id):
+    """Splits an id into (prefix, creation time in milliseconds). The time is
+    None for legacy random ids and anything else that is not a ULID id."""
+    prefix, separator, body = str(record_id).partition("-")
+    if (separator and len(body) == ULID_LENGTH and body[0] <= "7"
+            and _ALPHABET_SET.issuperset(body)):
+        return prefix, _decode(body[:TIME_LENGTH])
+    return (prefix if separator else None), None
+
+
+def is_time_ordered(record_id):
+    return parse_id(record_id)[1] is not None
+
+
+def id_bound(prefix, milliseconds):
+    """The smallest possible id of prefix created at milliseconds: ids created
+    in [start, end) are exactly those with id_bound(start) <= id < id_bound(end)."""
+    return f"{prefix}-{encode_time(milliseconds)}{'0' * RANDOM_LENGTH}"
@@ -0,0 +1,156 @@
+"""
+Compact Record Model for the Data Tables
+
+Cached table rows are stored as Activity, Followup and User objects instead of
+dicts: one __slots__ attribute per column (see sqlite_backend.STORED_COLUMNS)
+and a lazily created dict for keys outside those columns. Low-cardinality
+values such as status, activity_type and marketer_username are interned, so
+thousands of rows share one string object per distinct value.
+
+Records behave like dicts (record["status"], record.get(...), iteration,
+dict(record), == against dicts, item assignment), so pages and the Google
+Sheets sync keep working unchanged. Records held by the table cache are never
+modified in place; utils_with_edit_delete replaces them and hands callers
+copies.
+"""
+
+import sys
+from collections.abc import Mapping, MutableMapping
+
+import yaml
+
+from sqlite_backend import STORED_COLUMNS
+
+_MISSING = object()
+
+
+class Record(MutableMapping):
+    """Base class: subclasses set __slots__ to FIELDS and list the
+    low-cardinality fields in INTERNED."""
+    __slots__ = ("_extra",)
+    FIELDS = ()
+    INTERNED = frozenset()
+    _FIELD_SET = frozenset()
+
+    def __init__(self, data=(), **kwargs):
+        self._extra = None
+        self.update(data, **kwargs)
+
+    @classmethod
+    def from_dict(cls, data):
+        record = cls.__new__(cls)
+        record._extra = None
+        for key, value in data.items():
+            record[key] = value
+        return record
+
+    def __getitem__(self, key):
+        if key in self._FIELD_SET:
+            value = getattr(self, key, _MISSING)
+            if value is not _MISSING:
+                return value
+        elif self._extra is not None and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key in self._FIELD_SET:
+            if key in self.INTERNED and type(value) is str:
+                value = sys.intern(value)
+            setattr(self, key, value)
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+
+    def __delitem__(self, key):
+        if key in self._FIELD_SET:
+            if getattr(self, key, _MISSING) is _MISSING:
+                raise KeyError(key)
+            delattr(self, key)
+        elif self._extra is not None and key in self._extra:
+            del self._extra[key]
+        else:
+            raise KeyError(key)
+
+    def __iter__(self):
+        for field in self.FIELDS:
+            if getattr(self, field, _MISSING) is not _MISSING:
+                yield field
+        if self._extra:
+            yield from self._extra
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __contains__(self, key):
+        if key in self._FIELD_SET:
+            return getattr(self, key, _MISSING) is not _MISSING
+        return self._extra is not None and key in self._extra
+
+    def get(self, key, default=None):
+        if key in self._FIELD_SET:
+            value = getattr(self, key, _MISSING)
+            return default if value is _MISSING else value
+        if self._extra is not None:
+            return self._extra.get(key, default)
+        return default
+
+    def copy(self):
+        """Shallow copy (values are shared, like dict.copy())."""
+        record = type(self).__new__(type(self))
+        for field in self.FIELDS:
+            value = getattr(self, field, _MISSING)
+            if value is not _MISSING:
+                setattr(record, field, value)
+        record._extra = dict(self._extra) if self._extra else None
+        return record
+
+    def to_dict(self):
+        return dict(self.items())
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+
+class Activity(Record):
+    __slots__ = tuple(STORED_COLUMNS["marketing_activities"])
+    FIELDS = __slots__
+    INTERNED = frozenset({"marketer_username", "prospect_location", "contact_position", "activity_type", "status"})
+
+
+class Followup(Record):
+    __slots__ = tuple(STORED_COLUMNS["followups"])
+    FIELDS = __slots__
+    INTERNED = frozenset({"activity_id", "marketer_username", "interest_level", "status_update"})
+
+
+class User(Record):
+    __slots__ = tuple(STORED_COLUMNS["users"])
+    FIELDS = __slots__
+    INTERNED = frozenset({"role"})
+
+
+for _record_type in (Activity, Followup, User):
+    _record_type._FIELD_SET = frozenset(_record_type.FIELDS)
+
+RECORD_TYPES = {"marketing_activities": Activity, "followups": Followup, "users": User}
+
+
+def to_record(table_name, item):
+    """Returns item as the record class of table_name. Records are returned
+    as they are; items that are not mappings (malformed rows) are kept."""
+    record_type = RECORD_TYPES.get(table_name)
+    if record_type is None or isinstance(item, record_type) or not isinstance(item, Mapping):
+        return item
+    return record_type.from_dict(item)
+
+
+def _represent_record(dumper, record):
+    return dumper.represent_dict(record)
+
+# write_yaml dumps cached records directly, in column order
+for _dumper in (yaml.Dumper, yaml.SafeDumper, getattr(yaml, "CSafeDumper", None)):
+    if _dumper is None: # PyYAML without libyaml
+        continue
+    yaml.add_multi_representer(Record, _represent_record, Dumper=_dumper)
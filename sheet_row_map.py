@@ -0,0 +1,162 @@
+"""
+Cached id -> Row Number Maps and Row Hashes of the Google Sheets Worksheets
+
+Finding the sheet row of a record used to need the worksheet's whole id
+column (col_values) on every sync. GoogleSheetsSync now keeps a SheetRowMap
+per worksheet: the id column as it was after the last sync, persisted in
+data/.sheet_rows.json so it survives restarts.
+
+The map is refreshed lazily. Before it is used, the sync reads the id cells
+of the last mapped row and the row after it (two cells). If the last id
+does not match or a row follows it, rows were added or removed outside the
+app and the map is rebuilt by reading the sheet. The sync keeps the map in
+step with its own appends and deletes, so edits become single-row
+batch_update calls and deletes single delete_rows calls.
+
+The map also holds a content hash per id of the row as last pushed (or read
+back). A sync hashes the local rows and pushes only those whose hash
+changed. Every sheets_verify_interval_hours (config.yaml) the sync reads the
+whole sheet back instead, rebuilds the map and hashes from what is really
+there, and repairs drift: rows edited by hand are rewritten, rows whose id is
+not a local record (or repeats an id) are deleted, missing rows are appended.
+
+The file is sync state and is not part of backups.
+"""
+
+import contextlib
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+ROW_MAP_FILENAME = ".sheet_rows.json"
+DEFAULT_VERIFY_INTERVAL_HOURS = 24
+
+
+def row_map_path(data_dir):
+    return os.path.join(data_dir, ROW_MAP_FILENAME)
+
+
+def row_hash(values):
+    """Content hash of a sheet row, as pushed or as read back: the leading
+    quote that forces text and trailing empty cells are not part of it."""
+    cells = [str(value)[1:] if str(value).startswith("'") else str(value) for value in values]
+    while cells and not cells[-1]:
+        cells.pop()
+    return hashlib.sha1(json.dumps(cells).encode("utf-8")).hexdigest()
+
+
+class SheetRowMap:
+    """The id column of one worksheet, header cell first: row n holds ids[n-1].
+    hashes maps ids to the row_hash of their row in the sheet; verified_at is
+    the epoch of the last full read of the sheet."""
+
+    def __init__(self, ids, hashes=None, verified_at=None):
+        self.ids = [str(id_val).lstrip("'") for id_val in ids]
+        self.hashes = dict(hashes or {})
+        self.verified_at = verified_at
+        self._rows = None
+
+    @classmethod
+    def from_values(cls, values, id_column_index, width):
+        """Map of a sheet read in full (get_all_values), verified now."""
+        ids = [row[id_column_index] if len(row) > id_column_index else "" for row in values]
+        row_map = cls(ids, verified_at=time.time())
+        for id_val, row in zip(row_map.ids[1:], values[1:]):
+            if id_val:
+                row_map.hashes.setdefault(id_val, row_hash(row[:width])) # First row of a repeated id
+        return row_map
+
+    def verification_due(self, interval_hours):
+        return self.verified_at is None or time.time() - self.verified_at >= interval_hours * 3600
+
+    def duplicate_rows(self):
+        """Row numbers of data rows whose id already appears above them."""
+        seen = set()
+        duplicates = []
+        for row, id_val in enumerate(self.ids[1:], start=2):
+            if id_val in seen:
+                duplicates.append(row)
+            elif id_val:
+                seen.add(id_val)
+        return duplicates
+
+    @property
+    def last_row(self):
+        return len(self.ids)
+
+    @property
+    def rows(self):
+        """id -> row number of the data rows (the first row of a repeated id)."""
+        if self._rows is None:
+            self._rows = {}
+            for row, id_val in enumerate(self.ids[1:], start=2):
+                if id_val:
+                    self._rows.setdefault(id_val, row)
+        return self._rows
+
+    def matches_tail(self, tail):
+        """True if tail, the values of the id cells of last_row and the row
+        after it (see tail_range), shows the sheet still ends at last_row."""
+        cells = [str(row[0]).lstrip("'") if row else "" for row in tail or []]
+        while cells and not cells[-1]:
+            cells.pop()
+        return cells == [self.ids[-1]] if self.ids else not cells
+
+    def tail_range(self, column_letter):
+        row = max(self.last_row, 1)
+        return f"{column_letter}{row}:{column_letter}{row + 1}"
+
+    def delete(self, row):
+        """Records that sheet row number row was deleted."""
+        id_val = self.ids.pop(row - 1)
+        if id_val not in self.ids:
+            self.hashes.pop(id_val, None)
+        self._rows = None
+
+    def append(self, rows, id_column_index):
+        """Records that rows (lists of pushed values) were appended after last_row."""
+        for row in rows:
+            id_val = str(row[id_column_index]).lstrip("'")
+            self.ids.append(id_val)
+            self.hashes[id_val] = row_hash(row)
+        self._rows = None
+
+
+def load(data_dir, key):
+    """The persisted map stored under key, or None."""
+    try:
+        with open(row_map_path(data_dir), "r", encoding="utf-8") as file:
+            stored = json.load(file).get(key)
+    except (OSError, ValueError, AttributeError):
+        return None
+    if isinstance(stored, list): # Id column only, saved before row hashes existed
+        return SheetRowMap(stored)
+    if not isinstance(stored, dict) or not isinstance(stored.get("ids"), list):
+        return None
+    return SheetRowMap(stored["ids"], stored.get("hashes"), stored.get("verified_at"))
+
+
+def save(data_dir, key, row_map):
+    """Persists row_map under key (None removes it). Raises OSError."""
+    try:
+        with open(row_map_path(data_dir), "r", encoding="utf-8") as file:
+            maps = json.load(file)
+    except (OSError, ValueError):
+        maps = {}
+    maps = maps if isinstance(maps, dict) else {}
+    if row_map is None:
+        maps.pop(key, None)
+    else:
+        maps[key] = {"ids": row_map.ids, "hashes": row_map.hashes, "verified_at": row_map.verified_at}
+    os.makedirs(data_dir, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=data_dir, prefix=f"{ROW_MAP_FILENAME}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as file:
+            json.dump(maps, file)
+        os.replace(temp_path, row_map_path(data_dir))
+    except OSError:
+        with contextlib.suppress(OSError):
+            os.remove(temp_path)
+        raise
@@ -12,7 +12,8 @@ from datetime import datetime
 from data_hooks import (
     manual_sync_all, 
     manual_restore_all,
-    get_available_tabs
+    get_available_tabs,
+    get_sync_status
 )
 # Import helper to get last sync time
 from google_sheets_sync import get_last_manual_sync_time, get_sync_instance
@@ -31,6 +32,18 @@ def add_google_sheets_sync_ui():
     Data dari aplikasi ini secara otomatis disinkronkan ke Google Sheets setiap kali ada perubahan data.
     Sinkronisasi manual di bawah ini hanya menambahkan data baru yang belum ada di sheet (incremental).
     """)
+
+    # Status sinkronisasi otomatis (berjalan di latar belakang, lihat sync_worker.py)
+    sync_status = get_sync_status()
+    status_col1, status_col2 = st.columns(2)
+    status_col1.metric("Antrian Sinkronisasi", sync_status["queue_depth"],
+                       help="Perubahan yang menunggu dikirim ke Google Sheets")
+    status_col2.metric("Sinkronisasi Otomatis Terakhir",
+                       f"{sync_status['last_flush_at']} WIB" if sync_status["last_flush_at"] else "Belum ada")
+    if sync_status["pending"]:
+        st.caption("Sinkronisasi otomatis sedang berjalan atau menunggu perubahan lain.")
+    if sync_status["last_error"]:
+        st.warning(f"Sinkronisasi otomatis terakhir gagal: {sync_status['last_error']}")
     
     col1, col2 = st.columns(2)
     
@@ -0,0 +1,401 @@
+"""
+SQLite Storage Backend for AI Marketing Tracker
+
+Stores marketing_activities, followups and users in a local SQLite database
+(data/marketing_tracker.db) instead of the YAML files. It is selected with
+``storage_backend: sqlite`` in data/config.yaml; config itself always stays in
+config.yaml because it carries that switch.
+
+The database runs in WAL mode so Streamlit sessions can keep reading while
+another session writes. Writes use the same entry format as the YAML write
+journal (see yaml_journal.py), so utils_with_edit_delete.py can hand the same
+change list to either backend.
+
+One-shot migration from the YAML files:
+    python sqlite_backend.py migrate [--activate]
+"""
+
+import json
+import os
+import sqlite3
+import sys
+import threading
+
+import epoch_fields
+import record_ids
+
+DB_FILENAME = "marketing_tracker.db"
+
+# Mirrors EXPECTED_HEADERS in google_sheets_sync.py (without config).
+# Keys outside these columns are kept as JSON in the "extra" column.
+TABLE_COLUMNS = {
+    "marketing_activities": [
+        'id', 'marketer_username', 'prospect_name', 'prospect_location',
+        'contact_person', 'contact_position', 'contact_phone', 'contact_email',
+        'activity_date', 'activity_type', 'description', 'status',
+        'created_at', 'updated_at'
+    ],
+    "followups": [
+        'id', 'activity_id', 'marketer_username', 'followup_date', 'notes',
+        'next_action', 'next_followup_date', 'interest_level', 'status_update',
+        'created_at'
+    ],
+    "users": [
+        'id', 'username', 'password_hash', 'name', 'role', 'email', 'created_at'
+    ]
+}
+
+# Soft-delete tombstone of a row (see "Soft Deletes" in utils_with_edit_delete.py)
+TOMBSTONE_COLUMNS = ['deleted_at', 'deleted_at_ts', 'deleted_by']
+
+# Database columns: the columns above plus the integer epoch companions of
+# the date/timestamp columns (see epoch_fields.py) and the tombstone
+STORED_COLUMNS = {
+    table_name: columns + epoch_fields.EPOCH_COLUMNS[table_name] + TOMBSTONE_COLUMNS
+    for table_name, columns in TABLE_COLUMNS.items()
+}
+
+INDEXES = [
+    ("idx_activities_marketer", "marketing_activities", "marketer_username"),
+    ("idx_activities_status", "marketing_activities", "status"),
+    ("idx_followups_activity", "followups", "activity_id"),
+    ("idx_followups_marketer", "followups", "marketer_username"),
+    ("idx_followups_status", "followups", "status_update"),
+    ("idx_followups_next_date", "followups", "next_followup_date"),
+    ("idx_users_username", "users", "username"),
+]
+
+# Ids are time-ordered (record_ids), so the id primary key answers "created
+# between" and "latest N". Rows from before that keep random ids; they are
+# found by created_at_ts through a partial index that only holds them.
+ID_PREFIXES = {"marketing_activities": "act", "followups": "fu", "users": "usr"}
+
+
+def time_ordered_id_length(table_name):
+    return len(ID_PREFIXES[table_name]) + 1 + record_ids.ULID_LENGTH
+
+_local = threading.local()
+
+
+def get_connection(db_path):
+    """Returns this thread's connection to db_path, creating the schema on first use."""
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    conn = connections.get(db_path)
+    if conn is None:
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        conn = sqlite3.connect(db_path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        _create_schema(conn)
+        connections[db_path] = conn
+    return conn
+
+
+def _create_schema(conn):
+    with conn:
+        for table_name, columns in STORED_COLUMNS.items():
+            column_defs = ", ".join(
+                "id TEXT PRIMARY KEY" if column == "id" else f"{column}"
+                for column in columns
+            )
+            conn.execute(f"CREATE TABLE IF NOT EXISTS {table_name} ({column_defs}, extra TEXT)")
+            existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table_name})")}
+            for column in columns:
+                if column not in existing: # Databases created before the column existed
+                    conn.execute(f"ALTER TABLE {table_name} ADD COLUMN {column}")
+        for index_name, table_name, column in INDEXES:
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON {table_name} ({column})")
+        for table_name in ID_PREFIXES:
+            conn.execute(
+                f"CREATE INDEX IF NOT EXISTS idx_{table_name}_legacy_created_ts ON {table_name} (created_at_ts)"
+                f" WHERE length(id) <> {time_ordered_id_length(table_name)}"
+            )
+        # Bumped in the same transaction as every write so readers can cache per version
+        conn.execute("CREATE TABLE IF NOT EXISTS table_versions (table_name TEXT PRIMARY KEY, version INTEGER NOT NULL)")
+        conn.executemany(
+            "INSERT OR IGNORE INTO table_versions (table_name, version) VALUES (?, 0)",
+            [(table_name,) for table_name in TABLE_COLUMNS]
+        )
+
+
+def _to_sql_value(value):
+    if value is None or isinstance(value, (str, int, float)):
+        return value
+    return str(value) # Dates and other scalars are stored as text, like in YAML
+
+
+def _to_row(table_name, record):
+    columns = STORED_COLUMNS[table_name]
+    extra = {key: value for key, value in record.items() if key not in columns}
+    values = [_to_sql_value(record.get(column)) for column in columns]
+    values.append(json.dumps(extra, ensure_ascii=False, default=str) if extra else None)
+    return values
+
+
+def _from_row(table_name, row):
+    record = {column: row[column] for column in STORED_COLUMNS[table_name]}
+    if row["extra"]:
+        record.update(json.loads(row["extra"]))
+    return record
+
+
+def normalize_entry(table_name, entry):
+    """Returns entry with its record/changes shaped like rows read back from the
+    database, so callers can patch cached rows without reloading them."""
+    columns = STORED_COLUMNS[table_name]
+    if entry.get("op") == "insert":
+        record = entry["record"]
+        normalized = {column: _to_sql_value(record.get(column)) for column in columns}
+        normalized.update((key, value) for key, value in record.items() if key not in columns)
+        return {**entry, "record": normalized}
+    if entry.get("op") == "update":
+        changes = {
+            key: _to_sql_value(value) if key in columns else value
+            for key, value in entry["changes"].items()
+        }
+        return {**entry, "changes": changes}
+    return entry
+
+
+def table_version(db_path, table_name):
+    row = get_connection(db_path).execute(
+        "SELECT version FROM table_versions WHERE table_name = ?", (table_name,)
+    ).fetchone()
+    return row["version"] if row else 0
+
+
+def load_rows(db_path, table_name):
+    """Returns all records of table_name in insertion order."""
+    rows = get_connection(db_path).execute(f"SELECT * FROM {table_name} ORDER BY rowid")
+    return [_from_row(table_name, row) for row in rows]
+
+
+def iter_rows(db_path, table_name):
+    """Yields the records of table_name in insertion order straight from the
+    cursor, without loading the whole table."""
+    cursor = get_connection(db_path).execute(f"SELECT * FROM {table_name} ORDER BY rowid")
+    for row in cursor:
+        yield _from_row(table_name, row)
+
+
+def get_row(db_path, table_name, record_id):
+    row = get_connection(db_path).execute(
+        f"SELECT * FROM {table_name} WHERE id = ?", (record_id,)
+    ).fetchone()
+    return _from_row(table_name, row) if row else None
+
+
+def find_rows(db_path, table_name, column, value):
+    """Returns records whose indexed column equals value, in insertion order."""
+    if column not in STORED_COLUMNS[table_name]:
+        raise ValueError(f"Unknown column {column!r} for table {table_name}")
+    rows = get_connection(db_path).execute(
+        f"SELECT * FROM {table_name} WHERE {column} = ? ORDER BY rowid", (value,)
+    )
+    return [_from_row(table_name, row) for row in rows]
+
+
+def query_rows(db_path, table_name, conditions, order_by, descending, offset=0, limit=None):
+    """Returns (records of one page, total number of matching rows).
+
+    conditions is a list of (column, operator, value) with operator "="
+    (None matches NULL), "in" (value is a list), ">=", "<" or "contains"
+    (case-insensitive).
+    Rows are ordered by order_by (NULL as empty text; integer epoch columns
+    with NULL first), ties in insertion order.
+    """
+    columns = STORED_COLUMNS[table_name]
+    clauses, params = [], []
+    for column, operator, value in conditions:
+        if column not in columns:
+            raise ValueError(f"Unknown column {column!r} for table {table_name}")
+        if operator == "in":
+            clauses.append(f"{column} IN ({', '.join('?' for _ in value)})" if value else "0")
+            params.extend(_to_sql_value(item) for item in value)
+        elif operator == "contains":
+            escaped = str(value).lower().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            clauses.append(f"LOWER({column}) LIKE ? ESCAPE '\\'")
+            params.append(f"%{escaped}%")
+        elif operator == "=" and value is None:
+            clauses.append(f"{column} IS NULL")
+        elif operator in ("=", ">=", "<"):
+            clauses.append(f"{column} {operator} ?")
+            params.append(_to_sql_value(value))
+        else:
+            raise ValueError(f"Unknown operator {operator!r}")
+    if order_by not in columns:
+        raise ValueError(f"Unknown column {order_by!r} for table {table_name}")
+    where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+    conn = get_connection(db_path)
+    total = conn.execute(f"SELECT COUNT(*) FROM {table_name}{where}", params).fetchone()[0]
+    direction = "DESC" if descending else "ASC"
+    order = order_by if order_by in epoch_fields.EPOCH_COLUMNS[table_name] else f"COALESCE({order_by}, '')"
+    rows = conn.execute(
+        f"SELECT * FROM {table_name}{where} ORDER BY {order} {direction}, rowid"
+        f" LIMIT ? OFFSET ?",
+        params + [-1 if limit is None else limit, offset]
+    )
+    return [_from_row(table_name, row) for row in rows], total
+
+
+def scan_created_range(db_path, table_name, low_id=None, high_id=None, low_created=None,
+                       high_created=None, descending=False, limit=None, marketer_username=None):
+    """Rows created in a time range, read as index range scans (without
+    soft-deleted rows).
+
+    Returns (rows, legacy_rows): rows with time-ordered ids in [low_id,
+    high_id) ordered by id, and rows with legacy ids whose created_at_ts lies
+    in [low_created, high_created) ordered by created_at_ts. Bounds may be None
+    (open); each list holds at most limit rows.
+    """
+    id_length = time_ordered_id_length(table_name)
+    conn = get_connection(db_path)
+    direction = "DESC" if descending else "ASC"
+
+    def scan(column, low, high, legacy):
+        # The length() test is inlined so the planner can use the partial index
+        clauses = [f"length(id) {'<>' if legacy else '='} {id_length}", "deleted_at IS NULL"]
+        params = []
+        for operator, bound in ((">=", low), ("<", high)):
+            if bound is not None:
+                clauses.append(f"{column} {operator} ?")
+                params.append(bound)
+        if marketer_username is not None:
+            clauses.append("marketer_username = ?")
+            params.append(marketer_username)
+        rows = conn.execute(
+            f"SELECT * FROM {table_name} WHERE {' AND '.join(clauses)}"
+            f" ORDER BY {column} {direction} LIMIT ?",
+            params + [-1 if limit is None else limit]
+        )
+        return [_from_row(table_name, row) for row in rows]
+
+    return scan("id", low_id, high_id, False), scan("created_at_ts", low_created, high_created, True)
+
+
+def _insert(conn, table_name, record):
+    columns = STORED_COLUMNS[table_name] + ["extra"]
+    placeholders = ", ".join("?" for _ in columns)
+    conn.execute(
+        f"INSERT OR REPLACE INTO {table_name} ({', '.join(columns)}) VALUES ({placeholders})",
+        _to_row(table_name, record)
+    )
+
+
+def _update(conn, table_name, record_id, changes):
+    columns = STORED_COLUMNS[table_name]
+    known = {key: value for key, value in changes.items() if key in columns}
+    unknown = {key: value for key, value in changes.items() if key not in columns}
+    if known:
+        assignments = ", ".join(f"{column} = ?" for column in known)
+        conn.execute(
+            f"UPDATE {table_name} SET {assignments} WHERE id = ?",
+            [_to_sql_value(value) for value in known.values()] + [record_id]
+        )
+    if unknown:
+        row = conn.execute(f"SELECT extra FROM {table_name} WHERE id = ?", (record_id,)).fetchone()
+        if row is not None:
+            extra = json.loads(row["extra"]) if row["extra"] else {}
+            extra.update(unknown)
+            conn.execute(
+                f"UPDATE {table_name} SET extra = ? WHERE id = ?",
+                (json.dumps(extra, ensure_ascii=False, default=str), record_id)
+            )
+
+
+def _delete(conn, table_name, record_ids):
+    record_ids = list(record_ids)
+    for start in range(0, len(record_ids), 500): # Stay below SQLite's variable limit
+        chunk = record_ids[start:start + 500]
+        conn.execute(
+            f"DELETE FROM {table_name} WHERE id IN ({', '.join('?' for _ in chunk)})", chunk
+        )
+
+
+def _bump_version(conn, table_name):
+    conn.execute("UPDATE table_versions SET version = version + 1 WHERE table_name = ?", (table_name,))
+
+
+def apply_entries(db_path, table_name, entries):
+    """Applies journal-format entries (insert/update/delete) in one transaction.
+    Returns the new version of table_name."""
+    return apply_changes(db_path, {table_name: entries})[table_name]
+
+
+def apply_changes(db_path, changes):
+    """Applies {table_name: entries} across tables in one transaction.
+    Returns {table_name: new version}."""
+    conn = get_connection(db_path)
+    versions = {}
+    with conn:
+        for table_name, entries in changes.items():
+            for entry in entries:
+                op = entry.get("op")
+                if op == "insert":
+                    _insert(conn, table_name, entry["record"])
+                elif op == "update":
+                    _update(conn, table_name, entry["id"], entry["changes"])
+                elif op == "delete":
+                    _delete(conn, table_name, entry["ids"])
+                else:
+                    raise ValueError(f"Unknown operation {op!r}")
+            _bump_version(conn, table_name)
+            versions[table_name] = conn.execute(
+                "SELECT version FROM table_versions WHERE table_name = ?", (table_name,)
+            ).fetchone()["version"]
+    return versions
+
+
+def replace_table(db_path, table_name, records):
+    """Replaces the whole content of table_name (used by restore and migration)."""
+    conn = get_connection(db_path)
+    with conn:
+        conn.execute(f"DELETE FROM {table_name}")
+        for record in records:
+            _insert(conn, table_name, record)
+        _bump_version(conn, table_name)
+
+
+def backup_to(db_path, target_path):
+    """Copies a consistent snapshot of the live database to target_path."""
+    target = sqlite3.connect(target_path)
+    try:
+        get_connection(db_path).backup(target)
+    finally:
+        target.close()
+
+
+def restore_from(db_path, source_path):
+    """Overwrites the live database with the content of source_path."""
+    source = sqlite3.connect(source_path)
+    try:
+        source.backup(get_connection(db_path))
+    finally:
+        source.close()
+
+
+def integrity_check(db_path):
+    return get_connection(db_path).execute("PRAGMA integrity_check").fetchone()[0]
+
+
+def _main(argv):
+    import argparse
+    parser = argparse.ArgumentParser(description="SQLite storage backend tools")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    migrate_parser = subparsers.add_parser("migrate", help="Copy the YAML tables into the SQLite database")
+    migrate_parser.add_argument("--activate", action="store_true",
+                                help="Set storage_backend: sqlite in config.yaml after migrating")
+    args = parser.parse_args(argv)
+
+    # Imported lazily: utils_with_edit_delete imports this module
+    from utils_with_edit_delete import migrate_yaml_to_sqlite
+    success, message = migrate_yaml_to_sqlite(activate=args.activate)
+    print(message)
+    return 0 if success else 1
+
+
+if __name__ == "__main__":
+    sys.exit(_main(sys.argv[1:]))
@@ -0,0 +1,131 @@
+"""
+Change Outbox for the Google Sheets Sync
+
+Every user-facing write in utils_with_edit_delete records one change event per
+touched row in data/<table>.outbox before the write is applied:
+
+    {"op": "insert" | "update" | "delete", "id": "..."}
+
+Soft deletes are recorded as "delete". The events are
+appended as JSON lines with the same crash-safe append as the write journal
+(see yaml_journal.py), so they survive restarts.
+
+The sync engine (GoogleSheetsSync) reads the pending events of a table,
+resolves each id against the current local row (a row that no longer exists
+or is tombstoned is deleted from the sheet, any other row is written as it
+is now) and acknowledges the events it applied. Because events are resolved
+against current data, an event whose write later failed is harmless.
+
+Events are only recorded by processes that sync (see
+utils_with_edit_delete.enable_sync_outbox). An outbox that reaches
+OUTBOX_MAX_BYTES, because syncs keep failing, takes one last
+{"op": "overflow"} event and no further events until it is acknowledged.
+A sync that sees the overflow event reads the whole sheet back and
+reconciles it (see sheet_row_map.py), so changes without events, deletes
+included, are not lost.
+
+Outbox files are process coordination state and are not part of backups.
+"""
+
+import contextlib
+import json
+import os
+import tempfile
+
+import yaml_journal
+
+OUTBOX_SUFFIX = ".outbox"
+OUTBOX_MAX_BYTES = 1024 * 1024
+OVERFLOW_EVENT = {"op": "overflow"}
+_OVERFLOW_LINE = (json.dumps(OVERFLOW_EVENT) + "\n").encode("utf-8") # As written by append_entries
+
+
+def outbox_path(data_dir, table_name):
+    return os.path.join(data_dir, table_name + OUTBOX_SUFFIX)
+
+
+def events_for_entries(entries):
+    """Change events of journal-format entries (see yaml_journal.py)."""
+    events = []
+    for entry in entries:
+        op = entry.get("op")
+        if op == "insert":
+            record_id = entry["record"].get("id")
+            if record_id is not None:
+                events.append({"op": "insert", "id": record_id})
+        elif op == "update":
+            deleted = entry["changes"].get("deleted_at") is not None
+            events.append({"op": "delete" if deleted else "update", "id": entry["id"]})
+        elif op == "delete":
+            events.extend({"op": "delete", "id": record_id} for record_id in entry["ids"])
+    return events
+
+
+def record(data_dir, table_name, events):
+    """Durably appends events to the outbox of table_name. A full outbox
+    gets the overflow event once instead. Callers hold the write lock.
+    Raises OSError."""
+    if not events:
+        return
+    path = outbox_path(data_dir, table_name)
+    try:
+        with open(path, "rb") as file:
+            size = file.seek(0, os.SEEK_END)
+            if size >= OUTBOX_MAX_BYTES:
+                file.seek(max(0, size - len(_OVERFLOW_LINE)))
+                if file.read() == _OVERFLOW_LINE: # Already marked
+                    return
+                print(f"Warning: {os.path.basename(path)} is full; the next sync reconciles the whole sheet.")
+                events = [OVERFLOW_EVENT]
+    except FileNotFoundError:
+        pass
+    yaml_journal.append_entries(path, events)
+
+
+def pending(data_dir, table_name):
+    """Returns (events, offset): the unacknowledged events of table_name and
+    the offset to pass to acknowledge once they are applied."""
+    return yaml_journal.read_entries(outbox_path(data_dir, table_name))
+
+
+def acknowledge(data_dir, table_name, offset):
+    """Drops the events before offset; events appended since pending() was
+    called are kept. Callers hold the write lock. Raises OSError."""
+    if not offset:
+        return
+    path = outbox_path(data_dir, table_name)
+    try:
+        with open(path, "rb") as file:
+            file.seek(offset)
+            rest = file.read()
+    except FileNotFoundError:
+        return
+    if not rest:
+        os.remove(path)
+        return
+    fd, temp_path = tempfile.mkstemp(dir=data_dir, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as file:
+            file.write(rest)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, path)
+    except OSError:
+        with contextlib.suppress(OSError):
+            os.remove(temp_path)
+        raise
+
+
+def overflowed(events):
+    """True if events include the overflow event: changes after it were not
+    recorded."""
+    return any(event.get("op") == OVERFLOW_EVENT["op"] for event in events)
+
+
+def latest_events(events):
+    """id -> last event of each id, in order of first appearance."""
+    latest = {}
+    for event in events:
+        if "id" in event: # Not the overflow event
+            latest[event["id"]] = event
+    return latest
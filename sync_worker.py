@@ -0,0 +1,107 @@
+"""
+Background Google Sheets Sync Worker
+
+The data hooks used to run a full Google Sheets sync inside every form submit.
+They now only submit the name of the changed table to a SyncWorker and return
+as soon as the local write has committed. A daemon thread takes the changes
+from a bounded queue, waits DEBOUNCE_SECONDS for more changes to arrive, and
+then runs one sync for the whole burst.
+
+When the queue is full, submissions are not blocked: the worker notes the
+overflow and its next flush syncs every table. Tables whose flush failed are
+retried with the next flush.
+"""
+
+import queue
+import threading
+import time
+from datetime import datetime
+import pytz
+
+QUEUE_SIZE = 100
+DEBOUNCE_SECONDS = 2.0
+WIB_TZ = pytz.timezone("Asia/Bangkok")
+
+
+class SyncWorker:
+    """Runs sync_function(table_names) in a background thread. table_names is
+    the set of tables changed since the last flush, or None for all tables.
+    sync_function returns (success, message)."""
+
+    def __init__(self, sync_function, queue_size=QUEUE_SIZE, debounce_seconds=DEBOUNCE_SECONDS):
+        self._sync_function = sync_function
+        self._queue = queue.Queue(maxsize=queue_size)
+        self.debounce_seconds = debounce_seconds
+        self._lock = threading.Lock()
+        self._thread = None
+        self._overflow = False
+        self._retry = set() # Tables of a failed flush; None = all tables
+        self._idle = threading.Event()
+        self._idle.set()
+        self.last_flush_at = None # WIB timestamp string of the last successful flush
+        self.last_error = None
+
+    def submit(self, table_name):
+        """Queues a change of table_name without waiting for the sync."""
+        with self._lock:
+            self._idle.clear()
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="sheets-sync-worker", daemon=True)
+                self._thread.start()
+            try:
+                self._queue.put_nowait(table_name)
+            except queue.Full:
+                self._overflow = True # Covered by the next flush, which syncs all tables
+                print("Sync queue full; the next sync will cover all tables.")
+
+    def status(self):
+        """Queue depth, whether a flush is pending or running, and the time of
+        the last successful flush and the error of the last failed one."""
+        return {
+            "queue_depth": self._queue.qsize(),
+            "pending": not self._idle.is_set(),
+            "last_flush_at": self.last_flush_at,
+            "last_error": self.last_error,
+        }
+
+    def wait_idle(self, timeout=None):
+        """Blocks until every submitted change has been flushed. Returns False
+        on timeout."""
+        return self._idle.wait(timeout)
+
+    def _collect(self):
+        """Takes the next change and everything that arrives within the
+        debounce window. Returns the changed table names, or None for all."""
+        tables = {self._queue.get()}
+        deadline = time.monotonic() + self.debounce_seconds
+        while True:
+            remaining = deadline - time.monotonic()
+            try: # After the window, still take what is already queued
+                tables.add(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        with self._lock:
+            overflow, self._overflow = self._overflow, False
+            retry, self._retry = self._retry, set()
+        if overflow or retry is None:
+            return None
+        return tables | retry
+
+    def _run(self):
+        while True:
+            tables = self._collect()
+            try:
+                success, message = self._sync_function(tables)
+            except Exception as e: # Keep the worker alive
+                success, message = False, str(e)
+            if success:
+                self.last_flush_at = datetime.now(WIB_TZ).strftime("%Y-%m-%d %H:%M:%S")
+                self.last_error = None
+            else:
+                print(f"Background sync failed: {message}")
+                self.last_error = message
+                with self._lock:
+                    self._retry = None if tables is None or self._retry is None else self._retry | tables
+            with self._lock:
+                if self._queue.empty() and not self._overflow:
+                    self._idle.set() # Failed tables wait for the next change
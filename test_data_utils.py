@@ -0,0 +1,89 @@
+import csv
+import os
+import pytest
+import yaml
+
+import data_utils
+import utils_with_edit_delete as utils
+import yaml_io
+import yaml_stream
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """data_utils works on ./data: run in a temp dir whose data/ is DATA_DIR."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(utils, "DATA_DIR", str(tmp_path / "data"))
+    utils.invalidate_yaml_cache()
+    utils.initialize_database()
+    yield tmp_path
+    utils.invalidate_yaml_cache()
+
+
+def _add_activity(name, phone="085678912345"):
+    return utils.add_marketing_activity(
+        "marketing_test", name, "Jakarta", "John", "Manager", phone, "john@test.com",
+        "2025-05-24", "Presentasi", "Presentasi produk", "baru"
+    )[2]
+
+
+def test_iter_records_matches_safe_load(tmp_path):
+    table_file = tmp_path / "followups.yaml"
+    document = {"followups": [
+        {"id": "fu-1", "interest_level": 4, "next_followup_date": None, "notes": "a: b"},
+        {"id": "fu-2", "followup_date": "2025-05-24", "contact_phone": "085678912345"},
+    ], "ekstra": {"diabaikan": [1, 2]}}
+    table_file.write_text(yaml.dump(document, sort_keys=False), encoding="utf-8")
+    assert list(yaml_stream.iter_records(str(table_file), "followups")) == document["followups"]
+
+    table_file.write_text("users: []\n", encoding="utf-8")
+    with pytest.raises(yaml_stream.TableStructureError):
+        list(yaml_stream.iter_records(str(table_file), "followups"))
+
+
+def test_export_streams_rows_to_csv(workdir, monkeypatch):
+    first_id = _add_activity("PT Satu")
+    _add_activity("PT Dua")
+    monkeypatch.setattr(yaml_io, "safe_load", lambda stream: pytest.fail("whole document loaded"))
+
+    success, _, csv_file = data_utils.export_to_csv("activities")
+    assert success
+    with open(csv_file, newline="", encoding="utf-8") as file:
+        rows = list(csv.DictReader(file))
+    assert [row["prospect_name"] for row in rows] == ["PT Satu", "PT Dua"]
+    assert rows[0]["id"] == first_id and rows[0]["contact_phone"] == "085678912345"
+
+
+def test_validation_reports_structure_and_duplicate_ids(workdir):
+    activity_id = _add_activity("PT Satu")
+    assert data_utils.validate_data_integrity() == (True, "Integritas data valid.", [])
+
+    activities_file = os.path.join(utils.DATA_DIR, utils.ACTIVITIES_FILENAME)
+    activities = utils.read_yaml(activities_file)["marketing_activities"]
+    with open(activities_file, "w", encoding="utf-8") as file:
+        yaml.dump({"marketing_activities": activities * 2}, file)
+    with open(os.path.join(utils.DATA_DIR, utils.FOLLOWUPS_FILENAME), "w", encoding="utf-8") as file:
+        yaml.dump({"followups": "bukan list"}, file)
+
+    success, _, issues = data_utils.validate_data_integrity()
+    assert not success
+    assert any(activity_id in issue and "duplikat" in issue for issue in issues)
+    assert any("followups.yaml tidak valid" in issue for issue in issues)
+
+
+def test_restore_holds_the_write_lock_and_bumps_every_table(workdir, monkeypatch):
+    import write_lock
+    _add_activity("PT Satu")
+    success, _, backup_file = data_utils.backup_data()
+    assert success
+    before = write_lock.read_versions(utils.DATA_DIR)
+
+    assert data_utils.restore_data(backup_file) == (True, "Data berhasil dipulihkan")
+    after = write_lock.read_versions(utils.DATA_DIR)
+    assert all(after[table] > before.get(table, 0) for table in utils.TABLE_FILENAMES)
+
+    def busy(self):
+        raise write_lock.WriteLockTimeout("busy")
+    monkeypatch.setattr(write_lock.WriteLock, "acquire", busy)
+    assert data_utils.restore_data(backup_file) == (False, utils.WRITE_LOCK_BUSY_MESSAGE)
+    assert not os.path.exists(workdir / "temp_restore_extract")
@@ -0,0 +1,81 @@
+import io
+import pandas as pd
+import pytest
+
+import utils_with_edit_delete as utils
+from lead_import import import_leads, normalize_phone, read_leads_file, validate_leads
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(utils, "DATA_DIR", str(tmp_path))
+    utils.invalidate_yaml_cache()
+    utils.initialize_database()
+    yield tmp_path
+    utils.invalidate_yaml_cache()
+
+
+LEADS_CSV = """Prospect Name,prospect_location,contact_person,contact_phone,contact_email,activity_date,activity_type,description,status
+PT Satu,Surabaya,Dewi,085678912345,dewi@satu.com,2025-06-01,Telepon,Lead baru,
+PT Dua,Jakarta,Budi,+62 812-3456-7890,,2025-06-02,Email,Lead baru,Dalam Proses
+PT Tiga,,Sari,81234567890,sari@,2025-06-03,Meeting,Lead baru,baru
+"""
+
+
+def test_normalize_phone_keeps_leading_zero():
+    phones = pd.Series(["085678912345", "+62 812-3456-7890", "6281234567890", "85678912345.0", ""])
+    assert normalize_phone(phones).tolist() == [
+        "085678912345", "081234567890", "081234567890", "085678912345", ""
+    ]
+
+
+def test_validate_leads_reports_rows_and_normalizes():
+    leads_df = read_leads_file(io.StringIO(LEADS_CSV), "leads.csv")
+    valid_df, errors_df = validate_leads(leads_df, "andi")
+
+    assert valid_df["prospect_name"].tolist() == ["PT Satu", "PT Dua"]
+    assert valid_df["contact_phone"].tolist() == ["085678912345", "081234567890"]
+    assert valid_df["status"].tolist() == ["baru", "dalam_proses"]
+    assert set(valid_df["marketer_username"]) == {"andi"}
+    assert errors_df["baris"].tolist() == [4, 4]
+    assert set(errors_df["kesalahan"]) == {"prospect_location wajib diisi", "contact_email bukan alamat email yang valid"}
+
+
+def test_import_leads_writes_once(data_dir, tmp_path, monkeypatch):
+    leads_file = tmp_path / "leads.csv"
+    leads_file.write_text(LEADS_CSV, encoding="utf-8")
+    writes = []
+    original_commit = utils._commit_table_change
+    monkeypatch.setattr(utils, "_commit_table_change",
+                        lambda table, entries: writes.append(table) or original_commit(table, entries))
+
+    success, message, errors_df = import_leads(str(leads_file), "andi")
+    assert success, message
+    assert writes == ["marketing_activities"]
+    activities = utils.get_marketing_activities_by_username("andi")
+    assert [a["contact_phone"] for a in activities] == ["085678912345", "081234567890"]
+    assert len(errors_df) == 2
+
+
+def test_bulk_insert_rejects_incomplete_batch(data_dir):
+    success, _, ids = utils.add_marketing_activities_bulk([{"prospect_name": "PT Kosong"}])
+    assert not success and ids == []
+    assert utils.get_all_marketing_activities() == []
+
+
+def test_cli_sync_finishes_before_main_returns(data_dir, tmp_path, monkeypatch):
+    import data_hooks
+    import lead_import
+    from sync_worker import SyncWorker
+    leads_file = tmp_path / "leads.csv"
+    leads_file.write_text(LEADS_CSV, encoding="utf-8")
+    synced = []
+    class FakeSheetsSync:
+        def sync_all_data(self, incremental=False, table_names=None):
+            synced.append(table_names)
+            return True, "ok"
+    monkeypatch.setattr(data_hooks, "get_sync_instance", lambda: FakeSheetsSync())
+    monkeypatch.setattr(data_hooks, "_sync_worker", SyncWorker(data_hooks._sync_changed_tables, debounce_seconds=0.5))
+
+    assert lead_import._main([str(leads_file), "--marketer", "andi", "--sync"]) == 0
+    assert synced == [{"marketing_activities"}]
@@ -0,0 +1,674 @@
+import os
+from datetime import date, datetime
+import pytest
+import yaml
+
+import utils_with_edit_delete as utils
+import yaml_io
+import yaml_journal
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """Runs each test against an empty, freshly initialized data directory."""
+    monkeypatch.setattr(utils, "DATA_DIR", str(tmp_path))
+    utils.invalidate_yaml_cache()
+    utils.initialize_database()
+    yield tmp_path
+    utils.invalidate_yaml_cache()
+
+
+def _add_activity(username="marketing_test", name="PT Test", status="baru"):
+    return utils.add_marketing_activity(
+        username, name, "Jakarta", "John Doe", "Manager", "08123456789",
+        "john@test.com", "2025-05-24", "Presentasi", "Presentasi produk", status
+    )
+
+
+def test_read_yaml_parses_once_until_file_changes(data_dir, monkeypatch):
+    _add_activity()
+    utils.invalidate_yaml_cache()
+    calls = []
+    original_safe_load = yaml_io.safe_load
+    monkeypatch.setattr(yaml_io, "safe_load", lambda stream: calls.append(stream.name) or original_safe_load(stream))
+    utils.get_app_config()
+
+    utils.get_all_marketing_activities()
+    utils.get_all_marketing_activities()
+    assert len(calls) == 2 # config.yaml and marketing_activities.yaml
+
+    activities_file = os.path.join(str(data_dir), utils.ACTIVITIES_FILENAME)
+    with open(activities_file, "a", encoding="utf-8") as file:
+        file.write("# diubah dari luar\n")
+    assert len(utils.get_all_marketing_activities()) == 1
+    assert len(calls) == 3
+
+
+def test_read_yaml_returns_defensive_copies(data_dir):
+    _, _, activity_id = _add_activity()
+    activities = utils.get_all_marketing_activities()
+    activities[0]["prospect_name"] = "Diubah di memori"
+    activities.clear()
+
+    assert utils.get_activity_by_id(activity_id)["prospect_name"] == "PT Test"
+    assert len(utils.get_all_marketing_activities()) == 1
+
+
+def test_read_yaml_picks_up_external_edits(data_dir):
+    _add_activity()
+    utils.get_all_marketing_activities()
+    activities_file = os.path.join(str(data_dir), utils.ACTIVITIES_FILENAME)
+    with open(activities_file, "w", encoding="utf-8") as file:
+        yaml.dump({"marketing_activities": []}, file)
+    assert utils.get_all_marketing_activities() == []
+
+
+def test_journal_mode_appends_instead_of_rewriting(data_dir):
+    utils.update_app_config({"enable_write_journal": True})
+    activities_file = os.path.join(str(data_dir), utils.ACTIVITIES_FILENAME)
+    journal_file = yaml_journal.journal_path(activities_file)
+    snapshot_before = open(activities_file, encoding="utf-8").read()
+
+    _, _, activity_id = _add_activity()
+    utils.add_followup(activity_id, "marketing_test", "2025-05-25", "Catatan", "Kirim proposal",
+                       "2025-05-28", 4, "dalam_proses")
+
+    assert open(activities_file, encoding="utf-8").read() == snapshot_before
+    assert len(open(journal_file, encoding="utf-8").readlines()) == 2
+    assert utils.get_activity_by_id(activity_id)["status"] == "dalam_proses"
+
+    utils.delete_marketing_activity(activity_id)
+    assert utils.get_all_marketing_activities() == []
+    assert utils.get_all_followups() == []
+
+
+def test_journal_ignores_partial_last_line(data_dir):
+    utils.update_app_config({"enable_write_journal": True})
+    _, _, activity_id = _add_activity()
+    journal_file = yaml_journal.journal_path(os.path.join(str(data_dir), utils.ACTIVITIES_FILENAME))
+    with open(journal_file, "a", encoding="utf-8") as file:
+        file.write('{"op": "delete", "ids": ["' + activity_id)  # Simulated crash mid-append
+
+    assert [a["id"] for a in utils.get_all_marketing_activities()] == [activity_id]
+    _add_activity(name="PT Kedua")
+    assert len(utils.get_all_marketing_activities()) == 2
+
+
+def test_journal_compacts_into_snapshot(data_dir, monkeypatch):
+    monkeypatch.setattr(yaml_journal, "COMPACT_MAX_OPS", 3)
+    utils.update_app_config({"enable_write_journal": True})
+    activities_file = os.path.join(str(data_dir), utils.ACTIVITIES_FILENAME)
+    for i in range(3):
+        _add_activity(name=f"PT {i}")
+
+    assert not os.path.exists(yaml_journal.journal_path(activities_file))
+    utils.invalidate_yaml_cache()
+    assert len(utils.read_yaml(activities_file)["marketing_activities"]) == 3
+
+
+@pytest.fixture
+def sqlite_data_dir(data_dir):
+    success, _ = utils.migrate_yaml_to_sqlite(activate=True)
+    assert success
+    yield data_dir
+
+
+def test_migrate_to_sqlite_keeps_data(data_dir):
+    _, _, activity_id = _add_activity()
+    utils.add_followup(activity_id, "marketing_test", "2025-05-25", "Catatan", "Kirim proposal",
+                       "2025-05-28", 4, "dalam_proses")
+
+    success, _ = utils.migrate_yaml_to_sqlite(activate=True)
+    assert success
+    assert utils.get_app_config()["storage_backend"] == "sqlite"
+    assert utils.authenticate_user("admin", "admin123")["role"] == "superadmin"
+    assert utils.get_activity_by_id(activity_id)["status"] == "dalam_proses"
+    assert [f["activity_id"] for f in utils.get_followups_by_username("marketing_test")] == [activity_id]
+
+
+def test_sqlite_backend_crud(sqlite_data_dir):
+    activities_file = os.path.join(str(sqlite_data_dir), utils.ACTIVITIES_FILENAME)
+    snapshot_before = open(activities_file, encoding="utf-8").read()
+
+    _, _, activity_id = _add_activity()
+    utils.edit_marketing_activity(activity_id, "PT Baru", "Bandung", "Jane", "Direktur", "0811",
+                                  "jane@test.com", "2025-05-26", "Meeting", "Diskusi", "dalam_proses")
+    utils.add_followup(activity_id, "marketing_test", "2025-05-27", "Catatan", "Negosiasi",
+                       "2025-05-30", 5, "berhasil")
+    assert open(activities_file, encoding="utf-8").read() == snapshot_before
+    assert utils.get_marketing_activities_by_username("marketing_test")[0]["prospect_name"] == "PT Baru"
+    assert utils.get_activity_by_id(activity_id)["status"] == "berhasil"
+    assert utils.read_yaml_data("followups")["followups"][0]["interest_level"] == 5
+
+    assert utils.add_user("budi", "rahasia", "Budi", "marketing", "budi@test.com")[0]
+    assert not utils.add_user("budi", "rahasia", "Budi", "marketing", "budi@test.com")[0]
+    assert utils.delete_user("budi", "admin")[0]
+
+    utils.delete_marketing_activity(activity_id)
+    assert utils.get_all_marketing_activities() == []
+    assert utils.get_all_followups() == []
+
+
+def test_write_updates_cached_index_without_reparsing(data_dir, monkeypatch):
+    utils.get_all_users()
+    monkeypatch.setattr(yaml_io, "safe_load", lambda stream: pytest.fail("table was re-parsed"))
+
+    assert utils.add_user("budi", "rahasia", "Budi", "marketing", "budi@test.com")[0]
+    assert utils.authenticate_user("budi", "rahasia")["name"] == "Budi"
+    assert utils.delete_user("budi", "admin")[0]
+    assert utils.authenticate_user("budi", "rahasia") is None
+    assert [user["username"] for user in utils.get_all_users()] == ["admin"]
+
+
+def test_index_follows_external_edits(data_dir):
+    utils.authenticate_user("admin", "admin123")
+    users_file = os.path.join(str(data_dir), utils.USERS_FILENAME)
+    users = utils.read_yaml(users_file)
+    users["users"][0]["username"] = "root"
+    utils.write_yaml(users_file, users)
+
+    assert utils.authenticate_user("admin", "admin123") is None
+    assert utils.authenticate_user("root", "admin123")["role"] == "superadmin"
+
+
+def test_secondary_indexes_follow_writes(data_dir):
+    _, _, first_id = _add_activity("andi", "PT Satu")
+    _, _, second_id = _add_activity("budi", "PT Dua")
+    for activity_id, username in ((first_id, "andi"), (second_id, "budi"), (first_id, "andi")):
+        utils.add_followup(activity_id, username, "2025-05-25", "Catatan", "Telepon",
+                           None, 3, "dalam_proses")
+
+    assert [a["id"] for a in utils.get_marketing_activities_by_username("andi")] == [first_id]
+    assert len(utils.get_followups_by_activity_id(first_id)) == 2
+    assert len(utils.get_followups_by_username("budi")) == 1
+
+    utils.delete_marketing_activity(first_id)
+    assert utils.get_marketing_activities_by_username("andi") == []
+    assert utils.get_followups_by_activity_id(first_id) == []
+    assert utils.get_followups_by_username("andi") == []
+    assert [f["activity_id"] for f in utils.get_all_followups()] == [second_id]
+
+
+def test_add_followup_writes_each_file_once(data_dir, monkeypatch):
+    _, _, activity_id = _add_activity()
+    written = []
+    original_write_yaml = utils.write_yaml
+    monkeypatch.setattr(utils, "write_yaml",
+                        lambda path, data: written.append(os.path.basename(path)) or original_write_yaml(path, data))
+
+    assert utils.add_followup(activity_id, "marketing_test", "2025-05-25", "Catatan", "Kirim proposal",
+                              "2025-05-28", 4, "dalam_proses")[0]
+    assert sorted(written) == [utils.FOLLOWUPS_FILENAME, utils.ACTIVITIES_FILENAME]
+    assert utils.get_activity_by_id(activity_id)["status"] == "dalam_proses"
+    assert not os.path.exists(os.path.join(str(data_dir), utils.TRANSACTION_LOG))
+
+
+def test_interrupted_transaction_is_replayed(data_dir, monkeypatch):
+    _, _, activity_id = _add_activity()
+    original_write_yaml = utils.write_yaml
+    monkeypatch.setattr(utils, "write_yaml", lambda path, data: (
+        False if path.endswith(utils.ACTIVITIES_FILENAME) else original_write_yaml(path, data)))
+
+    success, _ = utils.add_followup(activity_id, "marketing_test", "2025-05-25", "Catatan", "Negosiasi",
+                                    None, 5, "berhasil")
+    assert not success
+    assert utils.get_activity_by_id(activity_id)["status"] == "baru"
+
+    monkeypatch.setattr(utils, "write_yaml", original_write_yaml)
+    utils.initialize_database()
+    assert utils.get_activity_by_id(activity_id)["status"] == "berhasil"
+    assert len(utils.get_followups_by_activity_id(activity_id)) == 1
+    assert not os.path.exists(os.path.join(str(data_dir), utils.TRANSACTION_LOG))
+
+
+def test_migrations_run_once_at_initialize(data_dir, monkeypatch):
+    assert utils.get_schema_version() == utils.MIGRATIONS[-1][0]
+    activities_file = os.path.join(str(data_dir), utils.ACTIVITIES_FILENAME)
+    with open(activities_file, "w", encoding="utf-8") as file:
+        yaml.dump({"activities": [{"id": "act_lama", "marketer_username": "andi", "status": "baru"}]}, file)
+
+    # Hot paths no longer migrate; only an unstamped data directory does
+    assert utils.get_all_marketing_activities() == []
+    os.remove(os.path.join(str(data_dir), utils.SCHEMA_FILENAME))
+    utils.initialize_database()
+    assert [a["id"] for a in utils.get_all_marketing_activities()] == ["act_lama"]
+    assert utils.get_schema_version() == utils.MIGRATIONS[-1][0]
+
+
+def test_epoch_companions_are_written_and_backfilled(data_dir, monkeypatch):
+    import epoch_fields
+    _, _, activity_id = _add_activity()
+    activity = utils.get_activity_by_id(activity_id)
+    assert activity["activity_date_ts"] == epoch_fields.to_epoch("2025-05-24") == 1748019600
+    assert epoch_fields.from_epoch(activity["created_at_ts"]).strftime("%Y-%m-%d %H:%M:%S") == activity["created_at"]
+    utils.edit_marketing_activity(activity_id, "PT Test", "Jakarta", "John", "Manager", "0812", "j@test.com",
+                                  "2025-06-01", "Presentasi", "Demo", "baru")
+    assert utils.get_activity_by_id(activity_id)["activity_date_ts"] == epoch_fields.to_epoch("2025-06-01")
+
+    activities_file = os.path.join(str(data_dir), utils.ACTIVITIES_FILENAME)
+    with open(activities_file, "w", encoding="utf-8") as file: # Written before the companions existed
+        yaml.dump({"marketing_activities": [{"id": "act-0a0b0c0d", "activity_date": "2024-02-03",
+                                             "created_at": "2024-02-01 08:00:00", "updated_at": None}]}, file)
+    utils.write_yaml(os.path.join(str(data_dir), utils.SCHEMA_FILENAME), {"schema_version": 1})
+    utils.initialize_database()
+    activity, = utils.get_all_marketing_activities()
+    assert activity["activity_date_ts"] == epoch_fields.to_epoch("2024-02-03") and activity["updated_at_ts"] is None
+    assert "created_at_ts" in utils.get_all_users()[0]
+
+    # Reads compare integers; the string columns are never parsed
+    monkeypatch.setattr(epoch_fields, "to_epoch", lambda value: pytest.fail(f"parsed {value!r}"))
+    frame = utils.get_table_frame("marketing_activities")
+    assert frame["created_at"].tolist() == [datetime(2024, 2, 1, 8, 0)]
+    assert [a["id"] for a in utils.get_latest_activities(1)] == ["act-0a0b0c0d"]
+
+
+def test_table_frame_is_typed_and_follows_writes(data_dir):
+    _, _, activity_id = _add_activity("andi")
+    _add_activity("budi", "PT Dua")
+    frame = utils.get_table_frame("marketing_activities")
+    assert str(frame["status"].dtype) == "category"
+    assert str(frame["marketer_username"].dtype) == "category"
+    assert str(frame["activity_date"].dtype).startswith("datetime64")
+
+    andi_frame = utils.get_table_frame("marketing_activities", marketer_username="andi")
+    assert list(andi_frame["marketer_username"].cat.categories) == ["andi"]
+    andi_frame.loc[0, "prospect_name"] = "Diubah di memori"
+    assert utils.get_table_frame("marketing_activities")["prospect_name"].tolist() == ["PT Test", "PT Dua"]
+
+    utils.update_activity_status(activity_id, "berhasil")
+    assert utils.get_table_frame("marketing_activities", id=activity_id)["status"].tolist() == ["berhasil"]
+
+
+@pytest.mark.parametrize("has_pyarrow", [True, False])
+def test_table_frame_snapshot_is_reused(data_dir, monkeypatch, has_pyarrow):
+    import columnar_snapshot
+    if has_pyarrow and not columnar_snapshot.HAS_PYARROW:
+        pytest.skip("pyarrow not installed")
+    monkeypatch.setattr(columnar_snapshot, "HAS_PYARROW", has_pyarrow)
+    _add_activity()
+    expected = utils.get_table_frame("marketing_activities")
+    snapshot_dir = os.path.join(str(data_dir), "columnar")
+    if not has_pyarrow: # Kept in memory only; never pickled
+        assert not os.path.exists(snapshot_dir) or os.listdir(snapshot_dir) == []
+        return
+    assert os.path.exists(os.path.join(snapshot_dir, "marketing_activities.parquet"))
+
+    utils._frame_cache.clear()
+    monkeypatch.setattr(columnar_snapshot, "build_frame", lambda *args: pytest.fail("frame was rebuilt"))
+    reloaded = utils.get_table_frame("marketing_activities")
+    assert reloaded["status"].dtype == expected["status"].dtype
+    assert reloaded["prospect_name"].tolist() == expected["prospect_name"].tolist()
+
+
+def _enable_partitions():
+    utils.update_app_config({"partition_by_month": True})
+    assert utils.apply_partition_layout()
+
+
+def test_partitioned_writes_touch_one_month(data_dir, monkeypatch):
+    _, _, may_id = _add_activity(name="PT Mei")
+    utils.add_marketing_activity("marketing_test", "PT Juni", "Bandung", "Sari", "CEO", "0812", "s@t.co",
+                                 "2025-06-10", "Meeting", "Demo", "baru")
+    _enable_partitions()
+    partition_dir = os.path.join(str(data_dir), "marketing_activities")
+    assert not os.path.exists(os.path.join(str(data_dir), utils.ACTIVITIES_FILENAME))
+    manifest = utils.read_yaml(os.path.join(partition_dir, utils.MANIFEST_FILENAME))
+    assert {k: v["rows"] for k, v in manifest["partitions"].items()} == {"2025-05": 1, "2025-06": 1}
+
+    written = []
+    original_write_yaml = utils.write_yaml
+    monkeypatch.setattr(utils, "write_yaml",
+                        lambda path, data: written.append(os.path.basename(path)) or original_write_yaml(path, data))
+    utils.update_activity_status(may_id, "berhasil")
+    assert written == ["2025-05.yaml", utils.MANIFEST_FILENAME]
+
+    utils.invalidate_yaml_cache()
+    assert utils.get_activity_by_id(may_id)["status"] == "berhasil"
+    assert len(utils.get_all_marketing_activities()) == 2
+
+
+def test_partitioned_date_filter_opens_overlapping_months(data_dir, monkeypatch):
+    import datetime
+    _enable_partitions()
+    for month in ("2025-04", "2025-05", "2025-06"):
+        utils.add_marketing_activity("marketing_test", f"PT {month}", "Jakarta", "A", "B", "0812", "a@b.co",
+                                     f"{month}-15", "Telepon", "d", "baru")
+    utils.invalidate_yaml_cache()
+    opened = []
+    original_read = utils._read_yaml_shared
+    monkeypatch.setattr(utils, "_read_yaml_shared", lambda path: opened.append(os.path.basename(path)) or original_read(path))
+
+    frame = utils.get_table_frame("marketing_activities", datetime.date(2025, 5, 1), datetime.date(2025, 5, 31))
+    assert frame["prospect_name"].tolist() == ["PT 2025-05"]
+    assert "2025-04.yaml" not in opened and "2025-06.yaml" not in opened
+
+    query = {"start_date": datetime.date(2025, 5, 1), "end_date": datetime.date(2025, 6, 30)}
+    page, total = utils.query_activities(query, sort=("activity_date", True))
+    assert [a["prospect_name"] for a in page] == ["PT 2025-06", "PT 2025-05"] and total == 2
+    parses = []
+    safe_load = yaml_io.safe_load
+    monkeypatch.setattr(yaml_io, "safe_load", lambda stream: parses.append(stream.name) or safe_load(stream))
+    assert utils.query_activities(query, sort=("activity_date", True)) == (page, total)
+    assert parses == [] # Served from the cached records, not re-parsed
+
+
+def test_partition_layout_converts_back(data_dir):
+    _, _, activity_id = _add_activity()
+    _enable_partitions()
+    utils.update_app_config({"partition_by_month": False})
+    assert utils.apply_partition_layout()
+    assert not os.path.exists(os.path.join(str(data_dir), "marketing_activities"))
+    assert utils.get_activity_by_id(activity_id)["prospect_name"] == "PT Test"
+
+
+def test_cached_records_are_slotted_and_interned(data_dir):
+    import record_model
+    _, _, first_id = _add_activity(name="PT Satu")
+    _, _, second_id = _add_activity(name="PT Dua")
+    utils.invalidate_yaml_cache()
+
+    first, second = utils.get_all_marketing_activities()
+    assert isinstance(first, record_model.Activity) and not hasattr(first, "__dict__")
+    assert first["status"] is second["status"]
+    assert first["marketer_username"] is second["marketer_username"]
+
+    activity = utils.get_activity_by_id(first_id)
+    assert activity == dict(activity) and activity.get("missing", "-") == "-"
+    assert list(activity)[:2] == ["id", "marketer_username"]
+    activity["catatan"] = "kolom tambahan"
+    assert activity["catatan"] == "kolom tambahan" and "catatan" not in utils.get_activity_by_id(first_id)
+
+
+def test_record_snapshot_round_trips_unchanged(data_dir):
+    _add_activity()
+    activities_file = os.path.join(str(data_dir), utils.ACTIVITIES_FILENAME)
+    before = open(activities_file, encoding="utf-8").read()
+    records = utils.read_yaml_data("marketing_activities")
+    assert type(records["marketing_activities"][0]) is dict
+
+    assert utils.write_yaml_data("marketing_activities", records)
+    assert open(activities_file, encoding="utf-8").read() == before
+    utils.invalidate_yaml_cache()
+    assert utils.write_yaml_data("marketing_activities", {"marketing_activities": utils.get_all_marketing_activities()})
+    assert open(activities_file, encoding="utf-8").read() == before
+
+
+@pytest.mark.parametrize("libyaml", [True, False])
+def test_yaml_io_output_matches_yaml_dump(data_dir, monkeypatch, libyaml):
+    if not libyaml:
+        monkeypatch.setattr(yaml_io, "SafeLoader", yaml.SafeLoader)
+        monkeypatch.setattr(yaml_io, "SafeDumper", None)
+    long_text = "Diskusi kebutuhan pelatihan guru di Bandung, " * 6
+    document = {"marketing_activities": [
+        {"id": "act_1", "prospect_name": "SMA Négeri 1 ✓", "description": long_text, "contact_phone": "0812", "tahun": 2025},
+        {"id": "act_2", "prospect_name": 'PT "Kutip"', "description": long_text + "\nbaris baru\t" + long_text, "status": None},
+        {"id": "act_3", "tags": ("tuple", "hanya yaml.Dumper")},
+    ]}
+    for options in ({"default_flow_style": False, "sort_keys": False, "allow_unicode": True}, {}):
+        text = yaml_io.dump(document, **options)
+        assert text == yaml.dump(document, **options)
+    assert yaml_io.safe_load(yaml.dump(document["marketing_activities"][:2])) == document["marketing_activities"][:2]
+
+    _add_activity(name=long_text)
+    activities_file = os.path.join(str(data_dir), utils.ACTIVITIES_FILENAME)
+    records = utils.read_yaml_data("marketing_activities")
+    assert records["marketing_activities"][0]["prospect_name"] == long_text
+    assert open(activities_file, encoding="utf-8").read() == yaml.dump(
+        records, default_flow_style=False, sort_keys=False, allow_unicode=True)
+
+
+@pytest.mark.parametrize("backend", ["yaml", "sqlite"])
+def test_query_activities_filters_sorts_and_pages(data_dir, backend):
+    import datetime
+    if backend == "sqlite":
+        assert utils.migrate_yaml_to_sqlite(activate=True)[0]
+    for day in range(1, 11):
+        utils.add_marketing_activity("andi" if day % 2 else "budi", f"PT {day:02d}",
+                                     "Jakarta Selatan" if day <= 5 else "Bandung", "A", "B", "0812", "a@b.co",
+                                     f"2025-05-{day:02d}", "Telepon", "d", "berhasil" if day == 3 else "baru")
+
+    rows, total = utils.query_activities(sort=("activity_date", True), offset=2, limit=3)
+    assert total == 10 and [row["prospect_name"] for row in rows] == ["PT 08", "PT 07", "PT 06"]
+
+    filters = {"marketer_username": "andi", "prospect_location": "jakarta", "status": ["baru"],
+               "start_date": datetime.date(2025, 5, 2), "end_date": datetime.date(2025, 5, 5)}
+    rows, total = utils.query_activities(filters, sort=("activity_date", False))
+    assert total == 1 and rows[0]["prospect_name"] == "PT 05"
+    assert utils.query_activities({"status": []}) == ([], 0)
+    with pytest.raises(ValueError):
+        utils.query_activities(sort=("unknown", True))
+
+
+def test_generated_ids_are_time_ordered():
+    import record_ids
+    ids = [utils.generate_id("act") for _ in range(50)]
+    assert ids == sorted(ids) and len(set(ids)) == 50
+    prefix, milliseconds = record_ids.parse_id(ids[0])
+    assert prefix == "act" and abs(milliseconds - utils._to_epoch_ms(datetime.now(utils.WIB_TZ))) < 60_000
+    assert record_ids.parse_id("fu-1a2b3c4d") == ("fu", None)
+    assert record_ids.id_bound("act", milliseconds) <= ids[0] < record_ids.id_bound("act", milliseconds + 1)
+
+
+@pytest.mark.parametrize("backend", ["yaml", "sqlite"])
+def test_latest_and_created_between_are_range_scans(data_dir, backend):
+    import record_ids
+    jan_2 = utils._to_epoch_ms(datetime(2024, 1, 2, 12, 0))
+    rows = [ # Legacy random ids, placed by created_at, mixed with time-ordered ids
+        {"id": "act-9f00aa01", "marketer_username": "andi", "prospect_name": "Lama 1", "created_at": "2024-01-01 08:00:00"},
+        {"id": "act-00ffbb02", "marketer_username": "budi", "prospect_name": "Lama 3", "created_at": "2024-01-03 08:00:00"},
+        {"id": record_ids.new_id("act", jan_2), "marketer_username": "andi", "prospect_name": "Baru 2",
+         "created_at": "2024-01-02 12:00:00"},
+    ]
+    assert utils.write_yaml_data("marketing_activities", {"marketing_activities": rows})
+    if backend == "sqlite":
+        assert utils.migrate_yaml_to_sqlite(activate=True)[0]
+    for name in ("Hari Ini 1", "Hari Ini 2"):
+        _add_activity(name=name)
+
+    names = lambda records: [record["prospect_name"] for record in records]
+    assert names(utils.get_latest_activities(3)) == ["Hari Ini 2", "Hari Ini 1", "Lama 3"]
+    assert names(utils.get_latest_activities(5, marketer_username="andi")) == ["Baru 2", "Lama 1"]
+    assert names(utils.get_activities_created_between(date(2024, 1, 1), date(2024, 1, 2))) == ["Lama 1", "Baru 2"]
+    assert names(utils.get_activities_created_between(datetime(2024, 1, 2, 12, 0), datetime(2024, 1, 3, 8, 0))) == ["Baru 2"]
+    assert len(utils.get_activities_created_between(date(2024, 1, 1), date.today())) == 5
+
+
+def _add_closed_activity(name, status, updated_at):
+    _, _, activity_id = _add_activity(name=name, status=status)
+    utils._update_record("marketing_activities", activity_id, {"updated_at": updated_at})
+    return activity_id
+
+
+def test_archive_moves_old_closed_activities_with_followups(data_dir):
+    import cold_archive
+    old_id = _add_closed_activity("PT Lama", "berhasil", "2024-01-01 08:00:00")
+    utils.add_followup(old_id, "marketing_test", "2024-01-02", "Deal", "-", None, "Tinggi", "berhasil")
+    utils._update_record("marketing_activities", old_id, {"updated_at": "2024-01-02 08:00:00"})
+    _add_closed_activity("PT Baru Gagal", "gagal", utils.get_current_timestamp())
+    _add_closed_activity("PT Lama Terbuka", "dalam_proses", "2024-01-01 08:00:00")
+
+    success, _, count = utils.archive_closed_activities(older_than_days=90)
+    assert success and count == 1
+    assert utils.get_activity_by_id(old_id) is None
+    assert utils.get_followups_by_activity_id(old_id) == []
+    assert len(utils.get_all_marketing_activities()) == 2
+
+    manifest = utils.read_yaml(cold_archive.manifest_path(str(data_dir)))
+    archive, = manifest["archives"]
+    assert archive["file"].endswith(".yaml.gz") and not archive["pending"]
+    rows = cold_archive.read_archive(os.path.join(cold_archive.archive_dir(str(data_dir)), archive["file"]))
+    assert [a["id"] for a in rows["marketing_activities"]] == [old_id] and len(rows["followups"]) == 1
+
+    summary = utils.get_archive_summary("marketing_test")
+    assert summary["activities"] == 1 and summary["followups"] == 1
+    assert summary["status"] == {"berhasil": 1} and summary["prospects"] == {"PT Lama"}
+    assert utils.get_archive_summary("someone_else")["activities"] == 0
+    assert utils.archive_closed_activities(older_than_days=90)[2] == 0
+
+
+def test_interrupted_archive_job_is_finished(data_dir, monkeypatch):
+    old_id = _add_closed_activity("PT Lama", "gagal", "2024-01-01 08:00:00")
+    delete_archived_rows = utils._delete_archived_rows
+    monkeypatch.setattr(utils, "_delete_archived_rows", lambda activity_ids, followup_ids: False)
+    assert not utils.archive_closed_activities(older_than_days=90)[0]
+    assert utils.get_activity_by_id(old_id) is not None
+    assert utils.get_archive_summary()["activities"] == 0 # Pending archives are not counted yet
+
+    monkeypatch.setattr(utils, "_delete_archived_rows", delete_archived_rows)
+    assert utils.finish_pending_archives()
+    assert utils.get_activity_by_id(old_id) is None
+    assert utils.get_archive_summary()["activities"] == 1
+
+
+def test_damaged_archive_manifest_does_not_crash_initialization(data_dir, monkeypatch):
+    import cold_archive
+    manifest_file = cold_archive.manifest_path(str(data_dir))
+    os.makedirs(os.path.dirname(manifest_file), exist_ok=True)
+    with open(manifest_file, "w", encoding="utf-8") as file:
+        file.write("archives: [unclosed\n")
+    utils.invalidate_yaml_cache()
+    monkeypatch.setattr(utils, "_initialized_data_dirs", set())
+    assert utils.initialize_database() is False
+    utils.ensure_database_initialized() # The page still loads; retried on the next rerun
+    assert utils._initialized_data_dirs == set()
+
+
+@pytest.mark.parametrize("backend", ["yaml", "sqlite"])
+def test_delete_writes_tombstone_until_purged(data_dir, backend):
+    if backend == "sqlite":
+        assert utils.migrate_yaml_to_sqlite(activate=True)[0]
+    _, _, activity_id = _add_activity()
+    utils.add_followup(activity_id, "marketing_test", "2025-05-25", "n", "a", "2025-05-30", "Tinggi", "baru")
+    assert utils.add_user("budi", "rahasia", "Budi", "marketing", "budi@test.com")[0]
+
+    assert utils.delete_marketing_activity(activity_id, deleted_by="admin")[0]
+    assert utils.delete_user("budi", "admin")[0]
+    assert utils.get_activity_by_id(activity_id) is None
+    assert utils.get_all_marketing_activities() == [] and utils.get_all_followups() == []
+    assert utils.query_activities() == ([], 0) and utils.get_latest_activities(5) == []
+    assert len(utils.get_table_frame("marketing_activities")) == 0
+    assert [user["username"] for user in utils.get_all_users()] == ["admin"]
+    tombstone, = utils.get_tombstones("marketing_activities")
+    assert tombstone["id"] == activity_id and tombstone["deleted_by"] == "admin" and tombstone["deleted_at_ts"]
+    assert len(utils.get_tombstones("followups")) == 1
+    assert utils.add_user("budi", "baru", "Budi", "marketing", "budi@test.com")[0]
+
+    assert utils.purge_tombstones()[2] == 0 # Within the retention period
+    assert utils.purge_tombstones(retention_days=0)[2] == 3 # Cutoff is inclusive
+    assert utils.get_tombstones("marketing_activities") == [] and utils.get_tombstones("users") == []
+    assert [user["username"] for user in utils.get_all_users()] == ["admin", "budi"]
+
+
+def test_writes_replace_files_atomically_and_reads_never_fall_back_to_defaults(data_dir):
+    import threading
+    users_file = os.path.join(str(data_dir), utils.USERS_FILENAME)
+    inode = os.stat(users_file).st_ino
+    assert utils.add_user("budi", "rahasia", "Budi", "marketing", "budi@test.com")[0]
+    assert os.stat(users_file).st_ino != inode # New version renamed over the old one
+    assert not [name for name in os.listdir(str(data_dir)) if name.endswith(".tmp")]
+
+    stop, seen = threading.Event(), []
+    def read_loop():
+        while not stop.is_set():
+            seen.append(len(utils._load_yaml_cached(users_file)["users"]))
+    reader = threading.Thread(target=read_loop)
+    reader.start()
+    for index in range(20):
+        utils._add_user(f"user{index}", "hash", "X", "marketing", "x@test.com") # Skips bcrypt
+    stop.set()
+    reader.join()
+    assert seen and min(seen) >= 2 # Every read parsed a complete version
+    utils.invalidate_yaml_cache(users_file)
+
+    with open(users_file, "w", encoding="utf-8") as file:
+        file.write("users: [unclosed")
+    assert len(utils.get_all_users()) == 22 # Last complete version is still served
+    utils.invalidate_yaml_cache()
+    with pytest.raises(utils.DataFileError):
+        utils.get_all_users()
+    assert not utils._insert_records("users", [{"id": utils.generate_id("usr"), "username": "citra"}])
+    with open(users_file, encoding="utf-8") as file:
+        assert file.read() == "users: [unclosed" # Not overwritten with a default
+
+    config_file = os.path.join(str(data_dir), utils.CONFIG_FILENAME)
+    with open(config_file, "w", encoding="utf-8") as file:
+        file.write("app_name: [")
+    utils.invalidate_yaml_cache()
+    assert utils.get_app_config()["app_name"] == "AI Suara Marketing Tracker"
+    assert not utils.update_app_config({"theme": "dark"})[0]
+
+
+def test_malformed_config_falls_back_to_yaml_backend_with_one_warning(data_dir, monkeypatch, capsys):
+    _add_activity()
+    monkeypatch.setattr(utils, "_backend_fallback_warned", set())
+    with open(os.path.join(str(data_dir), utils.CONFIG_FILENAME), "w", encoding="utf-8") as file:
+        file.write("storage_backend: [")
+    utils.invalidate_yaml_cache()
+    capsys.readouterr()
+
+    assert utils._storage_backend() == "yaml"
+    assert len(utils.get_all_marketing_activities()) == 1
+    assert utils._storage_backend() == "yaml"
+    assert capsys.readouterr().out.count("Using the YAML backend") == 1
+
+
+def test_concurrent_processes_do_not_lose_writes(data_dir):
+    import subprocess
+    import sys
+    script = (
+        "import sys, utils_with_edit_delete as utils\n"
+        "utils.DATA_DIR = sys.argv[1]\n"
+        "for index in range(15):\n"
+        "    assert utils._add_user(f'{sys.argv[2]}{index}', 'hash', 'X', 'marketing', 'x@test.com')[0]\n"
+    )
+    workers = [subprocess.Popen([sys.executable, "-c", script, str(data_dir), name],
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+               for name in ("andi", "budi", "citra")]
+    assert [worker.wait(timeout=120) for worker in workers] == [0, 0, 0]
+    assert len(utils.get_all_users()) == 46
+    assert yaml.safe_load(open(os.path.join(str(data_dir), ".write_versions.json")))["users"] >= 45
+
+
+def test_write_lock_wait_is_bounded_and_counters_invalidate_caches(data_dir, monkeypatch):
+    fcntl = pytest.importorskip("fcntl")
+    import write_lock
+    with open(os.path.join(str(data_dir), write_lock.LOCK_FILENAME), "a+") as other_process:
+        fcntl.flock(other_process.fileno(), fcntl.LOCK_EX) # flock is per open file description
+        monkeypatch.setattr(utils._write_lock, "timeout", 0.2)
+        assert utils.add_user("budi", "x", "Budi", "marketing", "b@test.com") == (False, utils.WRITE_LOCK_BUSY_MESSAGE)
+    assert utils.add_user("budi", "x", "Budi", "marketing", "b@test.com")[0]
+
+    parses = []
+    safe_load = yaml_io.safe_load
+    monkeypatch.setattr(yaml_io, "safe_load", lambda stream: parses.append(1) or safe_load(stream))
+    utils.get_all_users()
+    assert parses == [] # Own writes keep the cache
+    write_lock._bump_versions(str(data_dir), ["users"]) # Written by another replica
+    assert len(utils.get_all_users()) == 2 and len(parses) == 1
+
+
+def test_database_is_initialized_once_per_process_without_rehashing(data_dir, monkeypatch):
+    monkeypatch.setattr(utils, "_initialized_data_dirs", set())
+    hashes, runs = [], []
+    monkeypatch.setattr(utils, "hash_password", lambda password: hashes.append(password) or "hash")
+    original = utils._initialize_database
+    monkeypatch.setattr(utils, "_initialize_database", lambda default_users: runs.append(1) or original(default_users))
+    for _ in range(3): # Streamlit reruns
+        utils.ensure_database_initialized()
+    assert runs == [1] and hashes == [] # users.yaml exists: no bcrypt
+    assert utils.initialize_database() and len(runs) == 2
+
+
+def test_creation_order_is_kept_across_writes(data_dir, monkeypatch):
+    names = lambda records: [record["prospect_name"] for record in records]
+    _, _, first = _add_activity(name="Satu")
+    assert names(utils.get_latest_activities(5)) == ["Satu"] # Builds the order once
+    sorts = []
+    monkeypatch.setattr(utils, "sorted", lambda *args, **kwargs: sorts.append(1) or sorted(*args, **kwargs), raising=False)
+    _add_activity(name="Dua")
+    _add_activity(name="Tiga")
+    assert utils.delete_marketing_activity(first, "admin")[0]
+    assert names(utils.get_latest_activities(5)) == ["Tiga", "Dua"]
+    assert sorts == [] # Patched in place, not re-sorted
+    utils._table_cache.clear()
+    assert names(utils.get_latest_activities(5)) == ["Tiga", "Dua"] and sorts == [1]
@@ -0,0 +1,198 @@
+import pytest
+
+import utils_with_edit_delete as utils
+import google_sheets_sync
+from google_sheets_sync import GoogleSheetsSync, EXPECTED_HEADERS
+
+
+class FakeWorksheet:
+    """In-memory worksheet recording the row-level operations it receives."""
+
+    def __init__(self, rows):
+        self.rows = [list(row) for row in rows]
+        self.operations = []
+
+    def get_all_values(self):
+        self.operations.append(("get_all_values",))
+        return [[str(cell).lstrip("'") for cell in row] for row in self.rows]
+
+    def get(self, cell_range):
+        first, last = (int(cell[1:]) for cell in cell_range.split(":"))
+        return [[row[0]] for row in self.rows[first - 1:last]]
+
+    def batch_update(self, updates, value_input_option=None):
+        self.operations.append(("batch_update", [update["range"] for update in updates]))
+        for update in updates:
+            row = int(update["range"].split(":")[0][1:])
+            self.rows[row - 1] = list(update["values"][0])
+
+    def delete_rows(self, row):
+        self.operations.append(("delete_rows", row))
+        del self.rows[row - 1]
+
+    def append_rows(self, rows, **kwargs):
+        self.operations.append(("append_rows", len(rows)))
+        self.rows.extend(list(row) for row in rows)
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(utils, "DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(google_sheets_sync, "DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(utils, "_sync_outbox_enabled", True) # As in the sheets app (data_hooks)
+    utils.invalidate_yaml_cache()
+    utils.initialize_database()
+    yield tmp_path
+    utils.invalidate_yaml_cache()
+
+
+def _add_activity(name):
+    return utils.add_marketing_activity(
+        "budi", name, "Jakarta", "John", "Manager", "0812", "j@test.com",
+        "2025-05-24", "Presentasi", "Presentasi produk", "baru")[2]
+
+
+def test_writes_record_outbox_events(data_dir):
+    first, second = _add_activity("PT Satu"), _add_activity("PT Dua")
+    assert utils.edit_marketing_activity(
+        first, "PT Satu Baru", "Bandung", "John", "Manager", "0812", "j@test.com",
+        "2025-05-24", "Presentasi", "Presentasi produk", "baru")[0]
+    assert utils.delete_marketing_activity(second, "admin")[0]
+    events, offset = utils.get_pending_sync_events("marketing_activities")
+    assert [(event["op"], event["id"]) for event in events] == [
+        ("insert", first), ("insert", second), ("update", first), ("delete", second)]
+    assert utils.acknowledge_sync_events("marketing_activities", offset)
+    assert utils.get_pending_sync_events("marketing_activities")[0] == []
+
+
+def test_outbox_is_optional_bounded_and_never_fails_a_write(data_dir, monkeypatch):
+    import sync_outbox
+    monkeypatch.setattr(utils, "_sync_outbox_enabled", False) # App without Google Sheets
+    _add_activity("PT Satu")
+    assert not (data_dir / "marketing_activities.outbox").exists()
+
+    monkeypatch.setattr(utils, "_sync_outbox_enabled", True)
+    append_entries = sync_outbox.yaml_journal.append_entries
+    def failing_append(path, entries):
+        raise OSError("disk full")
+    monkeypatch.setattr(sync_outbox.yaml_journal, "append_entries", failing_append)
+    assert _add_activity("PT Dua") # The data write still commits
+    assert len(utils.get_all_marketing_activities()) == 2
+
+    monkeypatch.setattr(sync_outbox.yaml_journal, "append_entries", append_entries)
+    monkeypatch.setattr(sync_outbox, "OUTBOX_MAX_BYTES", 1)
+    _add_activity("PT Tiga")
+    _add_activity("PT Empat") # Outbox full: marked as overflowed
+    _add_activity("PT Lima") # Marked once
+    events = utils.get_pending_sync_events("marketing_activities")[0]
+    assert [event["op"] for event in events] == ["insert", "overflow"]
+
+
+def _fake_sync(monkeypatch):
+    monkeypatch.setattr(GoogleSheetsSync, "connect", lambda self: False) # No connection needed
+    return GoogleSheetsSync()
+
+
+def test_incremental_sync_applies_the_outbox_as_row_operations(data_dir, monkeypatch):
+    kept, edited, deleted = (_add_activity(name) for name in ("PT Satu", "PT Dua", "PT Tiga"))
+    worksheet, sheets = FakeWorksheet([EXPECTED_HEADERS["marketing_activities"]]), _fake_sync(monkeypatch)
+    monkeypatch.setattr(sheets, "_get_target_sheet", lambda table_name: worksheet)
+    assert sheets.sync_data("marketing_activities", incremental=True)[0]
+    assert worksheet.operations == [("get_all_values",), ("append_rows", 3)]
+
+    worksheet.operations.clear()
+    assert utils.edit_marketing_activity(
+        edited, "PT Dua Baru", "Bandung", "John", "Manager", "0812", "j@test.com",
+        "2025-05-24", "Presentasi", "Presentasi produk", "baru")[0]
+    assert utils.delete_marketing_activity(deleted, "admin")[0]
+    new = _add_activity("PT Empat")
+    assert sheets.sync_data("marketing_activities", incremental=True)[0]
+    assert worksheet.operations == [("batch_update", ["A3:N3"]), ("delete_rows", 4), ("append_rows", 1)]
+    assert [row[0] for row in worksheet.rows[1:]] == [kept, edited, new]
+    assert worksheet.rows[2][2] == "PT Dua Baru"
+    assert utils.get_pending_sync_events("marketing_activities")[0] == []
+
+    worksheet.operations.clear() # Acknowledged events are not replayed
+    assert sheets.sync_data("marketing_activities", incremental=True)[0]
+    assert worksheet.operations == []
+
+
+def test_overflowed_outbox_makes_the_next_sync_reconcile_the_sheet(data_dir, monkeypatch):
+    import sync_outbox
+    kept, deleted = _add_activity("PT Satu"), _add_activity("PT Dua")
+    worksheet, sheets = FakeWorksheet([EXPECTED_HEADERS["marketing_activities"]]), _fake_sync(monkeypatch)
+    monkeypatch.setattr(sheets, "_get_target_sheet", lambda table_name: worksheet)
+    assert sheets.sync_data("marketing_activities", incremental=True)[0]
+
+    monkeypatch.setattr(sync_outbox, "OUTBOX_MAX_BYTES", 1)
+    new = _add_activity("PT Tiga")
+    assert utils.delete_marketing_activity(deleted, "admin")[0] # No delete event
+    monkeypatch.setattr(google_sheets_sync, "get_tombstones", lambda table_name: []) # As if purged
+    worksheet.operations.clear()
+    assert sheets.sync_data("marketing_activities", incremental=True)[0]
+    assert worksheet.operations[:2] == [("get_all_values",), ("delete_rows", 3)]
+    assert [row[0] for row in worksheet.rows[1:]] == [kept, new]
+    assert utils.get_pending_sync_events("marketing_activities")[0] == []
+
+
+def test_row_map_is_persisted_and_rebuilt_after_outside_changes(data_dir, monkeypatch):
+    first, second = _add_activity("PT Satu"), _add_activity("PT Dua")
+    worksheet = FakeWorksheet([EXPECTED_HEADERS["marketing_activities"]])
+    sheets = _fake_sync(monkeypatch)
+    monkeypatch.setattr(sheets, "_get_target_sheet", lambda table_name: worksheet)
+    assert sheets.sync_data("marketing_activities", incremental=True)[0]
+
+    restarted = _fake_sync(monkeypatch) # Loads the map saved by the first instance
+    monkeypatch.setattr(restarted, "_get_target_sheet", lambda table_name: worksheet)
+    worksheet.operations.clear()
+    assert utils.delete_marketing_activity(first, "admin")[0]
+    assert restarted.sync_data("marketing_activities", incremental=True)[0]
+    assert worksheet.operations == [("delete_rows", 2)]
+
+    worksheet.rows.append(["manual", "row"]) # Added by hand in the sheet
+    worksheet.operations.clear()
+    assert utils.edit_marketing_activity(
+        second, "PT Dua Baru", "Bandung", "John", "Manager", "0812", "j@test.com",
+        "2025-05-24", "Presentasi", "Presentasi produk", "baru")[0]
+    assert restarted.sync_data("marketing_activities", incremental=True)[0]
+    assert worksheet.operations == [("get_all_values",), ("batch_update", ["A2:N2"]), ("delete_rows", 3)]
+
+
+def test_only_rows_with_changed_hashes_are_pushed_and_verify_repairs_drift(data_dir, monkeypatch):
+    monkeypatch.setattr(utils, "get_current_timestamp", lambda: "2025-05-24 10:00:00")
+    first, second = _add_activity("PT Satu"), _add_activity("PT Dua")
+    worksheet, sheets = FakeWorksheet([EXPECTED_HEADERS["marketing_activities"]]), _fake_sync(monkeypatch)
+    monkeypatch.setattr(sheets, "_get_target_sheet", lambda table_name: worksheet)
+    assert sheets.sync_data("marketing_activities", incremental=True)[0]
+
+    worksheet.operations.clear() # Saving an activity unchanged pushes nothing
+    assert utils.edit_marketing_activity(
+        first, "PT Satu", "Jakarta", "John", "Manager", "0812", "j@test.com",
+        "2025-05-24", "Presentasi", "Presentasi produk", "baru")[0]
+    assert sheets.sync_data("marketing_activities", incremental=True)[0]
+    assert worksheet.operations == []
+
+    worksheet.rows[2][2] = "Diubah manual" # Edited by hand: only a read-back notices
+    assert sheets.sync_data("marketing_activities", incremental=True)[0]
+    assert worksheet.operations == []
+    assert sheets.sync_data("marketing_activities", incremental=True, verify=True)[0]
+    assert worksheet.operations == [("get_all_values",), ("batch_update", ["A3:N3"])]
+    assert worksheet.rows[2][2] == "PT Dua"
+
+    worksheet.rows.append(["stray"] + [""] * 13) # A stray row and a duplicate
+    worksheet.rows.append(list(worksheet.rows[1]))
+    worksheet.operations.clear()
+    assert sheets.sync_data("marketing_activities", incremental=True)[0]
+    assert worksheet.operations == [("get_all_values",), ("delete_rows", 5), ("delete_rows", 4)]
+    assert [row[0] for row in worksheet.rows[1:]] == [first, second]
+
+
+def test_partitioned_table_is_synced(data_dir, monkeypatch):
+    first = _add_activity("PT Satu")
+    utils.update_app_config({"partition_by_month": True})
+    assert utils.apply_partition_layout()
+    assert not (data_dir / "marketing_activities.yaml").exists()
+    worksheet, sheets = FakeWorksheet([EXPECTED_HEADERS["marketing_activities"]]), _fake_sync(monkeypatch)
+    monkeypatch.setattr(sheets, "_get_target_sheet", lambda table_name: worksheet)
+    assert sheets.sync_data("marketing_activities", incremental=True)[0]
+    assert [row[0] for row in worksheet.rows[1:]] == [first]
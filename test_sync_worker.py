@@ -0,0 +1,83 @@
+import threading
+import pytest
+
+import utils_with_edit_delete as utils
+from sync_worker import SyncWorker
+
+
+def test_burst_of_changes_is_flushed_once():
+    calls = []
+    worker = SyncWorker(lambda tables: calls.append(tables) or (True, "ok"), debounce_seconds=0.2)
+    for table_name in ("marketing_activities", "followups", "marketing_activities"):
+        worker.submit(table_name)
+    assert worker.status()["pending"]
+    assert worker.wait_idle(timeout=5)
+    assert calls == [{"marketing_activities", "followups"}]
+    status = worker.status()
+    assert status["queue_depth"] == 0 and status["last_flush_at"] and status["last_error"] is None
+
+
+def test_submit_does_not_wait_for_a_slow_sync():
+    started, release = threading.Event(), threading.Event()
+    calls = []
+    def slow_sync(tables):
+        started.set()
+        release.wait(5)
+        calls.append(tables)
+        return True, "ok"
+    worker = SyncWorker(slow_sync, queue_size=2, debounce_seconds=0)
+    worker.submit("users")
+    assert started.wait(5)
+    for _ in range(5): # Queue overflows while the first flush is running
+        worker.submit("followups")
+    assert len(calls) == 0
+    release.set()
+    assert worker.wait_idle(timeout=5)
+    assert calls[0] == {"users"} and calls[-1] is None # Overflow flushes all tables
+
+
+def test_failed_tables_are_retried_with_the_next_change():
+    results = [(False, "quota"), (True, "ok")]
+    calls = []
+    worker = SyncWorker(lambda tables: calls.append(tables) or results.pop(0), debounce_seconds=0)
+    worker.submit("users")
+    assert worker.wait_idle(timeout=5) and worker.status()["last_error"] == "quota"
+    worker.submit("followups")
+    assert worker.wait_idle(timeout=5)
+    assert calls == [{"users"}, {"users", "followups"}] and worker.status()["last_error"] is None
+
+
+class FakeSheetsSync:
+    def __init__(self):
+        self.calls = []
+
+    def sync_all_data(self, incremental=False, table_names=None):
+        self.calls.append((incremental, table_names))
+        return True, "ok"
+
+
+@pytest.fixture
+def hooks(tmp_path, monkeypatch):
+    import data_hooks
+    monkeypatch.setattr(utils, "DATA_DIR", str(tmp_path))
+    utils.invalidate_yaml_cache()
+    utils.initialize_database()
+    sheets = FakeSheetsSync()
+    monkeypatch.setattr(data_hooks, "get_sync_instance", lambda: sheets)
+    monkeypatch.setattr(data_hooks, "_sync_worker", SyncWorker(data_hooks._sync_changed_tables, debounce_seconds=0))
+    yield data_hooks, sheets
+    utils.invalidate_yaml_cache()
+
+
+def test_hooks_sync_only_the_affected_tables(hooks):
+    data_hooks, sheets = hooks
+    assert data_hooks.add_user("budi", "rahasia", "Budi", "marketing", "budi@test.com")[0]
+    assert data_hooks._sync_worker.wait_idle(timeout=5)
+    _, _, activity_id = data_hooks.add_marketing_activity(
+        "budi", "PT Test", "Jakarta", "John", "Manager", "0812", "j@test.com",
+        "2025-05-24", "Presentasi", "Presentasi produk", "baru")
+    assert data_hooks._sync_worker.wait_idle(timeout=5)
+    assert data_hooks.delete_marketing_activity(activity_id, "admin")[0]
+    assert data_hooks._sync_worker.wait_idle(timeout=5)
+    assert sheets.calls == [(True, {"users"}), (True, {"marketing_activities"}),
+                            (True, {"marketing_activities", "followups"})]
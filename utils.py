@@ -1,7 +1,7 @@
-import yaml
+import yaml_io
 import os
 import bcrypt
-import uuid
+import record_ids
 from datetime import datetime
 import streamlit as st
 
@@ -9,19 +9,19 @@ import streamlit as st
 def create_yaml_if_not_exists(file_path, default_content):
     if not os.path.exists(file_path):
         with open(file_path, 'w') as file:
-            yaml.dump(default_content, file)
+            yaml_io.dump(default_content, file)
 
 # Fungsi untuk membaca data dari file YAML
 def read_yaml(file_path):
     if os.path.exists(file_path):
         with open(file_path, 'r') as file:
-            return yaml.safe_load(file)
+            return yaml_io.safe_load(file)
     return None
 
 # Fungsi untuk menulis data ke file YAML
 def write_yaml(file_path, data):
     with open(file_path, 'w') as file:
-        yaml.dump(data, file)
+        yaml_io.dump(data, file)
 
 # Fungsi untuk hash password
 def hash_password(password):
@@ -33,7 +33,7 @@ def verify_password(password, hashed_password):
 
 # Fungsi untuk membuat ID unik
 def generate_id(prefix):
-    return f"{prefix}-{uuid.uuid4().hex[:8]}"
+    return record_ids.new_id(prefix)
 
 # Fungsi untuk mendapatkan timestamp saat ini
 def get_current_timestamp():
@@ -1,10 +1,32 @@
 import yaml
 import os
+import re
+import shutil
 import bcrypt
 import uuid
-from datetime import datetime
+from datetime import datetime, timedelta
 import pytz # Import pytz
 import streamlit as st
+import threading
+import bisect
+import contextlib
+import functools
+import json
+import sqlite3
+import tempfile
+from collections.abc import Mapping
+import yaml_journal
+import sqlite_backend
+import columnar_snapshot
+import record_model
+import record_ids
+import epoch_fields
+import cold_archive
+import yaml_stream
+import yaml_io
+import write_lock
+import sync_outbox
+import sheet_row_map
 
 # Constants
 DATA_DIR = "data"
@@ -12,77 +34,1247 @@ ACTIVITIES_FILENAME = "marketing_activities.yaml"
 USERS_FILENAME = "users.yaml"
 FOLLOWUPS_FILENAME = "followups.yaml"
 CONFIG_FILENAME = "config.yaml"
+SCHEMA_FILENAME = "schema.yaml"
 WIB_TZ = pytz.timezone("Asia/Bangkok") # Define WIB timezone (UTC+7)
 
-# --- File I/O --- 
+# --- File I/O ---
+# Data files are never modified in place: writers dump to a temporary file in
+# the same directory, fsync it and atomically rename it over the target. Every
+# version of a file is therefore complete and immutable once visible, and is
+# identified by its (mtime_ns, size, inode) signature (the inode changes on
+# every rename). A reader that opened a version keeps parsing that version even
+# if a writer replaces the file meanwhile.
+
+class DataFileError(Exception):
+    """A data file exists but cannot be read or parsed."""
+
+def _atomic_write(file_path, write):
+    """Calls write(file) on a temporary file next to file_path, fsyncs it and
+    renames it over file_path. Raises OSError (and whatever write raises)."""
+    directory = os.path.dirname(file_path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(file_path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as file:
+            write(file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.chmod(temp_path, 0o644) # mkstemp creates 0600
+        os.replace(temp_path, file_path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(temp_path)
+        raise
+    with contextlib.suppress(OSError): # Persist the rename itself (POSIX)
+        dir_fd = os.open(directory, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
 
 def create_yaml_if_not_exists(file_path, default_content):
     if not os.path.exists(file_path):
-        os.makedirs(os.path.dirname(file_path), exist_ok=True)
-        with open(file_path, "w", encoding="utf-8") as file:
-            yaml.dump(default_content, file, default_flow_style=False, allow_unicode=True)
+        _atomic_write(file_path, lambda file: yaml_io.dump(
+            default_content, file, default_flow_style=False, allow_unicode=True
+        ))
         print(f"Created default file: {file_path}")
 
+# Parsed YAML documents keyed by absolute path. Each entry is validated against
+# the file's signature, so a page rerun only pays for a stat() unless the file
+# changed on disk. Entries are shared across sessions and must never be handed
+# out directly; read_yaml returns copies.
+_yaml_cache = {}
+
+def _file_signature(stat_result):
+    return (stat_result.st_mtime_ns, stat_result.st_size, stat_result.st_ino)
+
+def _copy_document(data):
+    """Returns a copy of a parsed YAML document or cached record that callers
+    may mutate freely."""
+    if isinstance(data, record_model.Record):
+        return data.copy() # Values are immutable scalars
+    if isinstance(data, dict):
+        return {key: _copy_document(value) for key, value in data.items()}
+    if isinstance(data, list):
+        return [_copy_document(item) for item in data]
+    return data # Scalars (str, int, date, ...) are immutable
+
+def _load_yaml_cached(file_path):
+    """Returns the shared parsed document for file_path, re-parsing only when the
+    file signature changed. The result is read-only for the caller.
+    Raises OSError / yaml.YAMLError like yaml.safe_load would."""
+    cache_key = os.path.abspath(file_path)
+    with open(file_path, "r", encoding="utf-8") as file:
+        signature = _file_signature(os.fstat(file.fileno()))
+        cached = _yaml_cache.get(cache_key)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+        data = yaml_io.safe_load(file)
+    _yaml_cache[cache_key] = (signature, data)
+    return data
+
+def invalidate_yaml_cache(file_path=None):
+    """Drops the cached document for file_path, or the whole cache when omitted.
+    Needed after files are replaced outside write_yaml (e.g. backup restore)."""
+    if file_path is None:
+        _yaml_cache.clear()
+        _table_cache.clear()
+        _frame_cache.clear()
+        columnar_snapshot.clear_snapshots(os.path.join(DATA_DIR, columnar_snapshot.SNAPSHOT_DIRNAME))
+    else:
+        _yaml_cache.pop(os.path.abspath(file_path), None)
+
+def _read_yaml_shared(file_path):
+    """Like read_yaml, but returns the cached document without copying it.
+    Only for internal read-only lookups; never return the result to callers."""
+    try:
+        return _load_yaml_cached(file_path)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        # Never substitute an empty default: callers could write it back over the data
+        cached = _yaml_cache.get(os.path.abspath(file_path))
+        if cached is not None:
+            print(f"Warning: Keeping the last readable version of {file_path}: {e}")
+            return cached[1]
+        print(f"Error reading YAML file {file_path}: {e}")
+        raise DataFileError(f"{file_path}: {e}") from e
+
 def read_yaml(file_path):
-    if os.path.exists(file_path):
-        try:
-            with open(file_path, "r", encoding="utf-8") as file:
-                return yaml.safe_load(file)
-        except Exception as e:
-            print(f"Error reading YAML file {file_path}: {e}")
-            # Return a default structure or None based on expected usage
-            if ACTIVITIES_FILENAME in file_path:
-                return {"marketing_activities": []}
-            elif USERS_FILENAME in file_path:
-                return {"users": []}
-            elif FOLLOWUPS_FILENAME in file_path:
-                return {"followups": []}
-            elif CONFIG_FILENAME in file_path:
-                return {}
-            else:
-                return None
-    return None
+    """Returns a copy of the parsed file, or None if it does not exist.
+
+    Raises:
+        DataFileError: The file exists but cannot be read or parsed.
+    """
+    return _copy_document(_read_yaml_shared(file_path))
 
 def write_yaml(file_path, data):
+    """Atomically replaces file_path with data dumped as YAML. Returns True on
+    success, False otherwise (the previous version is then left intact)."""
     try:
-        os.makedirs(os.path.dirname(file_path), exist_ok=True)
-        with open(file_path, "w", encoding="utf-8") as file:
-            yaml.dump(data, file, default_flow_style=False, sort_keys=False, allow_unicode=True)
+        _atomic_write(file_path, lambda file: yaml_io.dump(
+            data, file, default_flow_style=False, sort_keys=False, allow_unicode=True
+        ))
+        return True
     except Exception as e:
         print(f"Error writing YAML file {file_path}: {e}")
-# --- Database Initialization ---
         if hasattr(st, "error"): # Check if streamlit context exists
              st.error(f"Gagal menyimpan data ke {os.path.basename(file_path)}.")
+        return False
+    finally:
+        invalidate_yaml_cache(file_path)
 
-# --- Added function for validation script --- 
-def write_yaml_data(table_name, data):
-    """Writes data to the specified table's YAML file."""
-    filename_map = {
-        "marketing_activities": ACTIVITIES_FILENAME,
-        "users": USERS_FILENAME,
-        "followups": FOLLOWUPS_FILENAME,
-        "config": CONFIG_FILENAME
+# --- Table Storage ---
+# Tables are materialized as an ordered id -> record mapping, either from the
+# YAML snapshot plus the optional write journal (see yaml_journal.py) or from
+# the SQLite database (see sqlite_backend.py), selected by "storage_backend" in
+# config.yaml. The mapping is cached per data version: (snapshot signature,
+# journal inode, journal offset) for YAML, the table_versions counter for
+# SQLite. Next to it every cache entry keeps secondary indexes for the fields in
+# INDEXED_FIELDS (field -> value -> {id: None}, an insertion-ordered set). Both
+# are built once per data version and patched in place of a rebuild when this
+# process writes. Cached records are slotted Activity/Followup/User objects
+# (see record_model.py); they are shared and must be copied before they leave
+# this module. The parsed YAML documents they were built from are not kept.
+
+TABLE_FILENAMES = {
+    "marketing_activities": ACTIVITIES_FILENAME,
+    "users": USERS_FILENAME,
+    "followups": FOLLOWUPS_FILENAME,
+    "config": CONFIG_FILENAME
+}
+JOURNALED_TABLES = ("marketing_activities", "followups")
+INDEXED_FIELDS = {
+    "users": ("username",),
+    "marketing_activities": ("marketer_username",),
+    "followups": ("activity_id", "marketer_username"),
+}
+
+_table_cache = {}
+_seen_versions = {} # Table name -> shared write counter (write_lock.py) of its cached version
+
+# --- Write Coordination ---
+# Every mutating function runs under _write_lock, a reentrant lock shared by
+# all processes serving DATA_DIR (see write_lock.py), so the read-modify-write
+# cycles of different replicas cannot interleave. Each table write is counted
+# in the shared counter file; a process that finds a table's counter moved by
+# someone else drops its cached copy of that table before reading it.
+
+_write_lock = write_lock.WriteLock(lambda: DATA_DIR)
+WRITE_LOCK_BUSY_MESSAGE = "Data sedang diperbarui oleh proses lain, silakan coba lagi"
+
+def _coordinated_write(failure):
+    """Runs the decorated function under the write lock; returns failure
+    (after printing the error) if the lock stays busy."""
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            try:
+                with _write_lock:
+                    return function(*args, **kwargs)
+            except write_lock.WriteLockTimeout as e:
+                print(f"Error in {function.__name__}: {e}")
+                return failure
+        return wrapper
+    return decorate
+
+@contextlib.contextmanager
+def exclusive_data_access():
+    """Holds the write lock while the caller replaces data files directly
+    (restore_data). Every table counts as written, so other processes drop
+    their cached copies once the lock is released. Raises
+    write_lock.WriteLockTimeout if the lock stays busy."""
+    with _write_lock:
+        try:
+            yield
+        finally:
+            invalidate_yaml_cache()
+            for table_name in TABLE_FILENAMES:
+                _write_lock.mark_changed(table_name)
+
+def _drop_stale_cache(table_name):
+    """Drops the cached table if another process wrote it since it was cached."""
+    shared = write_lock.read_versions(DATA_DIR).get(table_name, 0)
+    seen = _seen_versions.get(table_name)
+    if seen != shared:
+        if seen is not None and shared != _write_lock.versions.get(table_name):
+            _table_cache.pop(table_name, None)
+        _seen_versions[table_name] = shared
+
+def _table_file(table_name):
+    return os.path.join(DATA_DIR, TABLE_FILENAMES[table_name])
+
+def _is_enabled(value):
+    # Config values restored from Google Sheets come back as strings
+    if isinstance(value, str):
+        return value.strip().lower() in ("true", "1", "yes")
+    return bool(value)
+
+def _journal_enabled():
+    config = _read_yaml_shared(os.path.join(DATA_DIR, CONFIG_FILENAME)) or {}
+    return _is_enabled(config.get("enable_write_journal", False))
+
+_backend_fallback_warned = set() # DATA_DIRs whose unreadable config.yaml was reported
+
+def _storage_backend():
+    """Returns "sqlite" or "yaml" according to storage_backend in config.yaml,
+    "yaml" while config.yaml cannot be parsed (warned once per DATA_DIR)."""
+    try:
+        config = _read_yaml_shared(os.path.join(DATA_DIR, CONFIG_FILENAME)) or {}
+    except DataFileError as e:
+        if DATA_DIR not in _backend_fallback_warned:
+            _backend_fallback_warned.add(DATA_DIR)
+            print(f"Warning: Using the YAML backend until config.yaml is fixed: {e}")
+        return "yaml"
+    backend = str(config.get("storage_backend", "yaml")).strip().lower()
+    return "sqlite" if backend == "sqlite" else "yaml"
+
+def _db_path():
+    return os.path.join(DATA_DIR, sqlite_backend.DB_FILENAME)
+
+def _build_records(table_name, items):
+    records = {}
+    for position, item in enumerate(items):
+        item = record_model.to_record(table_name, item)
+        key = item.get("id") if isinstance(item, record_model.Record) else None
+        if key is None or key in records:
+            # Keep id-less or duplicate rows so rewrites don't drop them
+            if key is not None:
+                print(f"Warning: Duplicate id {key} at position {position}.")
+            key = (key, position)
+        records[key] = item
+    return records
+
+def _load_table(table_name):
+    """Returns the shared id -> record mapping of table_name from the configured
+    backend. Read-only for the caller."""
+    if _storage_backend() == "sqlite":
+        return _load_sqlite_table(table_name)
+    return _load_yaml_table(table_name)
+
+def _build_indexes(table_name, records):
+    indexes = {}
+    for field in INDEXED_FIELDS.get(table_name, ()):
+        index = indexes[field] = {}
+        for key, record in records.items():
+            index.setdefault(record.get(field), {})[key] = None
+    return indexes
+
+def _entry_keys(entry):
+    op = entry.get("op")
+    if op == "insert":
+        return [entry["record"]["id"]]
+    if op == "update":
+        return [entry["id"]]
+    if op == "delete":
+        return list(entry["ids"])
+    return []
+
+def _apply_to_table(table_name, records, indexes, entries, order=None):
+    """Applies journal-format entries to copies of records and indexes, moving
+    only the index entries of the records they touch. Touched records are
+    replaced by new record objects, never modified in place.
+
+    The copies cost O(n) per call: readers iterate the cached dict without
+    taking the write lock, so it is never mutated. That is a shallow copy of
+    references (microseconds for a few hundred rows); the dominant cost of a
+    write is persisting it (see _write_table_change). order, the
+    table's creation order (see _creation_order) if it was built, is kept up
+    to date the same way.
+
+    Returns:
+        tuple: (records, indexes, order)
+    """
+    records = dict(records)
+    indexes = {field: dict(index) for field, index in indexes.items()}
+    copied_buckets = set()
+    if order is not None:
+        order = (list(order[0]), list(order[1]))
+
+    def bucket(field, value):
+        if (field, value) not in copied_buckets: # Buckets are shared with the old version
+            copied_buckets.add((field, value))
+            indexes[field][value] = dict(indexes[field].get(value, {}))
+        return indexes[field][value]
+
+    for entry in entries:
+        keys = _entry_keys(entry)
+        before = {key: records.get(key) for key in keys}
+        yaml_journal.apply_entries(records, [entry])
+        for key in keys:
+            old, new = before[key], records.get(key)
+            if new is not None:
+                new = records[key] = record_model.to_record(table_name, new)
+            if order is not None:
+                _move_in_creation_order(order, key, old, new)
+            for field in indexes:
+                if old is not None and (new is None or new.get(field) != old.get(field)):
+                    bucket(field, old.get(field)).pop(key, None)
+                    if not indexes[field][old.get(field)]:
+                        del indexes[field][old.get(field)]
+                if new is not None and key not in indexes[field].get(new.get(field), {}):
+                    bucket(field, new.get(field))[key] = None
+    return records, indexes, order
+
+def _cache_table(table_name, version, records, indexes, offset=0, op_count=0, partitions=None, creation_order=None):
+    # partitions: id -> month partition of the rows on disk (month-partitioned tables only)
+    # creation_order: see _creation_order; None = built on first use
+    _table_cache[table_name] = {
+        "version": version, "offset": offset, "ops": op_count,
+        "records": records, "indexes": indexes, "partitions": partitions,
+        "creation_order": creation_order
     }
-    filename = filename_map.get(table_name)
+
+def _load_sqlite_table(table_name):
+    return _load_sqlite_entry(table_name)["records"]
+
+def _load_sqlite_entry(table_name):
+    _drop_stale_cache(table_name)
+    db_path = _db_path()
+    version = ("sqlite", db_path, sqlite_backend.table_version(db_path, table_name))
+    cached = _table_cache.get(table_name)
+    if cached and cached["version"] == version:
+        return cached
+    records = _build_records(table_name, sqlite_backend.load_rows(db_path, table_name))
+    _cache_table(table_name, version, records, _build_indexes(table_name, records))
+    return _table_cache[table_name]
+
+def _load_yaml_table(table_name):
+    """Returns the id -> record mapping of the YAML snapshot plus journal tail."""
+    return _load_yaml_entry(table_name)["records"]
+
+def _load_yaml_entry(table_name):
+    _drop_stale_cache(table_name)
+    file_path = _table_file(table_name)
+    partitioned = _is_partitioned(table_name)
+    if partitioned:
+        snapshot_signature = ("partitions", _partitions_signature(table_name))
+    else:
+        snapshot_signature = _stat_signature(file_path)
+
+    journal_file = yaml_journal.journal_path(file_path)
+    try:
+        journal_stat = os.stat(journal_file)
+    except FileNotFoundError:
+        journal_stat = None
+    journal_inode = journal_stat.st_ino if journal_stat else None
+    journal_size = journal_stat.st_size if journal_stat else 0
+
+    version = ("yaml", snapshot_signature, journal_inode)
+    cached = _table_cache.get(table_name)
+    if cached and cached["version"] == version and cached["offset"] <= journal_size:
+        if cached["offset"] == journal_size:
+            return cached
+        # Journal grew since the last load: replay only the new tail
+        records, indexes, partitions = cached["records"], cached["indexes"], cached["partitions"]
+        offset, op_count, order = cached["offset"], cached["ops"], cached.get("creation_order")
+    else:
+        try:
+            if partitioned:
+                items = _read_partition_items(table_name, sorted(_read_manifest(table_name)))
+            else:
+                document = _read_yaml_shared(file_path)
+                invalidate_yaml_cache(file_path) # Only the records built below are kept
+                items = document.get(table_name) if isinstance(document, dict) else None
+        except DataFileError:
+            if cached: # Keep serving the last complete version
+                return cached
+            raise
+        records = _build_records(table_name, items if isinstance(items, list) else [])
+        indexes = _build_indexes(table_name, records)
+        partitions = _partition_membership(table_name, records) if partitioned else None
+        offset, op_count, order = 0, 0, None
+
+    if journal_stat is not None:
+        entries, offset = yaml_journal.read_entries(journal_file, offset)
+        records, indexes, order = _apply_to_table(table_name, records, indexes, entries, order)
+        op_count += len(entries)
+    _cache_table(table_name, version, records, indexes, offset, op_count, partitions, order)
+    return _table_cache[table_name]
+
+def _is_live(record):
+    """False for soft-deleted (tombstoned) rows; malformed rows count as live."""
+    return not isinstance(record, Mapping) or record.get("deleted_at") is None
+
+def _live_records(table_name):
+    """The shared records of table_name without tombstones, in table order."""
+    return [record for record in _load_table(table_name).values() if _is_live(record)]
+
+def _get_record(table_name, record_id):
+    """Returns the shared live record with the given id, or None."""
+    if _storage_backend() == "sqlite":
+        row = sqlite_backend.get_row(_db_path(), table_name, record_id)
+        record = record_model.to_record(table_name, row) if row is not None else None
+    else:
+        record = _load_table(table_name).get(record_id)
+    return record if record is not None and _is_live(record) else None
+
+def _find_records(table_name, field, value):
+    """Returns the shared live records whose field equals value, in table order."""
+    if _storage_backend() == "sqlite":
+        rows = sqlite_backend.find_rows(_db_path(), table_name, field, value)
+        records = [record_model.to_record(table_name, row) for row in rows]
+    elif field in INDEXED_FIELDS.get(table_name, ()):
+        cached = _load_yaml_entry(table_name)
+        records = cached["records"]
+        records = [records[key] for key in cached["indexes"][field].get(value, ())]
+    else:
+        records = [record for record in _load_table(table_name).values() if record.get(field) == value]
+    return [record for record in records if _is_live(record)]
+
+# Filters of query_activities/query_followups: start_date/end_date bound this
+# column, these columns match case-insensitive substrings, every other column
+# matches equal values (or any value of a list).
+QUERY_DATE_FIELDS = {"marketing_activities": "activity_date", "followups": "followup_date"}
+QUERY_SEARCH_FIELDS = ("prospect_name", "prospect_location", "contact_person")
+
+def _query_conditions(table_name, filters):
+    """Turns query filters into sqlite_backend.query_rows conditions. None and
+    "" mean "no filter"; an empty list matches nothing."""
+    conditions = []
+    for field, value in (filters or {}).items():
+        if value is None or value == "":
+            continue
+        if field == "start_date": # Compared on the integer epoch companion
+            conditions.append((epoch_fields.epoch_column(QUERY_DATE_FIELDS[table_name]), ">=",
+                               epoch_fields.to_epoch(value)))
+        elif field == "end_date": # Inclusive, also for "YYYY-MM-DD HH:MM:SS" values
+            conditions.append((epoch_fields.epoch_column(QUERY_DATE_FIELDS[table_name]), "<",
+                               epoch_fields.to_epoch(value + timedelta(days=1))))
+        elif field in QUERY_SEARCH_FIELDS:
+            conditions.append((field, "contains", str(value).lower()))
+        elif isinstance(value, (list, tuple, set)):
+            conditions.append((field, "in", list(value)))
+        else:
+            conditions.append((field, "=", value))
+    for field, _, _ in conditions:
+        if field not in sqlite_backend.STORED_COLUMNS[table_name]:
+            raise ValueError(f"Unknown filter {field!r} for table {table_name}")
+    return conditions
+
+def _matches(record, conditions):
+    for field, operator, value in conditions:
+        field_value = record.get(field)
+        if operator == "=":
+            matched = field_value == value
+        elif operator == "in":
+            matched = field_value in value
+        elif operator == "contains":
+            matched = value in str(field_value or "").lower()
+        elif field_value is None:
+            matched = False
+        elif not isinstance(value, str): # Epoch companions
+            matched = field_value >= value if operator == ">=" else field_value < value
+        elif operator == ">=":
+            matched = str(field_value) >= value
+        else: # "<"
+            matched = str(field_value) < value
+        if not matched:
+            return False
+    return True
+
+def _query_table(table_name, filters, sort, offset, limit):
+    """One page of the records matching filters plus the total match count,
+    ordered like sqlite_backend.query_rows on both backends. Only the records
+    of the page are copied."""
+    order_by, descending = sort or ("created_at", True)
+    if order_by not in sqlite_backend.TABLE_COLUMNS[table_name]:
+        raise ValueError(f"Unknown sort column {order_by!r} for table {table_name}")
+    if order_by in epoch_fields.TEMPORAL_FIELDS.get(table_name, ()):
+        order_by = epoch_fields.epoch_column(order_by) # Sort on integers, empty first
+        sort_key = lambda record: (record.get(order_by) is not None, record.get(order_by) or 0)
+    else:
+        sort_key = lambda record: "" if record.get(order_by) is None else str(record.get(order_by))
+    conditions = _query_conditions(table_name, filters)
+    if _storage_backend() == "sqlite":
+        conditions.append(("deleted_at", "=", None)) # Without tombstones
+        rows, total = sqlite_backend.query_rows(
+            _db_path(), table_name, conditions, order_by, descending, offset, limit
+        )
+        return [record_model.to_record(table_name, row) for row in rows], total
+
+    indexed = [c for c in conditions if c[1] == "=" and c[0] in INDEXED_FIELDS.get(table_name, ())]
+    if indexed: # Start from the smallest matching set the indexes can give
+        field, _, value = indexed[0]
+        candidates = _find_records(table_name, field, value)
+    else:
+        # Date bounds are integer comparisons on the cached records; re-reading
+        # the overlapping month partitions would parse YAML on every query
+        candidates = _live_records(table_name)
+    matches = [record for record in candidates if _matches(record, conditions)]
+    matches.sort(key=sort_key, reverse=descending) # Stable: ties stay in table order
+    end = None if limit is None else offset + limit
+    return [_copy_document(record) for record in matches[offset:end]], len(matches)
+
+# Range scans by creation time. Time-ordered ids (record_ids) sort by creation
+# time; legacy random ids are placed by their created_at_ts instead. The YAML
+# backend keeps the records of each cached table version in that order (built
+# on first use, nearly sorted already since new rows are appended), SQLite
+# scans the id primary key and a partial created_at index.
+
+def _to_epoch_ms(value, end=False):
+    """datetime (naive = WIB) or date -> Unix milliseconds. A date as end
+    bound stands for the whole day (the next midnight)."""
+    if not isinstance(value, datetime):
+        value = datetime.combine(value + timedelta(days=1) if end else value, datetime.min.time())
+    if value.tzinfo is None:
+        value = WIB_TZ.localize(value)
+    return int(value.timestamp() * 1000)
+
+def _order_key(record):
+    """Sort key of a record by creation time: the ULID of a time-ordered id,
+    or the encoded created_at_ts of a legacy id (before ULIDs of the same
+    millisecond); legacy rows without created_at come first."""
+    record_id = str(record.get("id"))
+    if record_ids.is_time_ordered(record_id):
+        return (record_id.partition("-")[2], record_id)
+    seconds = record.get("created_at_ts")
+    return ("" if seconds is None else record_ids.encode_time(seconds * 1000), record_id)
+
+def _creation_order(cached):
+    """(sort keys, record keys) of a cached YAML table in creation order."""
+    order = cached.get("creation_order")
+    if order is None:
+        pairs = sorted(
+            ((_order_key(record), key) for key, record in cached["records"].items()
+             if isinstance(record, record_model.Record) and _is_live(record)),
+            key=lambda pair: pair[0]
+        )
+        order = cached["creation_order"] = ([pair[0] for pair in pairs], [pair[1] for pair in pairs])
+    return order
+
+def _move_in_creation_order(order, key, old, new):
+    """Updates order (sort keys, record keys) for record key changing from old
+    to new (None = absent); only live Record rows are ordered."""
+    sort_keys, record_keys = order
+    if isinstance(old, record_model.Record) and _is_live(old):
+        position = bisect.bisect_left(sort_keys, _order_key(old))
+        if position < len(sort_keys) and record_keys[position] == key:
+            del sort_keys[position], record_keys[position]
+    if isinstance(new, record_model.Record) and _is_live(new):
+        sort_key = _order_key(new)
+        position = bisect.bisect_left(sort_keys, sort_key)
+        sort_keys.insert(position, sort_key)
+        record_keys.insert(position, key)
+
+def _scan_created(table_name, start=None, end=None, limit=None, latest=False, marketer_username=None):
+    """Shared records created in [start, end) (bounds as Unix ms, None =
+    open), oldest first or newest first with latest, at most limit."""
+    low = (record_ids.encode_time(start), "") if start is not None else None
+    high = (record_ids.encode_time(end), "") if end is not None else None
+    if _storage_backend() == "sqlite":
+        prefix = sqlite_backend.ID_PREFIXES[table_name]
+        rows, legacy_rows = sqlite_backend.scan_created_range(
+            _db_path(), table_name,
+            record_ids.id_bound(prefix, start) if start is not None else None,
+            record_ids.id_bound(prefix, end) if end is not None else None,
+            -(-start // 1000) if start is not None else None, # created_at_ts * 1000 >= start
+            -(-end // 1000) if end is not None else None,
+            latest, limit, marketer_username
+        )
+        records = [record_model.to_record(table_name, row) for row in rows + legacy_rows]
+        records.sort(key=_order_key, reverse=latest)
+        return records[:limit]
+
+    cached = _load_yaml_entry(table_name)
+    sort_keys, record_keys = _creation_order(cached)
+    first = 0 if low is None else bisect.bisect_left(sort_keys, low)
+    stop = len(sort_keys) if high is None else bisect.bisect_left(sort_keys, high)
+    positions = range(stop - 1, first - 1, -1) if latest else range(first, stop)
+    records = []
+    for position in positions:
+        if limit is not None and len(records) >= limit:
+            break
+        record = cached["records"][record_keys[position]]
+        if marketer_username is None or record.get("marketer_username") == marketer_username:
+            records.append(record)
+    return records
+
+def _write_snapshot(table_name, records, indexes=None, entries=None, order=None):
+    """Rewrites the YAML snapshot from records and drops the folded-in journal.
+    For month-partitioned tables only the partitions touched by entries are
+    rewritten (all of them when entries is None). The written records (with
+    indexes and creation order) become the cached version, so the next read
+    does not parse the file again."""
+    file_path = _table_file(table_name)
+    partitions = None
+    if _is_partitioned(table_name):
+        cached = _table_cache.get(table_name)
+        changed_ids = None if entries is None else [key for entry in entries for key in _entry_keys(entry)]
+        partitions = _write_partitions(table_name, records, cached and cached["partitions"], changed_ids)
+        written = partitions is not None
+    else:
+        written = write_yaml(file_path, {table_name: list(records.values())})
+    if not written:
+        _table_cache.pop(table_name, None)
+        return False
+    yaml_journal.remove_journal(yaml_journal.journal_path(file_path))
+    _write_lock.mark_changed(table_name)
+    if partitions is not None:
+        version = ("yaml", ("partitions", _partitions_signature(table_name)), None)
+    else:
+        version = ("yaml", _stat_signature(file_path), None)
+    if indexes is None:
+        indexes = _build_indexes(table_name, records)
+    _cache_table(table_name, version, records, indexes, partitions=partitions, creation_order=order)
+    return True
+
+@_coordinated_write(False)
+def compact_journal(table_name):
+    """Folds the write journal of table_name back into its YAML snapshot."""
+    journal_file = yaml_journal.journal_path(_table_file(table_name))
+    if not os.path.exists(journal_file):
+        return True
+    print(f"Compacting write journal for {table_name}...")
+    cached = _load_yaml_entry(table_name)
+    entries, _ = yaml_journal.read_entries(journal_file)
+    records, indexes, order = cached["records"], cached["indexes"], cached["creation_order"]
+    expired = _expired_tombstones(table_name, _tombstone_cutoff_ts())
+    if expired: # Purged by the same rewrite
+        purge = {"op": "delete", "ids": expired}
+        records, indexes, order = _apply_to_table(table_name, records, indexes, [purge], order)
+        entries = entries + [purge]
+    return _write_snapshot(table_name, records, indexes, entries, order)
+
+# --- Month Partitions ---
+# With "partition_by_month" enabled (YAML backend), marketing activities and
+# follow-ups are stored as one YAML file per month under data/<table>/, keyed by
+# the "YYYY-MM" of PARTITIONED_TABLES[table], plus a manifest.yaml with the row
+# count of every partition. The manifest is written last, so its presence marks
+# a complete partitioned layout and readers then ignore the flat file. Writes
+# rewrite only the partitions whose rows changed; date-range frame queries open
+# only the overlapping partitions. initialize_database converts between the
+# flat and partitioned layouts when the setting changes.
+
+PARTITIONED_TABLES = {"marketing_activities": "activity_date", "followups": "created_at"}
+MANIFEST_FILENAME = "manifest.yaml"
+UNDATED_PARTITION = "tanpa-tanggal"
+
+def _stat_signature(file_path):
+    try:
+        return _file_signature(os.stat(file_path))
+    except FileNotFoundError:
+        return None
+
+def _partition_dir(table_name):
+    return os.path.join(DATA_DIR, table_name)
+
+def _manifest_file(table_name):
+    return os.path.join(_partition_dir(table_name), MANIFEST_FILENAME)
+
+def _partition_file(table_name, key):
+    return os.path.join(_partition_dir(table_name), f"{key}.yaml")
+
+def _is_partitioned(table_name):
+    return table_name in PARTITIONED_TABLES and os.path.exists(_manifest_file(table_name))
+
+def _partitioning_enabled():
+    config = _read_yaml_shared(os.path.join(DATA_DIR, CONFIG_FILENAME)) or {}
+    return _is_enabled(config.get("partition_by_month", False))
+
+def _partition_key(table_name, record):
+    value = str(record.get(PARTITIONED_TABLES[table_name]) or "")
+    return value[:7] if re.match(r"\d{4}-\d{2}", value) else UNDATED_PARTITION
+
+def _partition_membership(table_name, records):
+    return {key: _partition_key(table_name, record) for key, record in records.items()}
+
+def _read_manifest(table_name):
+    """Returns the manifest's partition -> {"file", "rows"} mapping."""
+    manifest = _read_yaml_shared(_manifest_file(table_name))
+    partitions = manifest.get("partitions") if isinstance(manifest, dict) else None
+    return partitions if isinstance(partitions, dict) else {}
+
+def _partitions_signature(table_name):
+    """File signatures of the manifest and every partition it lists."""
+    signature = [_stat_signature(_manifest_file(table_name))]
+    for key in sorted(_read_manifest(table_name)):
+        signature.append((key, _stat_signature(_partition_file(table_name, key))))
+    return tuple(signature)
+
+def _read_partition_items(table_name, keys):
+    items = []
+    for key in keys:
+        partition_file = _partition_file(table_name, key)
+        document = _read_yaml_shared(partition_file)
+        invalidate_yaml_cache(partition_file) # Callers keep records or frames, not the document
+        rows = document.get(table_name) if isinstance(document, dict) else None
+        items.extend(rows if isinstance(rows, list) else [])
+    return items
+
+def _write_partitions(table_name, records, membership=None, changed_ids=None):
+    """Writes the month partitions of records that contain changed_ids (before
+    or after the change), or all partitions when membership/changed_ids is
+    None, followed by the manifest.
+
+    Returns:
+        dict: The new id -> partition membership, or None if a write failed.
+    """
+    groups = {}
+    new_membership = {}
+    for record_id, record in records.items():
+        key = _partition_key(table_name, record)
+        groups.setdefault(key, []).append(record)
+        new_membership[record_id] = key
+    if membership is None or changed_ids is None:
+        touched = set(groups) | set(_read_manifest(table_name))
+    else:
+        touched = {membership[i] for i in changed_ids if i in membership}
+        touched |= {new_membership[i] for i in changed_ids if i in new_membership}
+
+    os.makedirs(_partition_dir(table_name), exist_ok=True)
+    for key in sorted(touched):
+        partition_file = _partition_file(table_name, key)
+        if groups.get(key):
+            if not write_yaml(partition_file, {table_name: groups[key]}):
+                return None
+        elif os.path.exists(partition_file):
+            os.remove(partition_file)
+            invalidate_yaml_cache(partition_file)
+    manifest = {
+        "partition_field": PARTITIONED_TABLES[table_name],
+        "partitions": {
+            key: {"file": os.path.basename(_partition_file(table_name, key)), "rows": len(rows)}
+            for key, rows in sorted(groups.items())
+        }
+    }
+    if not write_yaml(_manifest_file(table_name), manifest):
+        return None
+    return new_membership
+
+@_coordinated_write(False)
+def apply_partition_layout():
+    """Converts marketing activities and follow-ups between the flat and the
+    month-partitioned layout to match partition_by_month in config.yaml.
+    Does nothing on the sqlite backend. Returns False if a conversion failed."""
+    if _storage_backend() != "yaml":
+        return True
+    enabled = _partitioning_enabled()
+    success = True
+    for table_name in PARTITIONED_TABLES:
+        flat_file = _table_file(table_name)
+        with _write_lock:
+            if enabled and not _is_partitioned(table_name):
+                print(f"Partitioning {table_name} by month...")
+                records = _load_yaml_table(table_name)
+                if _write_partitions(table_name, records) is None: # Manifest written last
+                    success = False
+                    continue
+                yaml_journal.remove_journal(yaml_journal.journal_path(flat_file))
+                if os.path.exists(flat_file):
+                    os.remove(flat_file)
+            elif not enabled and _is_partitioned(table_name):
+                print(f"Merging month partitions of {table_name}...")
+                records = _load_yaml_table(table_name)
+                if not write_yaml(flat_file, {table_name: list(records.values())}):
+                    success = False
+                    continue
+                yaml_journal.remove_journal(yaml_journal.journal_path(flat_file))
+                os.remove(_manifest_file(table_name)) # Readers switch back to the flat file here
+                shutil.rmtree(_partition_dir(table_name), ignore_errors=True)
+            elif enabled and os.path.exists(flat_file):
+                os.remove(flat_file) # Left over from an interrupted conversion
+            else:
+                continue
+            _table_cache.pop(table_name, None)
+            invalidate_yaml_cache(flat_file)
+    return success
+
+def _patch_sqlite_cache(table_name, db_path, new_version, entries):
+    cached = _table_cache.get(table_name)
+    if cached and cached["version"] == ("sqlite", db_path, new_version - 1):
+        # No other writer in between: patch the cached version instead of reloading
+        normalized = [sqlite_backend.normalize_entry(table_name, entry) for entry in entries]
+        records, indexes, order = _apply_to_table(
+            table_name, cached["records"], cached["indexes"], normalized, cached["creation_order"])
+        _cache_table(table_name, ("sqlite", db_path, new_version), records, indexes, creation_order=order)
+    else:
+        _table_cache.pop(table_name, None)
+
+def _with_epochs(table_name, entry):
+    """Adds the epoch companions of the temporal fields an entry writes."""
+    if entry.get("op") == "insert":
+        return {**entry, "record": epoch_fields.with_epochs(table_name, entry["record"])}
+    if entry.get("op") == "update":
+        return {**entry, "changes": epoch_fields.epoch_changes(table_name, entry["changes"])}
+    return entry
+
+# Change events are only recorded in processes that sync to Google Sheets
+# (data_hooks enables them); nothing would acknowledge them otherwise.
+_sync_outbox_enabled = False
+
+def enable_sync_outbox():
+    """Makes writes in this process record Google Sheets change events."""
+    global _sync_outbox_enabled
+    _sync_outbox_enabled = True
+
+def _record_sync_events(table_name, entries):
+    """Appends the change events of entries to the Google Sheets sync outbox
+    (see sync_outbox.py) ahead of the write. Failures are only reported: the
+    sync's row hashes and read-backs (see sheet_row_map.py) still catch
+    changes whose events are missing."""
+    if not _sync_outbox_enabled:
+        return
+    with _write_lock:
+        try:
+            sync_outbox.record(DATA_DIR, table_name, sync_outbox.events_for_entries(entries))
+        except OSError as e:
+            print(f"Warning: Could not record sync events for {table_name}: {e}")
+
+def _commit_table_change(table_name, entries):
+    """Persists journal-format entries for table_name, or queues them when a
+    transaction() block is active in this thread."""
+    entries = [_with_epochs(table_name, entry) for entry in entries]
+    _record_sync_events(table_name, entries)
+    txn = getattr(_txn_state, "current", None)
+    if txn is not None:
+        txn.pending.setdefault(table_name, []).extend(entries)
+        return True
+    return _write_table_change(table_name, entries)
+
+def _write_table_change(table_name, entries):
+    """Writes entries for table_name: one SQLite transaction on the sqlite
+    backend, appended to the journal in journal mode, otherwise applied and
+    written as a full YAML snapshot.
+
+    Only the first two are per-record writes. The snapshot path (the
+    default) re-dumps the whole table, O(n) in its rows per write; enable
+    enable_write_journal, partition_by_month or the sqlite backend in
+    config.yaml when tables grow."""
+    if _storage_backend() == "sqlite":
+        db_path = _db_path()
+        try:
+            new_version = sqlite_backend.apply_entries(db_path, table_name, entries)
+        except sqlite3.Error as e:
+            print(f"Error writing {table_name} to SQLite: {e}")
+            _table_cache.pop(table_name, None)
+            return False
+        _patch_sqlite_cache(table_name, db_path, new_version, entries)
+        _write_lock.mark_changed(table_name)
+        return True
+    if table_name in JOURNALED_TABLES and _journal_enabled():
+        with _write_lock:
+            try:
+                _load_yaml_entry(table_name) # Never journal onto an unreadable snapshot
+                yaml_journal.append_entries(yaml_journal.journal_path(_table_file(table_name)), entries)
+            except (OSError, DataFileError) as e:
+                print(f"Error appending to journal for {table_name}: {e}")
+                return False
+            _write_lock.mark_changed(table_name)
+            _load_yaml_table(table_name) # Replays just the appended tail
+            cached = _table_cache[table_name]
+        if yaml_journal.needs_compaction(yaml_journal.journal_path(_table_file(table_name)), cached["ops"]):
+            compact_journal(table_name)
+        return True
+    with _write_lock:
+        try:
+            cached = _load_yaml_entry(table_name)
+        except DataFileError as e:
+            print(f"Error writing {table_name}: {e}")
+            return False
+        records, indexes, order = _apply_to_table(
+            table_name, cached["records"], cached["indexes"], entries, cached["creation_order"])
+        return _write_snapshot(table_name, records, indexes, entries, order)
+
+# Typed DataFrames per table for the analytics pages: table name -> (version key, frame)
+_frame_cache = {}
+
+def get_table_frame(table_name, start_date=None, end_date=None, **filters):
+    """Returns a typed DataFrame of table_name (categorical status, activity
+    type and marketer, datetime64 dates; see columnar_snapshot.py), optionally
+    restricted to rows whose columns equal the given filters, e.g.
+    get_table_frame("followups", activity_id=activity_id).
+
+    start_date/end_date (datetime.date, inclusive) restrict marketing
+    activities by activity_date and follow-ups by created_at. With month
+    partitions only the overlapping partitions are opened.
+
+    Frames are rebuilt only when the data version changes and are persisted
+    under data/columnar/. Callers get their own copy.
+    """
+    frame = None
+    if start_date or end_date:
+        frame = _load_pruned_frame(table_name, start_date, end_date)
+    if frame is None:
+        frame = _load_table_frame(table_name)
+    if start_date or end_date:
+        dates = frame[PARTITIONED_TABLES[table_name]].dt.date
+        if start_date:
+            frame = frame[dates >= start_date]
+        if end_date:
+            frame = frame[dates <= end_date]
+    for field, value in filters.items():
+        frame = frame[frame[field] == value]
+    frame = frame.copy()
+    frame.reset_index(drop=True, inplace=True)
+    return columnar_snapshot.drop_unused_categories(frame)
+
+def _cached_frame(cache_key, version_key, build):
+    """Returns the frame cached under cache_key for version_key, loading the
+    persisted snapshot or calling build() when it is outdated."""
+    frame_entry = _frame_cache.get(cache_key)
+    if frame_entry is None or frame_entry[0] != version_key:
+        snapshot_dir = os.path.join(DATA_DIR, columnar_snapshot.SNAPSHOT_DIRNAME)
+        frame = columnar_snapshot.load_snapshot(snapshot_dir, cache_key, version_key)
+        if frame is None:
+            frame = build()
+            columnar_snapshot.save_snapshot(snapshot_dir, cache_key, version_key, frame)
+        frame_entry = _frame_cache[cache_key] = (version_key, frame)
+    return frame_entry[1]
+
+def _overlapping_partitions(table_name, start_date, end_date):
+    """Keys of the month partitions overlapping start_date..end_date (dates of
+    PARTITIONED_TABLES[table_name]), or None when the table is not
+    partitioned or has unfolded journal entries."""
+    if (_storage_backend() != "yaml" or not _is_partitioned(table_name)
+            or os.path.exists(yaml_journal.journal_path(_table_file(table_name)))):
+        return None
+    first_month = start_date.strftime("%Y-%m") if start_date else None
+    last_month = end_date.strftime("%Y-%m") if end_date else None
+    return [
+        key for key in sorted(_read_manifest(table_name))
+        if key != UNDATED_PARTITION and not (first_month and key < first_month)
+        and not (last_month and key > last_month)
+    ]
+
+def _load_pruned_frame(table_name, start_date, end_date):
+    """Frame of the month partitions overlapping start_date..end_date, or None
+    when the table is not partitioned or has unfolded journal entries."""
+    keys = _overlapping_partitions(table_name, start_date, end_date)
+    if keys is None:
+        return None
+    columns = sqlite_backend.TABLE_COLUMNS[table_name]
+    frames = []
+    for key in keys:
+        partition_file = _partition_file(table_name, key)
+        signature = _stat_signature(partition_file)
+        if signature is None:
+            continue
+        frames.append(_cached_frame(
+            f"{table_name}.{key}", repr(signature),
+            lambda: columnar_snapshot.build_frame(
+                table_name, [item for item in _read_partition_items(table_name, [key]) if _is_live(item)], columns
+            )
+        ))
+    return columnar_snapshot.concat_frames(table_name, frames, columns)
+
+def _load_table_frame(table_name):
+    _load_table(table_name)
+    cached = _table_cache[table_name]
+    return _cached_frame(
+        table_name, repr((cached["version"], cached["offset"])),
+        lambda: columnar_snapshot.build_frame(
+            table_name, [record for record in cached["records"].values() if _is_live(record)],
+            sqlite_backend.TABLE_COLUMNS[table_name]
+        )
+    )
+
+# --- Transactions ---
+# transaction() batches the table writes of a block (unit of work) and flushes
+# every touched table once when the block exits. On SQLite the flush is a single
+# database transaction. On YAML a multi-table flush first writes the batch to a
+# redo log (TRANSACTION_LOG, replaced atomically); the log is removed once all
+# tables are written and replayed by recover_pending_transaction() otherwise.
+# Replaying is safe because journal entries are idempotent.
+
+TRANSACTION_LOG = "transaction" + yaml_journal.JOURNAL_SUFFIX
+_txn_state = threading.local()
+
+class _Transaction:
+    def __init__(self):
+        self.pending = {} # table name -> journal-format entries, in write order
+        self.ok = True # False once the flush at commit failed
+
+@contextlib.contextmanager
+def transaction():
+    """Unit of work: writes inside the block are queued and flushed once per
+    touched table when it exits; an exception discards them. Reads inside the
+    block see the last committed data. Nested blocks join the outer one.
+
+    Usage:
+        with transaction() as txn:
+            ...
+        if not txn.ok:
+            ...
+    """
+    outer = getattr(_txn_state, "current", None)
+    if outer is not None:
+        yield outer
+        return
+    txn = _txn_state.current = _Transaction()
+    try:
+        yield txn
+    finally:
+        _txn_state.current = None
+    if txn.pending:
+        txn.ok = _flush_transaction(txn.pending)
+
+def _transaction_log_path():
+    return os.path.join(DATA_DIR, TRANSACTION_LOG)
+
+def _flush_transaction(pending):
+    if _storage_backend() == "sqlite":
+        db_path = _db_path()
+        try:
+            versions = sqlite_backend.apply_changes(db_path, pending)
+        except sqlite3.Error as e:
+            print(f"Error committing transaction to SQLite: {e}")
+            for table_name in pending:
+                _table_cache.pop(table_name, None)
+            return False
+        for table_name, entries in pending.items():
+            _patch_sqlite_cache(table_name, db_path, versions[table_name], entries)
+            _write_lock.mark_changed(table_name)
+        return True
+    if len(pending) == 1:
+        (table_name, entries), = pending.items()
+        return _write_table_change(table_name, entries)
+
+    with _write_lock:
+        recover_pending_transaction()
+        log_path = _transaction_log_path()
+        try:
+            temp_path = log_path + ".tmp"
+            with open(temp_path, "w", encoding="utf-8") as file:
+                json.dump(pending, file, ensure_ascii=False, default=str)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temp_path, log_path) # Commit point
+        except OSError as e:
+            print(f"Error writing transaction log: {e}")
+            return False
+        if all([_write_table_change(table_name, entries) for table_name, entries in pending.items()]):
+            yaml_journal.remove_journal(log_path)
+            return True
+        print("Warning: Transaction partially written; it will be replayed from the transaction log.")
+        return False
+
+@_coordinated_write(False)
+def recover_pending_transaction():
+    """Re-applies a transaction whose flush was interrupted. Returns True when
+    there was nothing to recover or the replay succeeded."""
+    log_path = _transaction_log_path()
+    try:
+        with open(log_path, "r", encoding="utf-8") as file:
+            pending = json.load(file)
+    except FileNotFoundError:
+        return True
+    except (OSError, ValueError) as e:
+        print(f"Warning: Dropping unreadable transaction log: {e}")
+        yaml_journal.remove_journal(log_path)
+        return True
+    print("Replaying interrupted transaction...")
+    if all([_write_table_change(table_name, entries) for table_name, entries in pending.items()]):
+        yaml_journal.remove_journal(log_path)
+        return True
+    return False
+
+def _insert_records(table_name, new_records):
+    return _commit_table_change(table_name, [{"op": "insert", "record": record} for record in new_records])
+
+def _update_record(table_name, record_id, changes):
+    return _commit_table_change(table_name, [{"op": "update", "id": record_id, "changes": changes}])
+
+def _delete_records(table_name, record_ids):
+    return _commit_table_change(table_name, [{"op": "delete", "ids": list(record_ids)}])
+
+# --- Soft Deletes ---
+# Deleting a user, activity or follow-up writes a tombstone instead of dropping
+# the row: one small update setting deleted_at (WIB timestamp), deleted_at_ts
+# and deleted_by. Tombstoned rows are hidden from every getter, query, frame
+# and export, but stay visible to get_tombstones() so the Google Sheets sync
+# can remove them from the sheet. purge_tombstones() physically removes
+# tombstones older than tombstone_retention_days (config.yaml); it runs from
+# initialize_database and compact_journal.
+
+DEFAULT_TOMBSTONE_RETENTION_DAYS = 7
+
+def _soft_delete_records(table_name, record_ids, deleted_by=None):
+    now = datetime.now(WIB_TZ)
+    changes = {
+        "deleted_at": now.strftime("%Y-%m-%d %H:%M:%S"),
+        "deleted_at_ts": int(now.timestamp()),
+        "deleted_by": deleted_by,
+    }
+    return _commit_table_change(
+        table_name, [{"op": "update", "id": record_id, "changes": changes} for record_id in record_ids]
+    )
+
+def get_tombstones(table_name):
+    """Copies of the soft-deleted rows of table_name that are not purged yet."""
+    return [_copy_document(record) for record in _load_table(table_name).values() if not _is_live(record)]
+
+def get_tombstone_retention_days():
+    """tombstone_retention_days from config.yaml: how many days deleted rows
+    are kept before purge_tombstones removes them."""
+    config = _read_yaml_shared(os.path.join(DATA_DIR, CONFIG_FILENAME)) or {}
+    try:
+        return int(config.get("tombstone_retention_days", DEFAULT_TOMBSTONE_RETENTION_DAYS))
+    except (TypeError, ValueError):
+        return DEFAULT_TOMBSTONE_RETENTION_DAYS
+
+def _tombstone_cutoff_ts(retention_days=None):
+    """Epoch seconds at or before which tombstones are purged."""
+    if retention_days is None:
+        retention_days = get_tombstone_retention_days()
+    return int((datetime.now(WIB_TZ) - timedelta(days=int(retention_days))).timestamp())
+
+def _expired_tombstones(table_name, cutoff_ts):
+    return [
+        key for key, record in _load_table(table_name).items()
+        if not _is_live(record) and (record.get("deleted_at_ts") or 0) <= cutoff_ts
+    ]
+
+@_coordinated_write((False, WRITE_LOCK_BUSY_MESSAGE, 0))
+def purge_tombstones(retention_days=None):
+    """Physically removes the tombstones older than retention_days (default:
+    tombstone_retention_days in config.yaml) from all tables.
+
+    Returns:
+        tuple: (success, message, number of purged rows)
+    """
+    cutoff_ts = _tombstone_cutoff_ts(retention_days)
+    expired = {table_name: _expired_tombstones(table_name, cutoff_ts) for table_name in record_model.RECORD_TYPES}
+    count = sum(len(ids) for ids in expired.values())
+    if not count:
+        return True, "Tidak ada data terhapus yang perlu dibersihkan", 0
+    with transaction() as txn:
+        for table_name, record_ids in expired.items():
+            if record_ids:
+                _delete_records(table_name, record_ids)
+    if not txn.ok:
+        return False, "Gagal membersihkan data terhapus", 0
+    return True, f"{count} data terhapus berhasil dibersihkan", count
+
+# --- Google Sheets Sync Outbox ---
+# _commit_table_change records a change event per touched row in
+# data/<table>.outbox (sync_outbox.py); GoogleSheetsSync drains the events
+# into row-level sheet operations and acknowledges them.
+
+def get_record_by_id(table_name, record_id):
+    """Copy of the live record of table_name with the given id, or None."""
+    record = _get_record(table_name, record_id)
+    return _copy_document(record) if record is not None else None
+
+@_coordinated_write(([], 0))
+def get_pending_sync_events(table_name):
+    """Returns (events, offset): the unsynced change events of table_name
+    (see sync_outbox.py); pass offset to acknowledge_sync_events. Taken under
+    the write lock, so every returned event's write has completed."""
+    return sync_outbox.pending(DATA_DIR, table_name)
+
+@_coordinated_write(False)
+def acknowledge_sync_events(table_name, offset):
+    """Drops the change events of table_name up to offset after they reached
+    the sheet. Returns True on success."""
+    try:
+        sync_outbox.acknowledge(DATA_DIR, table_name, offset)
+    except OSError as e:
+        print(f"Error acknowledging sync events for {table_name}: {e}")
+        return False
+    return True
+
+@_coordinated_write(False)
+def write_yaml_data(table_name, data):
+    """Writes data to the specified table's YAML file, replacing the table."""
+    filename = TABLE_FILENAMES.get(table_name)
     if not filename:
         print(f"Error: Unknown table name 	{table_name}	 for writing YAML data.")
-        return
-    file_path = os.path.join(DATA_DIR, filename)
-    write_yaml(file_path, data)
+        return False
+    if table_name == "config":
+        return write_yaml(os.path.join(DATA_DIR, filename), data)
+    items = [
+        epoch_fields.with_epochs(table_name, item) if isinstance(item, dict) else item
+        for item in (data or {}).get(table_name) or []
+    ]
+    if _storage_backend() == "sqlite":
+        try:
+            sqlite_backend.replace_table(_db_path(), table_name, items)
+            return True
+        except sqlite3.Error as e:
+            print(f"Error replacing {table_name} in SQLite: {e}")
+            return False
+    with _write_lock:
+        return _write_snapshot(table_name, _build_records(table_name, items))
+
 def read_yaml_data(table_name):
-    """Reads raw data from the specified table's YAML file."""
-    filename_map = {
-        "marketing_activities": ACTIVITIES_FILENAME,
-        "users": USERS_FILENAME,
-        "followups": FOLLOWUPS_FILENAME,
-        "config": CONFIG_FILENAME
-    }
-    filename = filename_map.get(table_name)
+    """Reads raw data of the specified table from the configured backend,
+    including journaled changes that have not been compacted yet."""
+    filename = TABLE_FILENAMES.get(table_name)
     if not filename:
         print(f"Error: Unknown table name '{table_name}' for reading YAML data.")
         return None
-    file_path = os.path.join(DATA_DIR, filename)
-    return read_yaml(file_path)
+    if table_name == "config":
+        return read_yaml(os.path.join(DATA_DIR, filename))
+    return {table_name: [
+        record.to_dict() if isinstance(record, record_model.Record) else _copy_document(record)
+        for record in _live_records(table_name)
+    ]}
+
+def iter_table_records(table_name):
+    """Yields the raw records of table_name one at a time without building the
+    table in memory: from a SQLite cursor, or streamed from the YAML snapshot
+    files (see yaml_stream.py). While a write journal holds changes that are
+    not folded in yet, the materialized table is used instead.
+
+    Raises:
+        yaml_stream.TableStructureError, OSError, yaml.YAMLError: For
+            unreadable snapshot files.
+    """
+    if _storage_backend() == "sqlite":
+        yield from filter(_is_live, sqlite_backend.iter_rows(_db_path(), table_name))
+        return
+    if os.path.exists(yaml_journal.journal_path(_table_file(table_name))):
+        for record in _live_records(table_name):
+            yield record.to_dict() if isinstance(record, record_model.Record) else _copy_document(record)
+        return
+    if _is_partitioned(table_name):
+        table_files = [_partition_file(table_name, key) for key in sorted(_read_manifest(table_name))]
+    else:
+        table_files = [_table_file(table_name)]
+    for table_file in table_files:
+        if os.path.exists(table_file):
+            yield from filter(_is_live, yaml_stream.iter_records(table_file, table_name))
     
 
 # --- Security --- 
@@ -101,7 +1293,8 @@ def verify_password(password, hashed_password):
 # --- Utilities --- 
 
 def generate_id(prefix):
-    return f"{prefix}-{uuid.uuid4().hex[:8]}"
+    """Returns a new time-ordered id, e.g. "act-01J9ZQ3V6M8X1T4KQ2N7B5R0CD" (see record_ids)."""
+    return record_ids.new_id(prefix)
 
 
 def get_wib_now_str(): # Renamed for clarity
@@ -117,36 +1310,58 @@ def get_current_timestamp():
 
 # --- Database Initialization --- 
 
+def _default_admin():
+    return {
+        "id": generate_id("usr"), # Add ID for consistency
+        "username": "admin",
+        "password_hash": hash_password("admin123"),
+        "name": "Admin Utama",
+        "role": "superadmin",
+        "email": "admin@example.com",
+        "created_at": get_wib_now_str() # Use WIB timestamp
+    }
+
+# Streamlit reruns the app script on every interaction; the apps call
+# ensure_database_initialized so the maintenance below runs once per process.
+_initialized_data_dirs = set()
+
+def ensure_database_initialized():
+    """Runs initialize_database once per process and data directory. A failed
+    run (e.g. the write lock stayed busy) is retried on the next call."""
+    data_dir = os.path.abspath(DATA_DIR)
+    if data_dir not in _initialized_data_dirs and initialize_database():
+        _initialized_data_dirs.add(data_dir)
+
 def initialize_database():
+    """Creates missing data files, then runs migrations, transaction recovery,
+    partition layout, pending archives and the tombstone purge. Returns True
+    on success."""
+    # bcrypt is slow: hash the default admin password only when it is needed,
+    # and before taking the write lock
+    users_file = os.path.join(DATA_DIR, USERS_FILENAME)
+    needs_admin = not os.path.exists(users_file) or (_storage_backend() == "sqlite" and not _load_table("users"))
+    default_users = {"users": [_default_admin()]} if needs_admin else None
+    return _initialize_database(default_users)
+
+@_coordinated_write(False)
+def _initialize_database(default_users):
     print("Initializing database files...")
     # File users.yaml
     users_file = os.path.join(DATA_DIR, USERS_FILENAME)
-    default_users = {
-        "users": [
-            {
-                "id": generate_id("usr"), # Add ID for consistency
-                "username": "admin",
-                "password_hash": hash_password("admin123"),
-                "name": "Admin Utama",
-                "role": "superadmin",
-                "email": "admin@example.com",
-                "created_at": get_wib_now_str() # Use WIB timestamp
-            }
-        ]
-    }    
-    create_yaml_if_not_exists(users_file, default_users)
+    if default_users is not None:
+        create_yaml_if_not_exists(users_file, default_users)
     
     # File marketing_activities.yaml
     activities_file = os.path.join(DATA_DIR, ACTIVITIES_FILENAME)
     default_activities = {"marketing_activities": []} 
-    create_yaml_if_not_exists(activities_file, default_activities)
-    # Check and migrate old key if necessary
-    _migrate_activities_key(activities_file)
+    if not _is_partitioned("marketing_activities"):
+        create_yaml_if_not_exists(activities_file, default_activities)
     
     # File followups.yaml
     followups_file = os.path.join(DATA_DIR, FOLLOWUPS_FILENAME)
     default_followups = {"followups": []}
-    create_yaml_if_not_exists(followups_file, default_followups)
+    if not _is_partitioned("followups"):
+        create_yaml_if_not_exists(followups_file, default_followups)
     
     # File config.yaml
     config_file = os.path.join(DATA_DIR, CONFIG_FILENAME)
@@ -159,105 +1374,188 @@ def initialize_database():
         "date_format": "%Y-%m-%d %H:%M:%S",
         "enable_email": False,
         "enable_reminder": True,
-        "reminder_days_before": 1
+        "reminder_days_before": 1,
+        "enable_write_journal": False, # Append writes to data/*.journal instead of rewriting YAML
+        "storage_backend": "yaml", # "sqlite" stores tables in data/marketing_tracker.db
+        "partition_by_month": False, # One YAML file per month for activities and follow-ups
+        "archive_after_days": cold_archive.DEFAULT_ARCHIVE_AFTER_DAYS, # Age of closed activities moved to data/archive/
+        "tombstone_retention_days": DEFAULT_TOMBSTONE_RETENTION_DAYS, # Days deleted rows are kept as tombstones
+        "sheets_verify_interval_hours": sheet_row_map.DEFAULT_VERIFY_INTERVAL_HOURS # Hours between read-backs of the sheets
     }
     create_yaml_if_not_exists(config_file, default_config)
+    try:
+        run_migrations()
+        recover_pending_transaction()
+        apply_partition_layout()
+        finish_pending_archives()
+        purge_tombstones()
+    except DataFileError as e: # A damaged file must not stop every page load
+        print(f"Error during database maintenance: {e}")
+        if hasattr(st, "error"):
+            st.error(f"Pemeliharaan data gagal: {e}")
+        return False
+
+    if default_users is not None and _storage_backend() == "sqlite" and not _load_table("users"):
+        _insert_records("users", default_users["users"])
     print("Database initialization complete.")
+    return True
 
 # --- Migration Helper --- 
+# The data directory carries its schema version in SCHEMA_FILENAME. Migrations
+# run once, in order, from initialize_database (and after a backup restore);
+# the read and write paths assume the current schema. Each migration returns
+# True on success, including when there was nothing to change.
 
-def _migrate_activities_key(activities_file):
+def _migrate_activities_key():
     """Checks for old "activities" key and migrates to "marketing_activities"."""
-    activities_data = read_yaml(activities_file)
+    activities_file = _table_file("marketing_activities")
+    activities_data = _read_yaml_shared(activities_file)
     if activities_data and "activities" in activities_data and "marketing_activities" not in activities_data:
         print(f"Migrating old 'activities' key to 'marketing_activities' in {activities_file}...")
+        activities_data = _copy_document(activities_data)
         activities_data["marketing_activities"] = activities_data.pop("activities")
-        write_yaml(activities_file, activities_data)
+        if not write_yaml(activities_file, activities_data):
+            return False
+        _table_cache.pop("marketing_activities", None)
         print("Migration complete.")
-        return True
-    return False
+    return True
+
+def _backfill_epoch_fields():
+    """Fills the integer epoch companions (epoch_fields.py) of rows written
+    before they existed, one update per row in a single write per table."""
+    for table_name in epoch_fields.TEMPORAL_FIELDS:
+        entries = []
+        for key, record in _load_table(table_name).items():
+            if not isinstance(record, record_model.Record) or key != record.get("id"):
+                continue # Id-less and duplicate rows cannot be addressed by an update
+            changes = epoch_fields.stale_epochs(table_name, record)
+            if changes:
+                entries.append({"op": "update", "id": key, "changes": changes})
+        if entries:
+            print(f"Backfilling epoch fields of {len(entries)} {table_name} rows...")
+            if not _write_table_change(table_name, entries):
+                return False
+    return True
+
+# Ordered (version, description, function); append new migrations at the end
+MIGRATIONS = [
+    (1, "Rename 'activities' key to 'marketing_activities'", _migrate_activities_key),
+    (2, "Backfill integer epoch companions of date/timestamp fields", _backfill_epoch_fields),
+]
+
+def get_schema_version():
+    stamp = _read_yaml_shared(os.path.join(DATA_DIR, SCHEMA_FILENAME)) or {}
+    try:
+        return int(stamp.get("schema_version", 0))
+    except (TypeError, ValueError):
+        return 0
+
+@_coordinated_write(False)
+def run_migrations():
+    """Applies the migrations newer than the stamped schema version, stamping
+    after each one. Returns False if a migration failed (later ones are skipped)."""
+    current_version = get_schema_version()
+    for version, description, migration in MIGRATIONS:
+        if version <= current_version:
+            continue
+        print(f"Running migration {version}: {description}")
+        if not migration():
+            print(f"Migration {version} failed; schema stays at version {current_version}.")
+            return False
+        current_version = version
+        write_yaml(os.path.join(DATA_DIR, SCHEMA_FILENAME), {"schema_version": current_version})
+    return True
+
+@_coordinated_write((False, WRITE_LOCK_BUSY_MESSAGE))
+def migrate_yaml_to_sqlite(activate=False):
+    """Copies users, marketing activities and follow-ups from the YAML files
+    into the SQLite database, replacing its current content.
+
+    Args:
+        activate (bool): Switch storage_backend to sqlite afterwards.
+
+    Returns:
+        tuple: (success, message)
+    """
+    db_path = _db_path()
+    counts = []
+    try:
+        for table_name in ("users", "marketing_activities", "followups"):
+            records = []
+            for record in _load_yaml_table(table_name).values():
+                if not record.get("id"):
+                    prefix = {"users": "usr", "marketing_activities": "act", "followups": "fu"}[table_name]
+                    record = {**record, "id": generate_id(prefix)}
+                records.append(record)
+            sqlite_backend.replace_table(db_path, table_name, records)
+            counts.append(f"{len(records)} {table_name}")
+    except sqlite3.Error as e:
+        return False, f"Migrasi ke SQLite gagal: {e}"
+    if activate:
+        update_app_config({"storage_backend": "sqlite"})
+    return True, f"Migrasi ke SQLite selesai: {', '.join(counts)}"
 
 # --- User Management --- 
 
 def authenticate_user(username, password):
-    users_file = os.path.join(DATA_DIR, USERS_FILENAME)
-    users_data = read_yaml(users_file)
-    if not users_data or "users" not in users_data:
-        return None
-    for user in users_data["users"]:
-        if user["username"] == username and verify_password(password, user["password_hash"]):
-            return user
+    for user in _find_records("users", "username", username):
+        if verify_password(password, user["password_hash"]):
+            return _copy_document(user)
     return None
 
 def get_all_users():
-    users_file = os.path.join(DATA_DIR, USERS_FILENAME)
-    users_data = read_yaml(users_file)
-    if not users_data or "users" not in users_data:
-        return []
-    return users_data["users"]
+    return [_copy_document(user) for user in _live_records("users")]
 
 def add_user(username, password, name, role, email):
-    users_file = os.path.join(DATA_DIR, USERS_FILENAME)
-    users_data = read_yaml(users_file)
-    if not users_data or "users" not in users_data:
-        users_data = {"users": []}
-    if any(user["username"] == username for user in users_data["users"]):
+    # bcrypt is slow on purpose; hash before taking the write lock
+    return _add_user(username, hash_password(password), name, role, email)
+
+@_coordinated_write((False, WRITE_LOCK_BUSY_MESSAGE))
+def _add_user(username, password_hash, name, role, email):
+    if _find_records("users", "username", username):
         return False, "Username sudah digunakan"
     new_user = {
         "id": generate_id("usr"), # Add ID
         "username": username,
-        "password_hash": hash_password(password),
+        "password_hash": password_hash,
         "name": name,
         "role": role,
         "email": email,
         "created_at": get_current_timestamp() # Use WIB timestamp
     }
-    users_data["users"].append(new_user)
-    write_yaml(users_file, users_data)
+    if not _insert_records("users", [new_user]):
+        return False, "Gagal menyimpan pengguna"
     return True, "Pengguna berhasil ditambahkan"
+@_coordinated_write((False, WRITE_LOCK_BUSY_MESSAGE))
 def delete_user(username, current_user_username):
     if username == current_user_username:
         return False, "Anda tidak dapat menghapus akun Anda sendiri"
-    users_file = os.path.join(DATA_DIR, USERS_FILENAME)
-    users_data = read_yaml(users_file)
-    if not users_data or "users" not in users_data:
-        return False, "Data pengguna tidak ditemukan"
-    initial_length = len(users_data["users"])
-    users_data["users"] = [user for user in users_data["users"] if user["username"] != username]
-    if len(users_data["users"]) == initial_length:
+    user_keys = [user["id"] for user in _find_records("users", "username", username)]
+    if not user_keys:
         return False, "Pengguna tidak ditemukan"
-    write_yaml(users_file, users_data)
+    if not _soft_delete_records("users", user_keys, current_user_username):
+        return False, "Gagal menghapus pengguna"
     return True, f"Pengguna {username} berhasil dihapus"
 
 # --- Marketing Activities --- 
 
 def get_all_marketing_activities():
-    activities_file = os.path.join(DATA_DIR, ACTIVITIES_FILENAME)
-    # Ensure migration check happens if needed
-    _migrate_activities_key(activities_file)
-    activities_data = read_yaml(activities_file)
-    if not activities_data or "marketing_activities" not in activities_data:
-        return []
-    return activities_data["marketing_activities"]
+    return [_copy_document(activity) for activity in _live_records("marketing_activities")]
+
+def _get_shared_activities():
+    return _live_records("marketing_activities")
 
 def get_marketing_activities_by_username(username):
-    activities = get_all_marketing_activities()
-    return [activity for activity in activities if activity["marketer_username"] == username]
+    activities = _find_records("marketing_activities", "marketer_username", username)
+    return [_copy_document(activity) for activity in activities]
 
 # Updated function signature to include status
+@_coordinated_write((False, WRITE_LOCK_BUSY_MESSAGE, None))
 def add_marketing_activity(marketer_username, prospect_name, prospect_location, 
                           contact_person, contact_position, contact_phone, 
                           contact_email, activity_date, activity_type, description, status):
-    activities_file = os.path.join(DATA_DIR, ACTIVITIES_FILENAME)
-    # Ensure migration check happens if needed
-    _migrate_activities_key(activities_file)
-    activities_data = read_yaml(activities_file)
-    if not activities_data or "marketing_activities" not in activities_data:
-        activities_data = {"marketing_activities": []}
     activity_id = generate_id("act")
 
-    current_time_wib = get_wib_now_str() # Get WIB timestamp
-
     current_time_wib = get_current_timestamp() # Get WIB timestamp
 
     new_activity = {
@@ -276,111 +1574,169 @@ def add_marketing_activity(marketer_username, prospect_name, prospect_location,
         "created_at": current_time_wib, # Use WIB timestamp
         "updated_at": current_time_wib # Use WIB timestamp
     }
-    activities_data["marketing_activities"].append(new_activity)
-    write_yaml(activities_file, activities_data)
+    if not _insert_records("marketing_activities", [new_activity]):
+        return False, "Gagal menyimpan aktivitas pemasaran", None
     return True, "Aktivitas pemasaran berhasil ditambahkan", activity_id
 
+ACTIVITY_REQUIRED_FIELDS = [
+    "marketer_username", "prospect_name", "prospect_location", "contact_person",
+    "contact_phone", "activity_date", "activity_type", "description"
+]
+ACTIVITY_OPTIONAL_FIELDS = ["contact_position", "contact_email"]
+
+@_coordinated_write((False, WRITE_LOCK_BUSY_MESSAGE, []))
+def add_marketing_activities_bulk(records):
+    """Adds many marketing activities with a single write.
+
+    Args:
+        records (list): Dicts with the add_marketing_activity fields; "status"
+            defaults to "baru". Nothing is saved if any record is incomplete.
+
+    Returns:
+        tuple: (success, message, list of new activity ids)
+    """
+    incomplete = [
+        index + 1 for index, record in enumerate(records)
+        if any(record.get(field) in (None, "") for field in ACTIVITY_REQUIRED_FIELDS)
+    ]
+    if incomplete:
+        shown = ", ".join(str(number) for number in incomplete[:10])
+        return False, f"Data wajib belum lengkap pada baris: {shown}", []
+    if not records:
+        return False, "Tidak ada aktivitas untuk ditambahkan", []
+
+    current_time_wib = get_current_timestamp()
+    new_activities = []
+    for record in records:
+        new_activity = {"id": generate_id("act")}
+        for field in ACTIVITY_REQUIRED_FIELDS + ACTIVITY_OPTIONAL_FIELDS:
+            new_activity[field] = record.get(field) or ""
+        new_activity["activity_date"] = str(record["activity_date"]) # Ensure date is string
+        new_activity["status"] = record.get("status") or "baru"
+        new_activity["created_at"] = current_time_wib
+        new_activity["updated_at"] = current_time_wib
+        new_activities.append(new_activity)
+    if not _insert_records("marketing_activities", new_activities):
+        return False, "Gagal menyimpan aktivitas pemasaran", []
+    return True, f"{len(new_activities)} aktivitas pemasaran berhasil ditambahkan", [a["id"] for a in new_activities]
+
+@_coordinated_write((False, WRITE_LOCK_BUSY_MESSAGE))
 def edit_marketing_activity(activity_id, prospect_name, prospect_location, 
                            contact_person, contact_position, contact_phone, 
                            contact_email, activity_date, activity_type, description, status):
-    activities_file = os.path.join(DATA_DIR, ACTIVITIES_FILENAME)
-    _migrate_activities_key(activities_file) # Ensure migration check
-    activities_data = read_yaml(activities_file)
-    if not activities_data or "marketing_activities" not in activities_data:
-        return False, "Data aktivitas tidak ditemukan"
-    activity_found = False
-    for activity in activities_data["marketing_activities"]:
-        if activity["id"] == activity_id:
-            activity_found = True
-            activity.update({
-                "prospect_name": prospect_name,
-                "prospect_location": prospect_location,
-                "contact_person": contact_person,
-                "contact_position": contact_position,
-                "contact_phone": contact_phone,
-                "contact_email": contact_email,
-                "activity_date": str(activity_date), # Ensure date is string
-                "activity_type": activity_type,
-                "description": description,
-                "status": status,
-                "updated_at": get_current_timestamp() # Use WIB timestamp for update
-            })
-            break
-    if not activity_found:
+    if _get_record("marketing_activities", activity_id) is None:
         return False, "Aktivitas tidak ditemukan"
-    write_yaml(activities_file, activities_data)
+    changes = {
+        "prospect_name": prospect_name,
+        "prospect_location": prospect_location,
+        "contact_person": contact_person,
+        "contact_position": contact_position,
+        "contact_phone": contact_phone,
+        "contact_email": contact_email,
+        "activity_date": str(activity_date), # Ensure date is string
+        "activity_type": activity_type,
+        "description": description,
+        "status": status,
+        "updated_at": get_current_timestamp() # Use WIB timestamp for update
+    }
+    if not _update_record("marketing_activities", activity_id, changes):
+        return False, "Gagal menyimpan perubahan aktivitas"
     return True, "Aktivitas pemasaran berhasil diperbarui"
-def delete_marketing_activity(activity_id):
-    activities_file = os.path.join(DATA_DIR, ACTIVITIES_FILENAME)
-    _migrate_activities_key(activities_file) # Ensure migration check
-    activities_data = read_yaml(activities_file)
-    if not activities_data or "marketing_activities" not in activities_data:
-        return False, "Data aktivitas tidak ditemukan"
-    initial_length = len(activities_data["marketing_activities"])
-    activities_data["marketing_activities"] = [act for act in activities_data["marketing_activities"] if act["id"] != activity_id]
-    if len(activities_data["marketing_activities"]) == initial_length:
+
+@_coordinated_write((False, WRITE_LOCK_BUSY_MESSAGE))
+def delete_marketing_activity(activity_id, deleted_by=None):
+    if _get_record("marketing_activities", activity_id) is None:
         return False, "Aktivitas tidak ditemukan"
-    write_yaml(activities_file, activities_data)
-    # Delete related followups
-    followups_file = os.path.join(DATA_DIR, FOLLOWUPS_FILENAME)
-    followups_data = read_yaml(followups_file)
-    if followups_data and "followups" in followups_data:
-        followups_data["followups"] = [f for f in followups_data["followups"] if f["activity_id"] != activity_id]
-        write_yaml(followups_file, followups_data)
+    # Tombstone related followups (looked up through the activity_id index) in the same unit of work
+    related_ids = [f["id"] for f in _find_records("followups", "activity_id", activity_id)]
+    with transaction() as txn:
+        _soft_delete_records("marketing_activities", [activity_id], deleted_by)
+        if related_ids:
+            _soft_delete_records("followups", related_ids, deleted_by)
+    if not txn.ok:
+        return False, "Gagal menghapus aktivitas"
     return True, "Aktivitas pemasaran berhasil dihapus"
 
+@_coordinated_write((False, WRITE_LOCK_BUSY_MESSAGE))
 def update_activity_status(activity_id, new_status):
-    activities_file = os.path.join(DATA_DIR, ACTIVITIES_FILENAME)
-    _migrate_activities_key(activities_file) # Ensure migration check
-    activities_data = read_yaml(activities_file)
-    if not activities_data or "marketing_activities" not in activities_data:
-        return False, "Data aktivitas tidak ditemukan"
-    activity_found = False
-    for activity in activities_data["marketing_activities"]:
-        if activity["id"] == activity_id:
-            activity["status"] = new_status
-
-            activity["updated_at"] = get_wib_now_str() # Use WIB timestamp for update
-
-            activity["updated_at"] = get_current_timestamp() # Use WIB timestamp for update
-
-            activity_found = True
-            break
-    if not activity_found:
+    if _get_record("marketing_activities", activity_id) is None:
         return False, "Aktivitas tidak ditemukan"
-    write_yaml(activities_file, activities_data)
+    changes = {
+        "status": new_status,
+        "updated_at": get_current_timestamp() # Use WIB timestamp for update
+    }
+    if not _update_record("marketing_activities", activity_id, changes):
+        return False, "Gagal menyimpan status aktivitas"
     return True, "Status aktivitas berhasil diperbarui"
 
 def get_activity_by_id(activity_id):
-    activities = get_all_marketing_activities()
-    for activity in activities:
-        if activity["id"] == activity_id:
-            return activity
-    return None
+    activity = _get_record("marketing_activities", activity_id)
+    return _copy_document(activity) if activity is not None else None
+
+def query_activities(filters=None, sort=None, offset=0, limit=None):
+    """Returns one page of marketing activities.
+
+    Args:
+        filters (dict): Column values to match, e.g. {"status": ["baru",
+            "dalam_proses"], "marketer_username": "andi"}; "start_date" /
+            "end_date" (datetime.date, inclusive) bound activity_date and
+            "prospect_location" matches a case-insensitive part of the name.
+        sort (tuple): (column, descending), default ("created_at", True).
+        offset (int): Number of matching rows to skip.
+        limit (int): Page size, None for all remaining rows.
+
+    Returns:
+        tuple: (list of activities on the page, total number of matches)
+    """
+    return _query_table("marketing_activities", filters, sort, offset, limit)
+
+def get_latest_activities(limit, marketer_username=None):
+    """Returns the limit most recently created activities, newest first,
+    optionally of one marketer."""
+    records = _scan_created("marketing_activities", limit=limit, latest=True, marketer_username=marketer_username)
+    return [_copy_document(record) for record in records]
+
+def get_activities_created_between(start, end):
+    """Returns the activities created from start up to end, oldest first.
+    start/end are datetimes (naive = WIB, end exclusive) or dates (whole
+    days, end inclusive)."""
+    records = _scan_created("marketing_activities", _to_epoch_ms(start), _to_epoch_ms(end, end=True))
+    return [_copy_document(record) for record in records]
 
 # --- Follow-ups --- 
 
 def get_all_followups():
-    followups_file = os.path.join(DATA_DIR, FOLLOWUPS_FILENAME)
-    followups_data = read_yaml(followups_file)
-    if not followups_data or "followups" not in followups_data:
-        return []
-    return followups_data["followups"]
+    return [_copy_document(followup) for followup in _live_records("followups")]
+
+def _get_shared_followups():
+    return _live_records("followups")
 
 def get_followups_by_activity_id(activity_id):
-    followups = get_all_followups()
-    return [followup for followup in followups if followup["activity_id"] == activity_id]
+    followups = _find_records("followups", "activity_id", activity_id)
+    return [_copy_document(followup) for followup in followups]
 
 def get_followups_by_username(username):
-    followups = get_all_followups()
-    return [followup for followup in followups if followup["marketer_username"] == username]
+    followups = _find_records("followups", "marketer_username", username)
+    return [_copy_document(followup) for followup in followups]
+
+def query_followups(filters=None, sort=None, offset=0, limit=None):
+    """Like query_activities for follow-ups; "start_date"/"end_date" bound
+    followup_date. Returns (list of follow-ups on the page, total matches)."""
+    return _query_table("followups", filters, sort, offset, limit)
+
+def get_latest_followups(limit, marketer_username=None):
+    """Like get_latest_activities for follow-ups."""
+    records = _scan_created("followups", limit=limit, latest=True, marketer_username=marketer_username)
+    return [_copy_document(record) for record in records]
 
+def get_followups_created_between(start, end):
+    """Like get_activities_created_between for follow-ups."""
+    records = _scan_created("followups", _to_epoch_ms(start), _to_epoch_ms(end, end=True))
+    return [_copy_document(record) for record in records]
+
+@_coordinated_write((False, WRITE_LOCK_BUSY_MESSAGE))
 def add_followup(activity_id, marketer_username, followup_date, notes, 
                 next_action, next_followup_date, interest_level, status_update):
-    followups_file = os.path.join(DATA_DIR, FOLLOWUPS_FILENAME)
-    followups_data = read_yaml(followups_file)
-    if not followups_data or "followups" not in followups_data:
-        followups_data = {"followups": []}
     followup_id = generate_id("fu")
     new_followup = {
         "id": followup_id,
@@ -394,17 +1750,139 @@ def add_followup(activity_id, marketer_username, followup_date, notes,
         "status_update": status_update,
         "created_at": get_wib_now_str() # Use WIB timestamp
     }
-    followups_data["followups"].append(new_followup)
-    write_yaml(followups_file, followups_data)
-    # Update parent activity status
-    update_activity_status(activity_id, status_update)
+    # Follow-up and parent activity status are committed together
+    with transaction() as txn:
+        _insert_records("followups", [new_followup])
+        update_activity_status(activity_id, status_update)
+    if not txn.ok:
+        return False, "Gagal menyimpan follow-up"
     return True, "Follow-up berhasil ditambahkan"
 
+# --- Cold Archive ---
+# Closed activities older than archive_after_days move with their follow-ups
+# into compressed files under data/archive/ (see cold_archive.py). The manifest
+# entry of a new archive is written with "pending: true" before the hot rows
+# are deleted and cleared afterwards; finish_pending_archives() completes an
+# interrupted job, and pending archives are left out of the summaries.
+
+def _archive_after_days():
+    config = _read_yaml_shared(os.path.join(DATA_DIR, CONFIG_FILENAME)) or {}
+    try:
+        return int(config.get("archive_after_days", cold_archive.DEFAULT_ARCHIVE_AFTER_DAYS))
+    except (TypeError, ValueError):
+        return cold_archive.DEFAULT_ARCHIVE_AFTER_DAYS
+
+def _delete_archived_rows(activity_ids, followup_ids):
+    """Deletes the archived rows still present in the hot tables in one unit of work."""
+    activity_ids = [i for i in activity_ids if _get_record("marketing_activities", i) is not None]
+    followup_ids = [i for i in followup_ids if _get_record("followups", i) is not None]
+    with transaction() as txn:
+        if activity_ids:
+            _delete_records("marketing_activities", activity_ids)
+        if followup_ids:
+            _delete_records("followups", followup_ids)
+    return txn.ok
+
+@_coordinated_write(False)
+def finish_pending_archives():
+    """Completes archive jobs that were interrupted before their rows were
+    deleted from the hot tables. Returns True when nothing is left pending."""
+    manifest_file = cold_archive.manifest_path(DATA_DIR)
+    manifest = read_yaml(manifest_file)
+    pending = [a for a in (manifest or {}).get("archives") or [] if a.get("pending")]
+    if not pending:
+        return True
+    for archive in pending:
+        print(f"Finishing interrupted archive {archive['file']}...")
+        try:
+            rows = cold_archive.read_archive(os.path.join(cold_archive.archive_dir(DATA_DIR), archive["file"]))
+        except (OSError, yaml.YAMLError) as e:
+            print(f"Error reading archive {archive['file']}: {e}")
+            return False
+        if not _delete_archived_rows([a.get("id") for a in rows["marketing_activities"]],
+                                     [f.get("id") for f in rows["followups"]]):
+            return False
+        archive["pending"] = False
+    return write_yaml(manifest_file, manifest)
+
+@_coordinated_write((False, WRITE_LOCK_BUSY_MESSAGE, 0))
+def archive_closed_activities(older_than_days=None):
+    """Moves activities with status berhasil/gagal whose last update is older
+    than older_than_days (default: archive_after_days in config.yaml), and
+    their follow-ups, into a new compressed archive file.
+
+    Returns:
+        tuple: (success, message, number of archived activities)
+    """
+    if not finish_pending_archives():
+        return False, "Arsip sebelumnya belum selesai diproses", 0
+    days = _archive_after_days() if older_than_days is None else int(older_than_days)
+    cutoff_time = datetime.now(WIB_TZ) - timedelta(days=days)
+    cutoff, cutoff_ts = cutoff_time.strftime("%Y-%m-%d %H:%M:%S"), int(cutoff_time.timestamp())
+
+    def last_change_ts(activity):
+        updated_ts = activity.get("updated_at_ts")
+        return updated_ts if updated_ts is not None else activity.get("created_at_ts")
+
+    activities = [
+        activity.to_dict() for activity in _live_records("marketing_activities")
+        if isinstance(activity, record_model.Record)
+        and activity.get("status") in cold_archive.ARCHIVE_STATUSES
+        and last_change_ts(activity) is not None
+        and last_change_ts(activity) < cutoff_ts
+    ]
+    if not activities:
+        return True, "Tidak ada aktivitas yang perlu diarsipkan", 0
+    followups = [
+        followup.to_dict() for activity in activities
+        for followup in _find_records("followups", "activity_id", activity["id"])
+    ]
+
+    directory = cold_archive.archive_dir(DATA_DIR)
+    filename = f"archive-{datetime.now(WIB_TZ).strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}{cold_archive.ARCHIVE_SUFFIX}"
+    try:
+        os.makedirs(directory, exist_ok=True)
+        cold_archive.write_archive(os.path.join(directory, filename), activities, followups)
+    except (OSError, yaml.YAMLError) as e:
+        print(f"Error writing archive {filename}: {e}")
+        return False, "Gagal menulis file arsip", 0
+
+    manifest_file = cold_archive.manifest_path(DATA_DIR)
+    manifest = read_yaml(manifest_file) or {}
+    manifest.setdefault("archives", []).append({
+        "file": filename,
+        "created_at": get_current_timestamp(),
+        "cutoff": cutoff,
+        "activities": len(activities),
+        "followups": len(followups),
+        "pending": True,
+        "aggregates": cold_archive.compute_aggregates(activities, followups)
+    })
+    if not write_yaml(manifest_file, manifest):
+        os.remove(os.path.join(directory, filename))
+        return False, "Gagal memperbarui manifest arsip", 0
+    if not finish_pending_archives():
+        return False, "Arsip ditulis, tetapi data aktif belum terhapus; akan diselesaikan pada proses berikutnya", 0
+    return True, f"{len(activities)} aktivitas dan {len(followups)} follow-up berhasil diarsipkan", len(activities)
+
+def has_archive():
+    return os.path.exists(cold_archive.manifest_path(DATA_DIR))
+
+def get_archive_summary(marketer_username=None):
+    """Precomputed totals of the archived rows (see cold_archive.merge_aggregates),
+    optionally for one marketer. Reads only the archive manifest."""
+    return cold_archive.merge_aggregates(
+        _read_yaml_shared(cold_archive.manifest_path(DATA_DIR)), marketer_username
+    )
+
 # --- Configuration --- 
 
 def get_app_config():
     config_file = os.path.join(DATA_DIR, CONFIG_FILENAME)
-    config_data = read_yaml(config_file)
+    try:
+        config_data = read_yaml(config_file)
+    except DataFileError:
+        config_data = None # Display defaults; update_app_config refuses to overwrite the file
     # Return default if file is missing or empty
     if not config_data:
         print(f"Warning: Config file {config_file} not found or empty. Using defaults.")
@@ -416,15 +1894,26 @@ def get_app_config():
             "date_format": "%Y-%m-%d %H:%M:%S",
             "enable_email": False,
             "enable_reminder": True,
-            "reminder_days_before": 1
+            "reminder_days_before": 1,
+            "enable_write_journal": False,
+            "storage_backend": "yaml",
+            "partition_by_month": False,
+            "archive_after_days": cold_archive.DEFAULT_ARCHIVE_AFTER_DAYS,
+            "tombstone_retention_days": DEFAULT_TOMBSTONE_RETENTION_DAYS,
+            "sheets_verify_interval_hours": sheet_row_map.DEFAULT_VERIFY_INTERVAL_HOURS
         }
     return config_data
 
+@_coordinated_write((False, WRITE_LOCK_BUSY_MESSAGE))
 def update_app_config(new_config_subset):
     config_file = os.path.join(DATA_DIR, CONFIG_FILENAME)
-    current_config = get_app_config() # Get current or default config
+    try:
+        current_config = read_yaml(config_file) or get_app_config() # Get current or default config
+    except DataFileError:
+        return False, "File konfigurasi tidak dapat dibaca; perubahan tidak disimpan"
     current_config.update(new_config_subset) # Update with new values
-    write_yaml(config_file, current_config)
+    if not write_yaml(config_file, current_config):
+        return False, "Gagal menyimpan konfigurasi aplikasi"
 
     return True, "Konfigurasi aplikasi berhasil diperbarui"
 
@@ -0,0 +1,161 @@
+"""
+Cross-Process Write Coordination
+
+Several Streamlit processes may serve the same data/ directory. Every
+mutating function of utils_with_edit_delete runs under one WriteLock: a
+reentrant lock that is held by at most one thread of one process at a time,
+implemented as an fcntl advisory lock on data/.write.lock plus a thread lock.
+Waiting is bounded; a writer that cannot get the lock within the timeout
+gets WriteLockTimeout instead of blocking the page forever.
+
+Writers also bump a per-table counter in data/.write_versions.json when they
+release the lock. Other processes compare it with the counter they cached a
+table at and drop stale in-memory copies (see
+utils_with_edit_delete._drop_stale_cache).
+
+On platforms without fcntl (Windows) the lock only coordinates the threads of
+one process.
+"""
+
+import contextlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError: # Windows
+    fcntl = None
+
+LOCK_FILENAME = ".write.lock"
+VERSIONS_FILENAME = ".write_versions.json"
+DEFAULT_TIMEOUT = 10.0 # Seconds
+_POLL_INTERVAL = 0.01
+
+
+class WriteLockTimeout(TimeoutError):
+    """The write lock could not be acquired within the timeout."""
+
+
+def versions_path(data_dir):
+    return os.path.join(data_dir, VERSIONS_FILENAME)
+
+
+_versions_cache = {} # path -> ((mtime_ns, size, inode), versions)
+
+
+def read_versions(data_dir):
+    """Returns {table name: write counter}; empty when nothing was written yet.
+    Re-reads the file only when its stat signature changed. Read-only."""
+    path = versions_path(data_dir)
+    try:
+        stat_result = os.stat(path)
+    except OSError:
+        return {}
+    signature = (stat_result.st_mtime_ns, stat_result.st_size, stat_result.st_ino)
+    cached = _versions_cache.get(path)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+    try:
+        with open(path, "r", encoding="utf-8") as file:
+            versions = json.load(file)
+    except (OSError, ValueError):
+        return {}
+    versions = versions if isinstance(versions, dict) else {}
+    _versions_cache[path] = (signature, versions)
+    return versions
+
+
+def _bump_versions(data_dir, table_names):
+    """Increments the counters of table_names. Must run under the lock."""
+    versions = dict(read_versions(data_dir))
+    for table_name in table_names:
+        versions[table_name] = versions.get(table_name, 0) + 1
+    fd, temp_path = tempfile.mkstemp(dir=data_dir, prefix=f"{VERSIONS_FILENAME}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as file:
+            json.dump(versions, file)
+        os.replace(temp_path, versions_path(data_dir))
+    except OSError:
+        with contextlib.suppress(OSError):
+            os.remove(temp_path)
+        raise
+    return versions
+
+
+class WriteLock:
+    """Reentrant cross-process lock for the data directory returned by
+    data_dir() (a function, so a changed DATA_DIR is picked up)."""
+
+    def __init__(self, data_dir, timeout=DEFAULT_TIMEOUT):
+        self._data_dir = data_dir
+        self.timeout = timeout
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._file = None
+        self._changed = set()
+        self.versions = {} # Counters after this process's last bump
+
+    def acquire(self):
+        deadline = time.monotonic() + self.timeout
+        if not self._thread_lock.acquire(timeout=self.timeout):
+            raise WriteLockTimeout(f"Write lock busy for more than {self.timeout:g}s")
+        if self._depth == 0:
+            try:
+                self._file = self._lock_file(deadline)
+            except BaseException:
+                self._thread_lock.release()
+                raise
+        self._depth += 1
+
+    def _lock_file(self, deadline):
+        if fcntl is None:
+            return None
+        data_dir = self._data_dir()
+        os.makedirs(data_dir, exist_ok=True)
+        file = open(os.path.join(data_dir, LOCK_FILENAME), "a+")
+        try:
+            while True:
+                try:
+                    fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    return file
+                except BlockingIOError:
+                    if time.monotonic() >= deadline:
+                        raise WriteLockTimeout(f"Data directory locked by another process for more than {self.timeout:g}s")
+                    time.sleep(_POLL_INTERVAL)
+        except BaseException:
+            file.close()
+            raise
+
+    def release(self):
+        try:
+            if self._depth == 1:
+                try:
+                    if self._changed:
+                        self.versions = _bump_versions(self._data_dir(), sorted(self._changed))
+                except OSError as e: # Other processes then rely on the file signatures alone
+                    print(f"Warning: Could not update {VERSIONS_FILENAME}: {e}")
+                finally:
+                    self._changed.clear()
+                    if self._file is not None:
+                        self._file.close() # Releases the flock
+                        self._file = None
+        finally:
+            self._depth -= 1
+            self._thread_lock.release()
+
+    def mark_changed(self, table_name):
+        """Records that table_name was written; its counter is bumped when the
+        outermost hold is released. Outside a hold it is bumped right away."""
+        with self:
+            self._changed.add(table_name)
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.release()
+        return False
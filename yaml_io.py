@@ -0,0 +1,112 @@
+"""
+libyaml-Accelerated YAML Loading and Dumping
+
+PyYAML's pure-Python parser and emitter dominate the time spent reading and
+writing the data files. safe_load and dump use the C implementations
+(yaml.CSafeLoader / yaml.CSafeDumper) when PyYAML was built with libyaml and
+fall back to the pure-Python classes otherwise.
+
+The files must stay byte-for-byte what yaml.dump wrote before, so dump only
+keeps libyaml's output when it is known to be identical:
+- libyaml folds long double-quoted scalars (strings with escapes or line
+  breaks, or non-ASCII text without allow_unicode) at other positions than
+  the Python emitter, so any output containing a double quote is re-emitted
+  by yaml.dump;
+- objects only yaml.Dumper can represent (tuples, custom classes) make the
+  safe dumper fail and are dumped by yaml.dump as well.
+Everything else (plain and single-quoted scalars, numbers, null, dates, the
+record_model records) comes out identically.
+
+Benchmark (parse and dump of generated activity tables):
+    python yaml_io.py benchmark [--sizes 1000 10000 100000]
+"""
+
+import io
+import sys
+import yaml
+
+LIBYAML_AVAILABLE = hasattr(yaml, "CSafeLoader") and hasattr(yaml, "CSafeDumper")
+SafeLoader = yaml.CSafeLoader if LIBYAML_AVAILABLE else yaml.SafeLoader
+SafeDumper = yaml.CSafeDumper if LIBYAML_AVAILABLE else None
+
+
+def safe_load(stream):
+    """Same result as yaml.safe_load(stream), parsed by libyaml when available."""
+    return yaml.load(stream, Loader=SafeLoader)
+
+
+def dump(data, stream=None, **kwargs):
+    """Same output as yaml.dump(data, stream, **kwargs), emitted by libyaml
+    when that gives identical bytes. Returns the text when stream is None."""
+    if SafeDumper is not None and "encoding" not in kwargs:
+        try:
+            text = yaml.dump(data, Dumper=SafeDumper, **kwargs)
+        except yaml.representer.RepresenterError:
+            text = None
+        if text is not None and '"' not in text:
+            if stream is None:
+                return text
+            stream.write(text)
+            return None
+    return yaml.dump(data, stream, **kwargs)
+
+
+def _benchmark_rows(count):
+    statuses = ["baru", "dalam_proses", "berhasil", "gagal"]
+    return [{
+        "id": f"act_{index:08x}",
+        "marketer_username": f"marketer{index % 20}",
+        "prospect_name": f"SMA Negeri {index % 500} Bandung",
+        "prospect_location": ["Bandung", "Jakarta", "Surabaya", "Medan"][index % 4],
+        "contact_person": f"Bapak Kontak {index}",
+        "contact_position": "Kepala Sekolah",
+        "contact_phone": f"08{index:010d}",
+        "contact_email": f"kontak{index}@sekolah.sch.id",
+        "activity_date": f"2024-{index % 12 + 1:02d}-{index % 28 + 1:02d}",
+        "activity_type": "Presentasi",
+        "description": "Presentasi program pelatihan guru untuk tahun ajaran baru, "
+                       "dilanjutkan diskusi kebutuhan perangkat kelas digital.",
+        "status": statuses[index % 4],
+        "created_at": "2024-05-01 09:30:00",
+        "updated_at": "2024-05-02 14:00:00",
+    } for index in range(count)]
+
+
+def _time(function):
+    import time
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+
+def run_benchmark(sizes):
+    """Prints parse and dump times of pure-Python PyYAML vs libyaml for a
+    marketing_activities table of each size."""
+    print(f"libyaml: {'ya' if LIBYAML_AVAILABLE else 'tidak tersedia'}")
+    print(f"{'baris':>8} {'dump py':>9} {'dump C':>9} {'load py':>9} {'load C':>9}")
+    for size in sizes:
+        document = {"marketing_activities": _benchmark_rows(size)}
+        options = {"default_flow_style": False, "sort_keys": False, "allow_unicode": True}
+        text, dump_python = _time(lambda: yaml.dump(document, **options))
+        fast_text, dump_fast = _time(lambda: dump(document, **options))
+        _, load_python = _time(lambda: yaml.safe_load(io.StringIO(text)))
+        _, load_fast = _time(lambda: safe_load(io.StringIO(text)))
+        if fast_text != text:
+            print(f"{size:>8} PERINGATAN: output libyaml berbeda")
+        print(f"{size:>8} {dump_python:>8.2f}s {dump_fast:>8.2f}s {load_python:>8.2f}s {load_fast:>8.2f}s")
+
+
+def _main(argv):
+    import argparse
+    parser = argparse.ArgumentParser(description="YAML I/O tools")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    benchmark_parser = subparsers.add_parser("benchmark", help="Compare pure-Python and libyaml parse/dump times")
+    benchmark_parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000],
+                                  help="Table sizes in rows (default: 1000 10000 100000)")
+    args = parser.parse_args(argv)
+    run_benchmark(args.sizes)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(_main(sys.argv[1:]))
@@ -0,0 +1,119 @@
+"""
+Append-only JSONL journal for the YAML data files.
+
+Each journaled table (marketing_activities, followups) may have a
+``<table>.journal`` file next to its YAML snapshot. Writes append one JSON
+line per operation instead of re-dumping the whole snapshot; readers load the
+snapshot and replay the journal on top of it. Compaction folds the journal
+back into the snapshot once it grows past COMPACT_MAX_BYTES or
+COMPACT_MAX_OPS.
+
+Entry formats:
+    {"op": "insert", "record": {...}}
+    {"op": "update", "id": "...", "changes": {...}}
+    {"op": "delete", "ids": ["...", ...]}
+
+Replaying is idempotent (inserts are upserts, updates set fields, deletes of
+missing ids are ignored), so a crash between writing the compacted snapshot
+and removing the journal is harmless. A crash in the middle of an append
+leaves at most one partial last line, which readers ignore and the next
+append truncates.
+"""
+
+import json
+import os
+
+JOURNAL_SUFFIX = ".journal"
+COMPACT_MAX_BYTES = 1024 * 1024  # 1 MB of journal lines
+COMPACT_MAX_OPS = 500
+
+
+def journal_path(snapshot_path):
+    """Returns the journal path belonging to a YAML snapshot path."""
+    base, _ = os.path.splitext(snapshot_path)
+    return base + JOURNAL_SUFFIX
+
+
+def append_entries(path, entries):
+    """Appends entries as JSON lines with a single write, then fsyncs.
+    A partial line left behind by an earlier crash is truncated first."""
+    payload = "".join(json.dumps(entry, ensure_ascii=False, default=str) + "\n" for entry in entries)
+    with open(path, "a+b") as file:
+        size = file.seek(0, os.SEEK_END)
+        if size > 0:
+            file.seek(size - 1)
+            if file.read(1) != b"\n":
+                _truncate_partial_line(file, size)
+        file.write(payload.encode("utf-8"))
+        file.flush()
+        os.fsync(file.fileno())
+
+
+def _truncate_partial_line(file, size):
+    # Walk back to the last complete line; journals are small enough for this.
+    file.seek(0)
+    content = file.read(size)
+    keep = content.rfind(b"\n") + 1
+    print(f"Warning: Dropping {size - keep} bytes of partial journal line.")
+    file.truncate(keep)
+    file.seek(keep)
+
+
+def read_entries(path, offset=0):
+    """Reads complete journal lines starting at byte offset.
+
+    Returns:
+        tuple: (entries, new_offset). new_offset points just past the last
+        complete line, so a partial trailing line is re-read next time.
+    """
+    entries = []
+    try:
+        with open(path, "rb") as file:
+            file.seek(offset)
+            content = file.read()
+    except FileNotFoundError:
+        return entries, 0
+    end = content.rfind(b"\n") + 1
+    for line in content[:end].splitlines():
+        if not line.strip():
+            continue
+        try:
+            entries.append(json.loads(line))
+        except ValueError as e:
+            print(f"Warning: Skipping unreadable journal line in {path}: {e}")
+    return entries, offset + end
+
+
+def apply_entries(records, entries):
+    """Applies journal entries to an id -> record mapping in place.
+    Records are replaced, never mutated, so callers may share the old ones."""
+    for entry in entries:
+        op = entry.get("op")
+        if op == "insert":
+            record = entry["record"]
+            records[record["id"]] = record
+        elif op == "update":
+            current = records.get(entry["id"])
+            if current is not None:
+                records[entry["id"]] = {**current, **entry["changes"]}
+        elif op == "delete":
+            for record_id in entry["ids"]:
+                records.pop(record_id, None)
+        else:
+            print(f"Warning: Unknown journal operation {op!r} ignored.")
+
+
+def needs_compaction(path, op_count):
+    """Returns True once the journal crosses the size or operation threshold."""
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        return False
+    return size >= COMPACT_MAX_BYTES or op_count >= COMPACT_MAX_OPS
+
+
+def remove_journal(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
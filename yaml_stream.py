@@ -0,0 +1,56 @@
+"""
+Streaming Reader for the YAML Table Files
+
+yaml.safe_load builds the whole document before the first record can be used,
+so reading a table costs several times the file size in memory. iter_records
+walks the parser's event stream instead and constructs one record of the
+table's sequence at a time with SafeLoader's resolver and constructor (same
+types as yaml.safe_load: ints, null, quoted phone numbers stay strings, ...).
+Other top-level keys are skipped.
+
+Used by data_utils.export_to_csv and data_utils.validate_data_integrity.
+"""
+
+import yaml
+
+
+class TableStructureError(ValueError):
+    """The file is not a mapping whose table_name key holds a list."""
+
+
+def iter_records(file_path, table_name):
+    """Yields the items of the table_name sequence in file_path one at a time.
+
+    Raises:
+        TableStructureError: When the document is empty, not a mapping, or
+            table_name is missing or not a list (raised once the structure
+            is known, possibly after some records were yielded).
+        OSError, yaml.YAMLError: Like yaml.safe_load on the same file.
+    """
+    with open(file_path, "r", encoding="utf-8") as file:
+        loader = yaml.SafeLoader(file)
+        try:
+            loader.get_event() # StreamStart
+            if loader.check_event(yaml.StreamEndEvent):
+                raise TableStructureError(f"{file_path} is empty")
+            loader.get_event() # DocumentStart
+            if not loader.check_event(yaml.MappingStartEvent):
+                raise TableStructureError(f"{file_path} is not a mapping")
+            loader.get_event()
+            found = False
+            while not loader.check_event(yaml.MappingEndEvent):
+                key = loader.construct_document(loader.compose_node(None, None))
+                if key != table_name:
+                    loader.compose_node(None, None) # Skip the value
+                    continue
+                if not loader.check_event(yaml.SequenceStartEvent):
+                    raise TableStructureError(f"{table_name} in {file_path} is not a list")
+                found = True
+                loader.get_event()
+                while not loader.check_event(yaml.SequenceEndEvent):
+                    yield loader.construct_document(loader.compose_node(None, None))
+                loader.get_event()
+            if not found:
+                raise TableStructureError(f"{file_path} has no key {table_name}")
+        finally:
+            loader.dispose()